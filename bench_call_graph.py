@@ -0,0 +1,82 @@
+"""
+Compare the tree-sitter call graph backend with PyCG on projects of projects_py.csv, cloned in
+    projects/py/<name> (like miner.py does): time of each backend and recall/precision of the
+    tree-sitter edges between project functions, taking PyCG as the reference.
+
+    python bench_call_graph.py --limit 3
+    python bench_call_graph.py --projects flask requests --jobs 4
+"""
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from miner_py_src.call_graph import generate_cfg
+from miner_py_src.file_metrics import iter_file_records
+from miner_py_src.ts_call_graph import build_call_graph
+
+
+def project_edges(call_graph, nodes) -> set:
+    """
+    Calls between the functions and modules of the project, the nodes of the tree-sitter graph
+        (PyCG also has nodes for classes and for attributes of values it could not resolve)
+    """
+    return {(caller, callee) for caller in call_graph if caller in nodes
+            for callee in call_graph[caller]['calls'] if callee in nodes and callee.startswith('...')}
+
+
+def bench_project(name: str, jobs: int, pycg_backend: str = None) -> dict:
+    folder = os.path.abspath(os.path.join('projects/py', name))
+    files = [f for f in glob.iglob(os.path.join(folder, '**/*.py'), recursive=True) if os.path.isfile(f)]
+
+    start = time.perf_counter()
+    for _ in iter_file_records(files, jobs):
+        pass
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    call_facts = {}
+    for _ in iter_file_records(files, jobs, call_facts=call_facts):
+        pass
+    ts_graph = build_call_graph(call_facts, folder)
+    ts_time = time.perf_counter() - start - parse_time  # on top of the metrics parse
+
+    start = time.perf_counter()
+    pycg_graph = generate_cfg(name, folder, jobs=jobs, backend=pycg_backend)
+    pycg_time = time.perf_counter() - start
+
+    nodes = set(ts_graph)
+    ts_edges, pycg_edges = project_edges(ts_graph, nodes), project_edges(pycg_graph, nodes)
+    found = len(ts_edges & pycg_edges)
+    return {
+        'project': name,
+        'files': len(files),
+        'parse_s': round(parse_time, 2),
+        'tree_sitter_extra_s': round(ts_time, 2),
+        'pycg_s': round(pycg_time, 2),
+        'tree_sitter_edges': len(ts_edges),
+        'pycg_edges': len(pycg_edges),
+        'recall': round(found / len(pycg_edges), 3) if pycg_edges else None,
+        'precision': round(found / len(ts_edges), 3) if ts_edges else None,
+    }
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--projects', nargs='*', default=None,
+                            help='Project names (default: the cloned projects of projects_py.csv)')
+    arg_parser.add_argument('--limit', type=int, default=3)
+    arg_parser.add_argument('--jobs', type=int, default=1)
+    arg_parser.add_argument('--pycg-backend', choices=['api', 'subprocess'], default=None)
+    args = arg_parser.parse_args()
+
+    names = args.projects
+    if names is None:
+        projects = pd.read_csv('projects_py.csv', sep=',')
+        names = [name for name in projects['name'] if os.path.isdir(os.path.join('projects/py', str(name)))]
+    names = [str(name) for name in names][:args.limit]
+
+    results = pd.DataFrame([bench_project(name, args.jobs, args.pycg_backend) for name in names])
+    print(results.to_string(index=False))
@@ -0,0 +1,92 @@
+"""
+Compare the tree-sitter exceptions checker (ts_lint) with pylint on projects of projects_py.csv,
+    cloned in projects/py/<name> (like miner_pylint.py does): time of each one and, for every
+    message id, recall/precision of the tree-sitter messages (line, column, id) taking pylint
+    as the reference.
+
+    python bench_lint.py --limit 3
+    python bench_lint.py --projects flask requests --jobs 4
+"""
+import argparse
+import glob
+import os
+import time
+from collections import Counter
+
+import pandas as pd
+
+from miner_py_src.file_metrics import iter_file_records
+from miner_py_src.pylint_runner import iter_pylint_results
+
+
+def message_keys(messages_by_file: dict) -> set:
+    return {(file_path, message['line'], message['column'], message['message-id'])
+            for file_path, messages in messages_by_file.items() for message in messages}
+
+
+def bench_project(name: str, jobs: int, chunk_size: int) -> list:
+    folder = os.path.abspath(os.path.join('projects/py', name))
+    files = [f for f in glob.iglob(os.path.join(folder, '**/*.py'), recursive=True)
+             if os.path.isfile(f) and not os.path.islink(f)]
+
+    start = time.perf_counter()
+    for _ in iter_file_records(files, jobs):
+        pass
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    native = {}
+    for _ in iter_file_records(files, jobs, lint_messages=native):
+        pass
+    native_time = time.perf_counter() - start - parse_time  # on top of the metrics parse
+
+    start = time.perf_counter()
+    reference = dict(iter_pylint_results(files, jobs, chunk_size))
+    pylint_time = time.perf_counter() - start
+
+    native_keys, pylint_keys = message_keys(native), message_keys(reference)
+    found = Counter(key[3] for key in native_keys & pylint_keys)
+    native_count, pylint_count = Counter(key[3] for key in native_keys), Counter(key[3] for key in pylint_keys)
+    rows = []
+    for message_id in sorted(set(native_count) | set(pylint_count)):
+        rows.append({
+            'project': name,
+            'message_id': message_id,
+            'tree_sitter': native_count[message_id],
+            'pylint': pylint_count[message_id],
+            'recall': round(found[message_id] / pylint_count[message_id], 3) if pylint_count[message_id] else None,
+            'precision': round(found[message_id] / native_count[message_id], 3) if native_count[message_id] else None,
+        })
+    rows.append({
+        'project': name,
+        'message_id': 'all',
+        'tree_sitter': len(native_keys),
+        'pylint': len(pylint_keys),
+        'recall': round(sum(found.values()) / len(pylint_keys), 3) if pylint_keys else None,
+        'precision': round(sum(found.values()) / len(native_keys), 3) if native_keys else None,
+        'files': len(files),
+        'parse_s': round(parse_time, 2),
+        'tree_sitter_extra_s': round(native_time, 2),
+        'pylint_s': round(pylint_time, 2),
+    })
+    return rows
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--projects', nargs='*', default=None,
+                            help='Project names (default: the cloned projects of projects_py.csv)')
+    arg_parser.add_argument('--limit', type=int, default=3)
+    arg_parser.add_argument('--jobs', type=int, default=1)
+    arg_parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of files linted by each pylint process')
+    args = arg_parser.parse_args()
+
+    names = args.projects
+    if names is None:
+        projects = pd.read_csv('projects_py.csv', sep=',')
+        names = [name for name in projects['name'] if os.path.isdir(os.path.join('projects/py', str(name)))]
+    names = [str(name) for name in names][:args.limit]
+
+    results = pd.DataFrame([row for name in names for row in bench_project(name, args.jobs, args.chunk_size)])
+    print(results.to_string(index=False))
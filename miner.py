@@ -1,33 +1,39 @@
+import argparse
 import os
 import pathlib
-from subprocess import call
 from typing import List
 
 import pandas as pd
 from pydriller import Git
-from tqdm import tqdm
 
-from miner_py_src.call_graph import CFG, generate_cfg
-from miner_py_src.exceptions import FunctionDefNotFoundException
-from miner_py_src.miner_py_utils import get_function_defs
+from miner_py_src.accumulator import RowAccumulator
+from miner_py_src.call_graph import annotate_uncaught_exceptions, generate_cfg
+from miner_py_src.call_graph_cache import CallGraphCache
+from miner_py_src.columnar import has_pyarrow, write_parquet
+from miner_py_src.fetcher import FetchJob, iter_fetched
+from miner_py_src.file_metrics import iter_file_records, record_to_dict
+from miner_py_src.function_index import FunctionIndex
+from miner_py_src.lint_sink import JsonlSink, lint_output_path
+from miner_py_src.metrics_cache import MetricsCache
+from miner_py_src.repo_cache import RepoCache
+from miner_py_src.source_store import SourceStore, StoredContents, reference_columns
 from miner_py_src.stats import FileStats
-from miner_py_src.tree_sitter_lang import parser as tree_sitter_parser
+from miner_py_src.ts_call_graph import build_call_graph
 from utils import create_logger
 
 logger = create_logger("exception_miner", "exception_miner.log")
 
 
-def fetch_gh(projects, dir='projects/py/'):
-    for index, row in projects.iterrows():
-        project = row['name']
-        try:
-            path = os.path.join(os.getcwd(), dir, project)
-            git_cmd = "git clone {}.git --recursive {}".format(
-                row['repo'], path)
-            call(git_cmd, shell=True)
-            logger.warning("EH MINING: cloned project")
-        except Exception as e:
-            logger.warning(f"EH MINING: error cloing project {project} {e}")
+def fetch_gh(projects, dir='projects/py/', mirrors: RepoCache = None, jobs=4, partial=True):
+    """Clone the projects, jobs at a time, and yield the name of each one as soon as it is cloned"""
+    fetch_jobs = [FetchJob(row['name'], f"{row['repo']}.git", os.path.join(os.getcwd(), dir, str(row['name'])), None)
+                  for index, row in projects.iterrows()]
+    for result in iter_fetched(fetch_jobs, jobs, partial, mirrors):
+        if result.error is not None:
+            logger.warning(f"EH MINING: error cloing project {result.job.name} {result.error}")
+            continue
+        logger.warning(f"EH MINING: cloned project {result.job.name} in {result.seconds:.1f}s")
+        yield result.job.name
 
 
 def fetch_repositories(project)->list[str]:
@@ -38,16 +44,8 @@ def fetch_repositories(project)->list[str]:
     # for commit in Repository(row['repo'], clone_repo_to="projects").traverse_commits():
     # project = row["name"]
 
-    if not os.path.exists("output/pytlint"):
-        os.mkdir("output/pytlint")
-
-    if not os.path.exists(f"output/pytlint/{project}"):
-        os.mkdir(f"output/pytlint/{project}")
-
     try:
         path = os.path.join(os.getcwd(), "projects/py", str(project))
-        git_cmd = "git clone {}.git --recursive {}".format(row["repo"], path)
-        call(git_cmd, shell=True)
         logger.warning(
             "Exception Miner: Before init git repo: {}".format(project))
         gr = Git(path)
@@ -70,139 +68,67 @@ def fetch_repositories(project)->list[str]:
         return []
 
 
-def __get_method_name(node):  # -> str | None:
-    for child in node.children:
-        if child.type == 'identifier':
-            return child.text.decode("utf-8")
+def collect_parser(files, project_name, jobs=1, cache=None, transitive=False, pycg_jobs=1, pycg_backend=None,
+                   call_graph_cache=None, call_graph_backend="pycg", lint=False, lint_gzip=False,
+                   output_format="csv", row_group_size=10000, sources: SourceStore = None):
 
-
-def collect_parser(files, project_name):
-
-    df = pd.DataFrame(
-        columns=["file", "function", "func_body", "str_uncaught_exceptions", "n_try_except", "n_try_pass", "n_finally",
-                 "n_generic_except", "n_raise", "n_captures_broad_raise", "n_captures_try_except_raise", "n_captures_misplaced_bare_raise",
-                 "n_try_else", "n_try_return", "str_except_identifiers", "str_raise_identifiers", "str_except_block", "n_nested_try", 
-                 "n_bare_except", "n_bare_raise_finally"]
-    )
+    columns = ["file", "function", "func_body", "str_uncaught_exceptions", "n_try_except", "n_try_pass", "n_finally",
+               "n_generic_except", "n_raise", "n_captures_broad_raise", "n_captures_try_except_raise", "n_captures_misplaced_bare_raise",
+               "n_try_else", "n_try_return", "str_except_identifiers", "str_raise_identifiers", "str_except_block", "n_nested_try",
+               "n_bare_except", "n_bare_raise_finally"]
+    contents = None
+    if sources is not None:
+        # the bodies stay in the source store, the rows refer to them
+        columns = reference_columns(columns)
+        contents = StoredContents(sources)
+    rows = RowAccumulator(columns=columns, reverse=True)
+    function_index = FunctionIndex(reverse=True)
 
     file_stats = FileStats()
-    pbar = tqdm(files)
-    func_defs: List[str] = []  # List[Node] = []
-    for file_path in pbar:
-        pbar.set_description(f"Processing {str(file_path)[-40:].ljust(40)}")
-
-        with open(file_path, "rb") as file:
-            try:
-                content = file.read()
-            except UnicodeDecodeError as ex:
-                tqdm.write(
-                    f"###### UnicodeDecodeError Error!!! file: {file_path}.\n{str(ex)}"
-                )
-                continue
-        try:
-            tree = tree_sitter_parser.parse(content)
-        except SyntaxError as ex:
-            tqdm.write(
-                f"###### SyntaxError Error!!! file: {file_path}.\n{str(ex)}")
-        else:
-            captures = get_function_defs(tree)
-            for child in captures:
-                # print("Function: ", __get_method_name(child))
-                function_identifier = __get_method_name(child)
-                if function_identifier is None:
-                    raise FunctionDefNotFoundException(
-                        f'Function identifier not found:\n {child.text}')
-
-                func_defs.append(function_identifier)
-                file_stats.metrics(child, file_path)
-                metrics = file_stats.get_metrics(child)
-                df = pd.concat(
-                    [
-                        pd.DataFrame(
-                            [{
-                                "file": file_path,
-                                "function": __get_method_name(child),
-                                "func_body": child.text.decode("utf-8"),
-                                'str_uncaught_exceptions': '',
-                                **metrics                                
-                            }],
-                            columns=df.columns,
-                        ),
-                        df,
-                    ],
-                    ignore_index=True,
-                )
+    func_defs: List[str] = []
+    call_facts = {} if call_graph_backend == "tree-sitter" else None
+    lint_messages = {} if lint else None
+    sink = JsonlSink(lint_output_path(project_name, lint_gzip)) if lint else None
+    try:
+        for file_path, records in iter_file_records(files, jobs, cache, call_facts=call_facts, contents=contents,
+                                                    lint_messages=lint_messages):
+            if sink is not None:
+                sink.write(lint_messages.pop(file_path, None))
+            for record in records:
+                func_defs.append(record.function)
+                file_stats.add_record(file_path, record)
+                function_index.add(file_path, record.function)
+                rows.append({
+                    "file": file_path,
+                    "function": record.function,
+                    "func_body": record.func_body,
+                    'str_uncaught_exceptions': '',
+                    **record_to_dict(record),
+                    **(contents.reference(file_path, record) if sources is not None else {}),
+                })
+    finally:
+        if sink is not None:
+            sink.close()  # flushes the gzip stream even if the parse fails
+    df = rows.to_dataframe()
     file_stats.num_files += len(files)
     file_stats.num_functions += len(func_defs)
+    if cache is not None:
+        logger.warning(f"Metrics cache: {cache.hits} hits, {cache.misses} misses")
 
     logger.warning(f"before call graph...")
 
-    call_graph = generate_cfg(str(project_name), os.path.normpath(
-        f"projects/py/{str(project_name)}"))
+    project_folder = os.path.normpath(f"projects/py/{str(project_name)}")
+    if call_graph_backend == "tree-sitter":
+        call_graph = build_call_graph(call_facts, os.path.abspath(project_folder))
+    else:
+        call_graph = generate_cfg(str(project_name), project_folder, jobs=pycg_jobs, backend=pycg_backend,
+                                  cache=call_graph_cache)
     
     if call_graph is None:
         call_graph = {}
 
-    catch_nodes = {}
-    raise_nodes = {}
-    for func_name in call_graph.keys():
-        if not func_name.startswith('...'):
-            continue  # skip external libraries
-
-        names = func_name[3:].split('.')
-        if len(names) == 1:
-            continue  # skip built-in functions
-
-        module_path = '/'.join(names[0:-1])
-        func_identifier = names[-1]
-
-        query = df[(df['file'].str.contains(module_path) &
-                    df['function'].str.fullmatch(func_identifier))]
-
-        if query.empty:
-            continue
-
-        if query.iloc[0]['str_raise_identifiers']:
-            raise_nodes[func_name] = query.iloc[0]['str_raise_identifiers'].split(
-                ' ')
-        if query.iloc[0]['str_except_identifiers']:
-            catch_nodes[func_name] = query.iloc[0]['str_except_identifiers'].split(
-                ' ')
-
-    call_graph_cfg = CFG(call_graph, catch_nodes)
     logger.warning(f"before parse the nodes from call graph...")
-
-    for func_name, raise_types in raise_nodes.items():
-        # func_file_raise, func_identifier_raise = func_name_raise.split(':')
-        cfg_uncaught_exceptions = call_graph_cfg.get_uncaught_exceptions(
-            func_name, raise_types)
-        if cfg_uncaught_exceptions == {}:
-            continue
-
-        for f_full_identifier, uncaught_exceptions in cfg_uncaught_exceptions.items():
-            module_path, func_identifier = ('', '')
-            names = f_full_identifier.split('.')
-            if len(names) == 1:
-                func_identifier = names[0]
-            else:
-                module_path = names[0]
-                func_identifier = names[-1]
-
-            query = df[(df['file'].str.contains(module_path) &
-                        df['function'].str.fullmatch(func_identifier))]
-
-            if query.empty:
-                continue
-
-            idx = int(query.iloc[0].name)  # type: ignore
-
-            for uncaught_exception in uncaught_exceptions:
-                old_value = str(
-                    df.iloc[idx, df.columns.get_loc('str_uncaught_exceptions')])
-
-                # append uncaught exception
-                df.iloc[idx, df.columns.get_loc(
-                    'str_uncaught_exceptions')] = (old_value + f' {func_name}:{uncaught_exception}').strip()
+    annotate_uncaught_exceptions(df, call_graph, function_index, transitive)
 
     # func_defs_try_except = [
     #     f for f in func_defs if check_function_has_except_handler(f)
@@ -210,15 +136,84 @@ def collect_parser(files, project_name):
 
     # func_defs_try_pass = [f for f in func_defs if is_try_except_pass(f)]
     os.makedirs("output/parser/", exist_ok=True)
+    if output_format == "parquet":
+        # str_uncaught_exceptions needs the call graph of the whole project: written once it is annotated
+        logger.warning(f"Before write to parquet: {df.shape}")
+        write_parquet(df, f"output/parser/{project_name}_stats.parquet", row_group_size)
+        return
     logger.warning(f"Before write to csv: {df.shape}")
     df.to_csv(f"output/parser/{project_name}_stats.csv", index=False)
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--jobs", type=int, default=1,
+                            help="Number of processes used to parse the files")
+    arg_parser.add_argument("--cache-dir", default=None,
+                            help="Directory of the metrics cache, keyed by file content")
+    arg_parser.add_argument("--cache-size", type=int, default=1024,
+                            help="Maximum size of the metrics cache in MB")
+    arg_parser.add_argument("--call-graph", choices=["pycg", "tree-sitter"], default="pycg",
+                            help="Build the call graph with PyCG or from the tree-sitter trees of the parsed files")
+    arg_parser.add_argument("--pycg-jobs", type=int, default=1,
+                            help="Number of PyCG shards run at a time (more than 1 splits the project by package)")
+    arg_parser.add_argument("--pycg-backend", choices=["api", "subprocess"], default=None,
+                            help="Run PyCG in process (api, the default when pycg is installed) or as a command")
+    arg_parser.add_argument("--call-graph-cache-dir", default=None,
+                            help="Directory of the call graph cache, keyed by commit, files and PyCG version")
+    arg_parser.add_argument("--transitive", action="store_true",
+                            help="Report the uncaught exceptions of all the callers they escape, not only the direct ones")
+    arg_parser.add_argument("--lint", action="store_true",
+                            help="Also write the pylint exceptions checker messages (as miner_pylint.py) from the parsed trees")
+    arg_parser.add_argument("--gzip", action="store_true",
+                            help="Compress the output/pytlint/<project>.jsonl files of --lint with gzip")
+    arg_parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                            help="Write the rows as CSV or as Parquet (typed, compressed columns; needs pyarrow)")
+    arg_parser.add_argument("--row-group-size", type=int, default=10000,
+                            help="Number of rows per Parquet row group")
+    arg_parser.add_argument("--source-store", default=None,
+                            help="Keep the sources in a content-addressed store in this directory and write "
+                                 "(func_blob, start_byte, end_byte) instead of func_body and str_except_block")
+    arg_parser.add_argument("--mirror-dir", default=None,
+                            help="Directory of the shared bare mirrors; projects/py/<name> become worktrees of them")
+    arg_parser.add_argument("--mirror-size", type=int, default=20480,
+                            help="Maximum size of the mirrors in MB")
+    arg_parser.add_argument("--fetch-jobs", type=int, default=4,
+                            help="Number of repositories cloned or fetched at a time, while the cloned ones are mined")
+    arg_parser.add_argument("--full-clone", action="store_true",
+                            help="Clone the whole history with blobs instead of shallow or blobless partial clones")
+    args = arg_parser.parse_args()
+    if args.output_format == "parquet" and not has_pyarrow():
+        arg_parser.error("--output-format parquet needs pyarrow (pip install -r requirements-parquet.txt)")
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = MetricsCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    call_graph_cache = None
+    if args.call_graph_cache_dir is not None:
+        call_graph_cache = CallGraphCache(args.call_graph_cache_dir)
+
+    mirrors = None
+    if args.mirror_dir is not None:
+        mirrors = RepoCache(args.mirror_dir, args.mirror_size * 1024 * 1024)
+
+    sources = SourceStore(args.source_store) if args.source_store is not None else None
+
     projects = pd.read_csv("projects_py.csv", sep=",")
-    for index, row in projects.iterrows():
-        files = fetch_repositories(row['name'])
+    # the projects are mined in the order their clones finish
+    for name in fetch_gh(projects, mirrors=mirrors, jobs=args.fetch_jobs, partial=not args.full_clone):
+        files = fetch_repositories(name)
         if len(files) > 0:
-            collect_parser(files, row['name'])
+            collect_parser(files, name, args.jobs, cache, args.transitive, args.pycg_jobs,
+                           args.pycg_backend, call_graph_cache, args.call_graph, args.lint, args.gzip,
+                           args.output_format, args.row_group_size, sources)
         else:
             continue
+
+    if call_graph_cache is not None:
+        logger.warning(f"Call graph cache: {call_graph_cache.hits} hits, {call_graph_cache.misses} misses")
+    if cache is not None:
+        logger.warning(f"Metrics cache: {cache.evict()} evicted")
+    if mirrors is not None:
+        logger.warning(f"Mirrors: {mirrors.evict()} evicted")
@@ -1,3 +1,4 @@
+import argparse
 import os
 import pathlib
 import re
@@ -6,32 +7,36 @@ import pandas as pd
 
 from subprocess import call
 from typing import List
-from tqdm import tqdm
 from pydriller import Repository, Git
 from urllib.parse import urlparse
 
-from miner_py_src.call_graph import CFG, generate_cfg
-from miner_py_src.exceptions import FunctionDefNotFoundException
-from miner_py_src.miner_py_utils import get_function_defs
+from miner_py_src.accumulator import RowAccumulator
+from miner_py_src.call_graph import annotate_uncaught_exceptions, generate_cfg
+from miner_py_src.columnar import has_pyarrow, write_parquet
+from miner_py_src.fetcher import FetchJob, iter_fetched
+from miner_py_src.file_metrics import iter_file_records, record_to_dict
+from miner_py_src.function_index import FunctionIndex
+from miner_py_src.git_objects import (GitObjectReader, fetch_missing_blobs, modified_files as git_modified_files,
+                                      symlinks)
+from miner_py_src.incremental import IncrementalParser, diff_hunks
+from miner_py_src.manifest import RunManifest
+from miner_py_src.metrics_cache import MetricsCache
+from miner_py_src.repo_cache import RepoCache
+from miner_py_src.source_store import SourceStore, StoredContents, reference_columns
 from miner_py_src.stats import FileStats
-from miner_py_src.tree_sitter_lang import parser as tree_sitter_parser
 from utils import create_logger
 
 logger = create_logger("exception_miner", "exception_miner.log")
 
 
-def find_hashes_in_directory(directory, file_pattern):
-    hash_list = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            #if re.match(file_pattern, file):
-                # Extract the hash using regular expression
-            match = re.search(r'_(\w+)_stats', file)
-            if match:
-                hash_value = match.group(1)
-                hash_list.append(hash_value)
-
-    return hash_list
+def existing_outputs(directory):
+    """(project, hash, path) of the <project>_<hash>_stats.csv (or .parquet) files already written to directory"""
+    if not os.path.isdir(directory):
+        return
+    for entry in os.scandir(directory):
+        match = re.match(r'^(.*)_([0-9a-fA-F]{7,40})_stats\.(csv|parquet)$', entry.name)
+        if match:
+            yield match.group(1), match.group(2), entry.path
 
 
 def fetch_gh(projects, dir='projects/py/'):
@@ -116,7 +121,9 @@ def get_modified_files_in_merge_commit(merge_commit_hash, repo_path):
         return []
 
 
-def fetch_repositories(repo_url, project_name, hash) -> list[str]:
+def fetch_repositories(repo_url, project_name, hash, checkout=True, mirrors: RepoCache = None,
+                       modified_paths=None) -> list[str]:
+    """The modified .py files of the commit (None if the commit cannot be checked out or fetched)"""
 
     # projects = pd.read_csv("projects.csv", sep=",")
     # for index, row in projects.iterrows():
@@ -131,45 +138,62 @@ def fetch_repositories(repo_url, project_name, hash) -> list[str]:
 
     path = os.path.join(os.getcwd(), "projects/fixes", str(project_name))
 
-    if not os.path.exists(path):
+    if mirrors is not None:
+        # worktree of the shared mirror, fetched again if it does not have the commit yet
+        try:
+            mirrors.worktree(f"{repo_url}.git", path, hash, checkout=False)
+        except OSError as ex:
+            logger.warning(f"Cannot get the commit {hash} from the mirror of {repo_url}: {ex}")
+            return None
+    elif not os.path.exists(path):
         git_cmd = "git clone {}.git --recursive {}".format(repo_url, path)
         call(git_cmd, shell=True)
         logger.warning(
             "Exception Miner: Before init git repo: {}".format(project_name))
 
-    # Checkout the project to commit
-    try:
-        gr = Git(path)
-        gr.checkout(hash)
-    except Exception:
-        logger.warning(f"Cannot checkout the repositóry with this \nCommit: :{hash}")   
-        return []
+    # Checkout the project to commit (without checkout the files are read from the object database)
+    if checkout:
+        try:
+            gr = Git(path)
+            gr.checkout(hash)
+        except Exception:
+            logger.warning(f"Cannot checkout the repositóry with this \nCommit: :{hash}")   
+            return None
     
-    # Initialize the Repository object using PyDriller
-    for commit in Repository(path, single=hash).traverse_commits():
-        if commit.merge:
-            temp_files = get_modified_files_in_merge_commit(hash, path)
-            for f in temp_files:
-                modified_files.append(os.path.join(path, f))
+    if modified_paths is not None:
+        # paths from git_objects.modified_files, read for all the commits of the repository at once
+        modified_files = [os.path.join(path, f) for f in modified_paths]
+    else:
+        # Initialize the Repository object using PyDriller
+        for commit in Repository(path, single=hash).traverse_commits():
+            if commit.merge:
+                temp_files = get_modified_files_in_merge_commit(hash, path)
+                for f in temp_files:
+                    modified_files.append(os.path.join(path, f))
 
-        else:
-            for m in commit.modified_files:
-                print(
-                    "Author {}".format(commit.author.name),
-                    " modified {}".format(m.filename),
-                    " with a change type of {}".format(m.change_type.name),
-                    " and the complexity is {}".format(m.complexity),
-                    " and the changed methods are: {}".format(m.changed_methods)
-                )          
+            else:
+                for m in commit.modified_files:
+                    print(
+                        "Author {}".format(commit.author.name),
+                        " modified {}".format(m.filename),
+                        " with a change type of {}".format(m.change_type.name),
+                        " and the complexity is {}".format(m.complexity),
+                        " and the changed methods are: {}".format(m.changed_methods)
+                    )          
                 
-                if m.new_path is not None:
-                    modified_files.append(os.path.join(path, m.new_path))
-
-    files = [
-        f
-        for f in modified_files
-        if pathlib.Path(rf"{f}").suffix == ".py" and not os.path.islink(f)
-    ]
+                    if m.new_path is not None:
+                        modified_files.append(os.path.join(path, m.new_path))
+
+    if checkout:
+        files = [
+            f
+            for f in modified_files
+            if pathlib.Path(rf"{f}").suffix == ".py" and not os.path.islink(f)
+        ]
+    else:
+        files = [f for f in modified_files if pathlib.Path(rf"{f}").suffix == ".py"]
+        links = symlinks(path, hash, [os.path.relpath(f, path) for f in files])
+        files = [f for f in files if os.path.relpath(f, path) not in links]
 
     logger.warning(
         f"Number of files in {project_name}: {len(files)}")
@@ -177,82 +201,61 @@ def fetch_repositories(repo_url, project_name, hash) -> list[str]:
     return files
 
 
-def __get_method_name(node):  # -> str | None:
-    for child in node.children:
-        if child.type == 'identifier':
-            return child.text.decode("utf-8")
-
-
-def collect_parser(files, project_name, hash_name, url_issue, repo_url):
-
-    df = pd.DataFrame(
-        columns=["file", "function", "func_body", "project", "commit_fix", "repo_url", "url_issue", "str_uncaught_exceptions",
-                 "n_try_except", "n_try_pass", "n_finally", "n_generic_except", "n_raise", "n_captures_broad_raise",
-                 "n_captures_try_except_raise", "n_captures_misplaced_bare_raise", "n_try_else", "n_try_return",
-                 "str_except_identifiers", "str_raise_identifiers", "str_except_block", "n_nested_try", "n_bare_except",
-                 "n_bare_raise_finally"]
-    )
+def commit_contents(reader: GitObjectReader, repo_path, hash_name):
+    """Read the files of a commit (paths in the working tree of repo_path) from its blobs"""
+    def contents(file_path):
+        content = reader.blob(hash_name, pathlib.PurePath(os.path.relpath(file_path, repo_path)).as_posix())
+        if content is None:
+            logger.warning(f"File {file_path} not found in commit {hash_name}")
+        return content
+    return contents
+
+
+def collect_parser(files, project_name, hash_name, url_issue, repo_url, jobs=1, cache=None,
+                   incremental=None, hunks=None, contents=None, output_format="csv", row_group_size=10000,
+                   sources: SourceStore = None):
+
+    columns = ["file", "function", "func_body", "project", "commit_fix", "repo_url", "url_issue", "str_uncaught_exceptions",
+               "n_try_except", "n_try_pass", "n_finally", "n_generic_except", "n_raise", "n_captures_broad_raise",
+               "n_captures_try_except_raise", "n_captures_misplaced_bare_raise", "n_try_else", "n_try_return",
+               "str_except_identifiers", "str_raise_identifiers", "str_except_block", "n_nested_try", "n_bare_except",
+               "n_bare_raise_finally"]
+    if sources is not None:
+        # the bodies stay in the source store, the rows refer to them
+        columns = reference_columns(columns)
+        contents = StoredContents(sources, contents) if contents is not None else StoredContents(sources)
+    os.makedirs("output/fixes_2/", exist_ok=True)
+    output = f"output/fixes_2/{project_name}_{hash_name}_stats.{output_format}"
+    rows = RowAccumulator(columns=columns, reverse=True)
+    function_index = FunctionIndex(reverse=True)
 
     file_stats = FileStats()
-    pbar = tqdm(files)
-    func_defs: List[str] = []  # List[Node] = []
-    for file_path in pbar:
-        pbar.set_description(f"Processing {str(file_path)[-40:].ljust(40)}")
-
-        try:
-            with open(file_path, "rb") as file:
-                try:
-                    content = file.read()
-                except UnicodeDecodeError as ex:
-                    tqdm.write(
-                        f"###### UnicodeDecodeError Error!!! file: {file_path}.\n{str(ex)}"
-                    )
-                    continue
-        except FileNotFoundError as ex:
-            tqdm.write(
-                f"###### UnicodeDecodeError Error!!! file: {file_path}.\n{str(ex)}"
-            )
-        
-        try:
-            tree = tree_sitter_parser.parse(content)
-        except SyntaxError as ex:
-            tqdm.write(
-                f"###### SyntaxError Error!!! file: {file_path}.\n{str(ex)}")
-        else:
-            captures = get_function_defs(tree)
-            for child in captures:
-                # print("Function: ", __get_method_name(child))
-                function_identifier = __get_method_name(child)
-                if function_identifier is None:
-                    raise FunctionDefNotFoundException(
-                        f'Function identifier not found:\n {child.text}')
-
-                func_defs.append(function_identifier)
-                file_stats.metrics(child, file_path)
-                metrics = file_stats.get_metrics(child)
-                df = pd.concat(
-                    [
-                        pd.DataFrame(
-                            [{
-                                "file": file_path,
-                                "function": __get_method_name(child),
-                                "project": project_name,
-                                "commit_fix": hash_name,
-                                "repo_url": repo_url,
-                                "url_issue": url_issue,
-                                "func_body": child.text.decode("utf-8"),
-                                'str_uncaught_exceptions': '',
-                                **metrics
-                            }],
-                            columns=df.columns,
-                        ),
-                        df,
-                    ],
-                    ignore_index=True,
-                )
+    func_defs: List[str] = []
+    for file_path, records in iter_file_records(files, jobs, cache, incremental, hunks, contents=contents):
+        for record in records:
+            func_defs.append(record.function)
+            file_stats.add_record(file_path, record)
+            function_index.add(file_path, record.function)
+            rows.append({
+                "file": file_path,
+                "function": record.function,
+                "project": project_name,
+                "commit_fix": hash_name,
+                "repo_url": repo_url,
+                "url_issue": url_issue,
+                "func_body": record.func_body,
+                'str_uncaught_exceptions': '',
+                **record_to_dict(record),
+                **(contents.reference(file_path, record) if sources is not None else {}),
+            })
     file_stats.num_files += len(files)
     file_stats.num_functions += len(func_defs)
-
+    if cache is not None:
+        logger.warning(f"Metrics cache: {cache.hits} hits, {cache.misses} misses")
+    if incremental is not None:
+        logger.warning(f"Incremental parsing: {incremental.reused} functions reused, "
+                       f"{incremental.recomputed} recomputed")
+    df = rows.to_dataframe()
     logger.warning(f"before call graph...")
 
     # call_graph = generate_cfg(str(project_name), os.path.normpath(
@@ -263,89 +266,150 @@ def collect_parser(files, project_name, hash_name, url_issue, repo_url):
     if call_graph is None:
         call_graph = {}
 
-    catch_nodes = {}
-    raise_nodes = {}
-    for func_name in call_graph.keys():
-        if not func_name.startswith('...'):
-            continue  # skip external libraries
-
-        names = func_name[3:].split('.')
-        if len(names) == 1:
-            continue  # skip built-in functions
-
-        module_path = '/'.join(names[0:-1])
-        func_identifier = names[-1]
-
-        query = df[(df['file'].str.contains(module_path) &
-                    df['function'].str.fullmatch(func_identifier))]
-
-        if query.empty:
-            continue
-
-        if query.iloc[0]['str_raise_identifiers']:
-            raise_nodes[func_name] = query.iloc[0]['str_raise_identifiers'].split(
-                ' ')
-        if query.iloc[0]['str_except_identifiers']:
-            catch_nodes[func_name] = query.iloc[0]['str_except_identifiers'].split(
-                ' ')
-
-    call_graph_cfg = CFG(call_graph, catch_nodes)
     logger.warning(f"before parse the nodes from call graph...")
-
-    for func_name, raise_types in raise_nodes.items():
-        # func_file_raise, func_identifier_raise = func_name_raise.split(':')
-        cfg_uncaught_exceptions = call_graph_cfg.get_uncaught_exceptions(
-            func_name, raise_types)
-        if cfg_uncaught_exceptions == {}:
-            continue
-
-        for f_full_identifier, uncaught_exceptions in cfg_uncaught_exceptions.items():
-            module_path, func_identifier = ('', '')
-            names = f_full_identifier.split('.')
-            if len(names) == 1:
-                func_identifier = names[0]
-            else:
-                module_path = names[0]
-                func_identifier = names[-1]
-
-            query = df[(df['file'].str.contains(module_path) &
-                        df['function'].str.fullmatch(func_identifier))]
-
-            if query.empty:
-                continue
-
-            idx = int(query.iloc[0].name)  # type: ignore
-
-            for uncaught_exception in uncaught_exceptions:
-                old_value = str(
-                    df.iloc[idx, df.columns.get_loc('str_uncaught_exceptions')])
-
-                # append uncaught exception
-                df.iloc[idx, df.columns.get_loc(
-                    'str_uncaught_exceptions')] = (old_value + f' {func_name}:{uncaught_exception}').strip()
+    annotate_uncaught_exceptions(df, call_graph, function_index)
 
     # func_defs_try_except = [
     #     f for f in func_defs if check_function_has_except_handler(f)
     # ]  # and not check_function_has_nested_try(f)    ]
 
     # func_defs_try_pass = [f for f in func_defs if is_try_except_pass(f)]
-    os.makedirs("output/fixes_2/", exist_ok=True)
+    if output_format == "parquet":
+        # same rows in the same order as the CSV
+        logger.warning(f"Before write to parquet: {df.shape}")
+        write_parquet(df, output, row_group_size)
+        return output
     logger.warning(f"Before write to csv: {df.shape}")
-    df.to_csv(f"output/fixes_2/{project_name}_{hash_name}_stats.csv", index=False)
+    df.to_csv(output, index=False)
+    return output
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--jobs", type=int, default=1,
+                            help="Number of processes used to parse the files")
+    arg_parser.add_argument("--cache-dir", default=None,
+                            help="Directory of the metrics cache, keyed by file content")
+    arg_parser.add_argument("--cache-size", type=int, default=1024,
+                            help="Maximum size of the metrics cache in MB")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="Re-parse the files of consecutive commits of a project incrementally")
+    arg_parser.add_argument("--no-checkout", action="store_true",
+                            help="Read the files of each commit with git cat-file instead of checking it out")
+    arg_parser.add_argument("--mirror-dir", default=None,
+                            help="Directory of the shared bare mirrors; projects/fixes/<name> become worktrees of them")
+    arg_parser.add_argument("--mirror-size", type=int, default=20480,
+                            help="Maximum size of the mirrors in MB")
+    arg_parser.add_argument("--fetch-jobs", type=int, default=4,
+                            help="Number of repositories cloned or fetched at a time, while the cloned ones are mined")
+    arg_parser.add_argument("--full-clone", action="store_true",
+                            help="Clone the whole history with blobs instead of blobless partial clones")
+    arg_parser.add_argument("--manifest", default="output/fixes_2/manifest.sqlite",
+                            help="SQLite manifest of the runs; the hashes already done are skipped")
+    arg_parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                            help="Write the rows as CSV or as Parquet (typed, compressed columns; needs pyarrow)")
+    arg_parser.add_argument("--row-group-size", type=int, default=10000,
+                            help="Number of rows per Parquet row group")
+    arg_parser.add_argument("--source-store", default=None,
+                            help="Keep the sources in a content-addressed store in this directory and write "
+                                 "(func_blob, start_byte, end_byte) instead of func_body and str_except_block")
+    args = arg_parser.parse_args()
+    if args.output_format == "parquet" and not has_pyarrow():
+        arg_parser.error("--output-format parquet needs pyarrow (pip install -r requirements-parquet.txt)")
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = MetricsCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    mirrors = None
+    if args.mirror_dir is not None:
+        mirrors = RepoCache(args.mirror_dir, args.mirror_size * 1024 * 1024)
+
+    sources = SourceStore(args.source_store) if args.source_store is not None else None
+
     projects = pd.read_csv("hashes_2.csv", sep=",")
-    hashes_list = find_hashes_in_directory(directory="/home/r4ph/desenv/phd/exception-miner/output/fixes_2/",
-                                           file_pattern='test')
+    manifest = RunManifest(args.manifest)
+    if not any(stage == "parse" for stage, _ in manifest.summary()):
+        # first run with a manifest: the outputs already there are done
+        manifest.import_finished("parse", existing_outputs("output/fixes_2"))
+    # one fetch job per repository with all its hashes, mined as soon as the repository is ready
+    rows_by_project = {}
     for index, row in projects.iterrows():
-        if row['hash'] not in hashes_list:
+        repo_url, project_name = extract_project_info(row['url_issue'])
+        if not manifest.is_finished(project_name, row['hash'], "parse"):
+            rows_by_project.setdefault(project_name, (repo_url, []))[1].append(row)
+    fetch_jobs = [FetchJob(project_name, f"{repo_url}.git",
+                           os.path.join(os.getcwd(), "projects/fixes", str(project_name)),
+                           [row['hash'] for row in rows])
+                  for project_name, (repo_url, rows) in rows_by_project.items()]
+
+    for result in iter_fetched(fetch_jobs, args.fetch_jobs, not args.full_clone, mirrors):
+        project_name = result.job.name
+        repo_url, rows = rows_by_project[project_name]
+        if result.error is not None:
+            logger.warning(f"Cannot fetch {repo_url}: {result.error}")
+            manifest.fail(project_name, "", "fetch", result.error)
+        else:
+            manifest.finish(project_name, "", "fetch", result.job.path, seconds=result.seconds)
+        repo_path = result.job.path
+        parser, last_hash, reader = None, None, None
+        if args.incremental:
+            # one tree per file of the project, edited with the diff from the last mined commit
+            parser = IncrementalParser()
+
+        # modified paths of all the hashes with one git log; the ones without .py changes are skipped.
+        # With mirrors the worktree is only added by fetch_repositories, the commits are in the mirror
+        log_path = mirrors.mirror_path(result.job.url) if mirrors is not None else repo_path
+        modified = git_modified_files(log_path, [row['hash'] for row in rows]) if os.path.isdir(log_path) else {}
+        for row in rows:
+            paths = modified.get(row['hash'])
+            if paths is None:
+                logger.warning(f"Commit {row['hash']} not found in {repo_url}")
+                manifest.fail(project_name, row['hash'], "parse", "commit not found")
+                continue
+            if not any(pathlib.Path(p).suffix == ".py" for p in paths):
+                logger.warning(f"No Python files modified in {project_name} commit {row['hash']}")
+                manifest.skip(project_name, row['hash'], "parse", "no .py changes")
+                continue
             logger.info(f"Collecting Project: {row['url_issue']} and hash : {row['hash']}")
-            repo_url, project_name = extract_project_info(row['url_issue'])
-            files = fetch_repositories(repo_url, project_name, row['hash'])
+            manifest.start(project_name, row['hash'], "parse")
+            files = fetch_repositories(repo_url, project_name, row['hash'], checkout=not args.no_checkout,
+                                       mirrors=mirrors, modified_paths=paths)
+            if files is None:
+                manifest.fail(project_name, row['hash'], "parse", "cannot get the commit")
+                continue
             if len(files) > 0:
-                collect_parser(files, project_name, row['hash'], row['url_issue'], repo_url)
+                hunks, contents = None, None
+                if parser is not None:
+                    if last_hash is not None:
+                        hunks = diff_hunks(repo_path, last_hash, row['hash'])
+                    last_hash = row['hash']
+                if args.no_checkout:
+                    # the blobs a partial clone does not have yet come in one fetch, not one per file read
+                    fetch_missing_blobs(repo_path, row['hash'], [os.path.relpath(f, repo_path) for f in files])
+                    # one cat-file process per repository, kept for all its commits
+                    if reader is None:
+                        reader = GitObjectReader(repo_path)
+                    contents = commit_contents(reader, repo_path, row['hash'])
+                try:
+                    output = collect_parser(files, project_name, row['hash'], row['url_issue'], repo_url,
+                                            args.jobs, cache, parser, hunks, contents,
+                                            args.output_format, args.row_group_size, sources)
+                except Exception as ex:
+                    logger.warning(f"Cannot mine {project_name} commit {row['hash']}: {ex}")
+                    manifest.fail(project_name, row['hash'], "parse", repr(ex))
+                    if parser is not None:
+                        parser, last_hash = IncrementalParser(), None  # its trees may be half updated
+                    continue
+                manifest.finish(project_name, row['hash'], "parse", output)
             else:
+                # all the modified .py files are symlinks or missing at this commit, a rerun cannot change it
+                manifest.skip(project_name, row['hash'], "parse", "no files to parse")
                 continue
-        else:
-            continue
+        if reader is not None:
+            reader.close()
+    if cache is not None:
+        logger.warning(f"Metrics cache: {cache.evict()} evicted")
+    if mirrors is not None:
+        logger.warning(f"Mirrors: {mirrors.evict()} evicted")
+    manifest.close()
@@ -0,0 +1,33 @@
+from typing import List
+
+import pandas as pd
+
+
+class RowAccumulator:
+    """
+    Collect rows as one list per column and build the DataFrame once at the end, instead of
+        concatenating a one row DataFrame per function (quadratic on the number of rows).
+        With reverse=True the last appended row comes first, like the old
+        pd.concat([new_row, df]) prepending.
+    """
+
+    def __init__(self, columns: List[str], reverse: bool = False):
+        self.columns = list(columns)
+        self.reverse = reverse
+        self._data = {column: [] for column in self.columns}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row: dict):
+        for column, values in self._data.items():
+            values.append(row.get(column))
+        self._size += 1
+
+    def to_dataframe(self) -> pd.DataFrame:
+        if self.reverse:
+            data = {column: values[::-1] for column, values in self._data.items()}
+        else:
+            data = self._data
+        return pd.DataFrame(data, columns=self.columns)
@@ -64,4 +64,130 @@
 #            ├── RuntimeWarning
 #            ├── SyntaxWarning
 #            ├── UnicodeWarning
-#            └── UserWarning
\ No newline at end of file
+#            └── UserWarning
+
+# the tree above as (exception, parents), parents before their subclasses
+BUILTIN_EXCEPTIONS = (
+    ("BaseException", ()),
+    ("BaseExceptionGroup", ("BaseException",)),
+    ("GeneratorExit", ("BaseException",)),
+    ("KeyboardInterrupt", ("BaseException",)),
+    ("SystemExit", ("BaseException",)),
+    ("Exception", ("BaseException",)),
+    ("ArithmeticError", ("Exception",)),
+    ("FloatingPointError", ("ArithmeticError",)),
+    ("OverflowError", ("ArithmeticError",)),
+    ("ZeroDivisionError", ("ArithmeticError",)),
+    ("AssertionError", ("Exception",)),
+    ("AttributeError", ("Exception",)),
+    ("BufferError", ("Exception",)),
+    ("EOFError", ("Exception",)),
+    ("ExceptionGroup", ("Exception", "BaseExceptionGroup")),
+    ("ImportError", ("Exception",)),
+    ("ModuleNotFoundError", ("ImportError",)),
+    ("LookupError", ("Exception",)),
+    ("IndexError", ("LookupError",)),
+    ("KeyError", ("LookupError",)),
+    ("MemoryError", ("Exception",)),
+    ("NameError", ("Exception",)),
+    ("UnboundLocalError", ("NameError",)),
+    ("OSError", ("Exception",)),
+    ("BlockingIOError", ("OSError",)),
+    ("ChildProcessError", ("OSError",)),
+    ("ConnectionError", ("OSError",)),
+    ("BrokenPipeError", ("ConnectionError",)),
+    ("ConnectionAbortedError", ("ConnectionError",)),
+    ("ConnectionRefusedError", ("ConnectionError",)),
+    ("ConnectionResetError", ("ConnectionError",)),
+    ("FileExistsError", ("OSError",)),
+    ("FileNotFoundError", ("OSError",)),
+    ("InterruptedError", ("OSError",)),
+    ("IsADirectoryError", ("OSError",)),
+    ("NotADirectoryError", ("OSError",)),
+    ("PermissionError", ("OSError",)),
+    ("ProcessLookupError", ("OSError",)),
+    ("TimeoutError", ("OSError",)),
+    ("ReferenceError", ("Exception",)),
+    ("RuntimeError", ("Exception",)),
+    ("NotImplementedError", ("RuntimeError",)),
+    ("RecursionError", ("RuntimeError",)),
+    ("StopAsyncIteration", ("Exception",)),
+    ("StopIteration", ("Exception",)),
+    ("SyntaxError", ("Exception",)),
+    ("IndentationError", ("SyntaxError",)),
+    ("TabError", ("IndentationError",)),
+    ("SystemError", ("Exception",)),
+    ("TypeError", ("Exception",)),
+    ("ValueError", ("Exception",)),
+    ("UnicodeError", ("ValueError",)),
+    ("UnicodeDecodeError", ("UnicodeError",)),
+    ("UnicodeEncodeError", ("UnicodeError",)),
+    ("UnicodeTranslateError", ("UnicodeError",)),
+    ("Warning", ("Exception",)),
+    ("BytesWarning", ("Warning",)),
+    ("DeprecationWarning", ("Warning",)),
+    ("EncodingWarning", ("Warning",)),
+    ("FutureWarning", ("Warning",)),
+    ("ImportWarning", ("Warning",)),
+    ("PendingDeprecationWarning", ("Warning",)),
+    ("ResourceWarning", ("Warning",)),
+    ("RuntimeWarning", ("Warning",)),
+    ("SyntaxWarning", ("Warning",)),
+    ("UnicodeWarning", ("Warning",)),
+    ("UserWarning", ("Warning",)),
+)
+
+# other names of the builtin exceptions
+BUILTIN_ALIASES = {
+    "EnvironmentError": "OSError",
+    "IOError": "OSError",
+    "WindowsError": "OSError",
+}
+
+EXCEPTION_IDS = {}
+ANCESTOR_MASKS = {}
+for _name, _parents in BUILTIN_EXCEPTIONS:
+    EXCEPTION_IDS[_name] = len(EXCEPTION_IDS)
+    ANCESTOR_MASKS[_name] = 1 << EXCEPTION_IDS[_name]
+    for _parent in _parents:
+        ANCESTOR_MASKS[_name] |= ANCESTOR_MASKS[_parent]
+for _alias, _name in BUILTIN_ALIASES.items():
+    EXCEPTION_IDS[_alias] = EXCEPTION_IDS[_name]
+    ANCESTOR_MASKS[_alias] = ANCESTOR_MASKS[_name]
+del _name, _parents, _alias
+
+
+class ExceptionHierarchy:
+    """
+    Exception names as int ids with the bitmask of the exception and its ancestors, so
+        "is X caught by the handlers H" is ancestors(X) & handler_mask(H). Starts with the
+        builtin exceptions; any other name gets a new id on first use and is taken as a
+        direct subclass of Exception (the usual base of user exceptions).
+    """
+
+    def __init__(self):
+        self.ids = dict(EXCEPTION_IDS)
+        self.masks = dict(ANCESTOR_MASKS)
+        self._next_id = len(BUILTIN_EXCEPTIONS)
+
+    def ancestors(self, name: str) -> int:
+        mask = self.masks.get(name)
+        if mask is None:
+            self.ids[name] = self._next_id
+            mask = self.masks[name] = (1 << self._next_id) | ANCESTOR_MASKS["Exception"]
+            self._next_id += 1
+        return mask
+
+    def handler_mask(self, names) -> int:
+        """Bits of the exceptions handled by `except` clauses of names"""
+        mask = 0
+        for name in names:
+            self.ancestors(name)
+            mask |= 1 << self.ids[name]
+        return mask
+
+    def is_caught(self, name: str, handler_mask: int) -> bool:
+        return bool(self.ancestors(name) & handler_mask)
+
+    def is_subclass(self, name: str, parent: str) -> bool:
+        return self.is_caught(name, self.handler_mask((parent,)))
@@ -1,18 +1,40 @@
 import glob
-import json
 import os
-import subprocess
 
 from tqdm import tqdm
 
+from miner_py_src.builtin import ExceptionHierarchy
+from miner_py_src.call_graph_cache import CallGraphCache, call_graph_key, repo_head
+from miner_py_src.compact_graph import CompactCallGraph
 from miner_py_src.exceptions import CallGraphError
+from miner_py_src.pycg_json import load_call_graph, load_call_graphs, merge_call_graphs, peak_rss_mb
+from miner_py_src.pycg_shard import (has_pycg_api, pycg_call_graph_shards, run_pycg_shards,
+                                     shard_files)
 
 
-def generate_cfg(project_name, project_folder, files=[]):
+def generate_cfg(project_name, project_folder, files=[], jobs=1, backend=None, cache: CallGraphCache = None):
+    """
+    Call graph of the project by PyCG. With jobs > 1 the files are split in shards by top level
+        package (see shard_files), PyCG runs on jobs shards at a time and their graphs are
+        merged by function name. A call PyCG leaves unresolved in a shard because the function
+        is in another shard is rewritten to that function (see pycg_json.qualified_names).
+        backend 'api' calls PyCG in process (in a process pool for the shards) and 'subprocess'
+        runs the pycg command (from project_folder); the default is 'api' when pycg can be
+        imported. Neither changes the working directory of this process: the module names are
+        relative to <project_folder>/<project_name>.
+        With a cache, the graph is looked up by the commit of project_folder, the files and the
+        PyCG version and flags (see call_graph_key) and PyCG only runs on a miss.
+    """
+    if backend is None:
+        backend = 'api' if has_pycg_api() else 'subprocess'
+    if backend not in ('api', 'subprocess'):
+        raise ValueError(f"unknown PyCG backend {backend!r}")
+
     current_path = os.getcwd()
-    os.makedirs(
-        f'{current_path}/output/call_graph/{project_name}', exist_ok=True)
-    os.chdir(os.path.normpath(os.path.join(project_folder)))
+    output_folder = f'{current_path}/output/call_graph/{project_name}'
+    os.makedirs(output_folder, exist_ok=True)
+    project_root = os.path.abspath(os.path.normpath(project_folder))
+    package = os.path.join(project_root, str(project_name))
 
     tqdm.write(f"Generating call graph for {project_name}...")
 
@@ -24,79 +46,175 @@ def generate_cfg(project_name, project_folder, files=[]):
     #python_src_files = project_src_base
 
     if len(files) > 0:
-        python_src_files = files
+        python_src_files = [os.path.join(project_root, x) for x in files]
 
     else:
-        python_src_files = [os.path.abspath(x)
-                            for x in glob.iglob("./**/*.py", recursive=True)
+        python_src_files = [x for x in glob.iglob(os.path.join(project_root, "**/*.py"), recursive=True)
                             if os.path.isfile(x)]
 
         if len(python_src_files) == 0:
             raise CallGraphError("No python files found")
 
     tqdm.write(f'found {len(python_src_files)} files')
-    tqdm.write('Running PyCG...')
 
-    args = [
-        'pycg',
-        *python_src_files,
-        '--package', project_name,
-        '--max-iter', '1',
-        '--output', f'{current_path}/output/call_graph/{project_name}/call_graph.json']
+    cache_key = None
+    if cache is not None:
+        commit = repo_head(project_root)
+        if commit is not None:
+            cache_key = call_graph_key(commit, python_src_files, project_root,
+                                       package=project_name, max_iter=1, jobs=max(jobs, 1))
+            call_graph = cache.get(cache_key)
+            if call_graph is not None:
+                tqdm.write(f'Call graph cache hit ({commit[:8]}): {len(call_graph)} functions')
+                return call_graph
+
+    shards = shard_files(python_src_files, project_root, jobs)
+
+    tqdm.write(f'Running PyCG ({backend}) on {len(shards)} shard(s)...')
+
+    if backend == 'api':
+        call_graph = merge_call_graphs(pycg_call_graph_shards(shards, package, project_root, jobs))
+        tqdm.write('PyCG finished')
+    else:
+        call_graph = _run_pycg_command(shards, package, project_root, output_folder, jobs)
+
+    if cache_key is not None:
+        cache.put(cache_key, call_graph)
 
-    # TODO: Paralelize? (Too Slow Here...)
-    proc = subprocess.run(args, stdout=subprocess.PIPE,
-                          stderr=subprocess.PIPE)
+    peak_rss = peak_rss_mb()
+    tqdm.write(f'Loaded call graph: {len(call_graph)} functions, {call_graph.num_edges} calls'
+               + (f' (peak RSS {peak_rss:.0f} MB)' if peak_rss is not None else ''))
+
+    return call_graph
+
+
+def _run_pycg_command(shards, package, project_root, output_folder, jobs):
+    results = run_pycg_shards(shards, package, output_folder, jobs, cwd=project_root)
 
     tqdm.write('PyCG finished')
 
-    if (proc.returncode != 0):
-        raise CallGraphError(proc.stderr.decode('utf-8'))
+    for result in results:
+        if (result.returncode != 0):
+            raise CallGraphError(result.stderr.decode('utf-8'))
 
     try:
-        open(f'{current_path}/output/call_graph/{project_name}/stdout.txt', 'w').write(
-            proc.stdout.decode('utf-8'))
+        open(f'{output_folder}/stdout.txt', 'w').write(
+            ''.join(result.stdout.decode('utf-8') for result in results))
     except IOError as e:
         tqdm.write('Could not write stdout.txt')
         tqdm.write(e.strerror)
 
     try:
-        open(f'{current_path}/output/call_graph/{project_name}/stderr.txt', 'w').write(
-            proc.stderr.decode('utf-8'))
+        open(f'{output_folder}/stderr.txt', 'w').write(
+            ''.join(result.stderr.decode('utf-8') for result in results))
     except IOError as e:
         tqdm.write('Could not write stderr.txt')
         tqdm.write(e.strerror)
 
-    os.chdir(current_path)
-
-    json_obj = json.load(
-        open(f'{current_path}/output/call_graph/{project_name}/call_graph.json'))
-    call_graph = {}
-    for func_name, calls in json_obj.items():
-        if func_name not in call_graph.keys():
-            call_graph[func_name] = {
-                'calls': [],
-                'called_by': [],
-            }
-
-        for call in calls:
-            call_graph[func_name]['calls'].append(call)
-
-            if call not in call_graph.keys():
-                call_graph[call] = {
-                    'calls': [],
-                    'called_by': [],
-                }
-            call_graph[call]['called_by'] = call_graph[call]['called_by'] or []
-            call_graph[call]['called_by'].append(func_name)
+    if len(results) == 1:
+        return load_call_graph(results[0].output_path)
+    return load_call_graphs([result.output_path for result in results])
 
-    return call_graph
+
+def strongly_connected_components(nodes, successors) -> list:
+    """
+    Strongly connected components (iterative Tarjan) of the graph given by nodes and
+        successors(node), in reverse topological order: every component comes after the
+        components it reaches.
+    """
+    index, lowlink, on_stack = {}, {}, set()
+    stack, components = [], []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, edges = work[-1]
+            for succ in edges:
+                if succ not in index:
+                    index[succ] = lowlink[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    break
+                if succ in on_stack and index[succ] < lowlink[node]:
+                    lowlink[node] = index[succ]
+            else:
+                work.pop()
+                if work and lowlink[node] < lowlink[work[-1][0]]:
+                    lowlink[work[-1][0]] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+class ExceptionPropagation():
+    """
+    Result of CFG.propagate_exceptions: for every function the exception types that can escape
+        it, each one with a bitset over the raisers of that type (see escaping).
+    """
+
+    def __init__(self, raisers, escaping):
+        self.raisers = raisers
+        self._escaping = escaping
+
+    def __iter__(self):
+        return iter(self._escaping)
+
+    def __len__(self):
+        return len(self._escaping)
+
+    def __contains__(self, func_name):
+        return func_name in self._escaping
+
+    def exceptions(self, func_name: str) -> set:
+        return set(self._escaping.get(func_name, ()))
+
+    def escaping(self, func_name: str) -> dict:
+        """{exception type: [raisers]} of the exceptions that can escape func_name"""
+        result = {}
+        for raise_type, bits in self._escaping.get(func_name, {}).items():
+            raisers = self.raisers[raise_type]
+            result[raise_type] = [raisers[bit] for bit in range(bits.bit_length()) if bits >> bit & 1]
+        return result
 
 
 class CFG():
-    def __init__(self, graph, catch_nodes):
+    def __init__(self, graph, catch_nodes, hierarchy: ExceptionHierarchy = None):
         self.catch_nodes = catch_nodes
         self.graph = graph
+        self.hierarchy = hierarchy or ExceptionHierarchy()
+        self._handler_masks = {}
+        self._compact = graph if isinstance(graph, CompactCallGraph) else None
+
+    @property
+    def compact_graph(self) -> CompactCallGraph:
+        """The graph as a CompactCallGraph (dict graphs are converted on first use)"""
+        if self._compact is None:
+            self._compact = CompactCallGraph.from_dict(self.graph)
+        return self._compact
+
+    def handler_mask(self, func_name: str) -> int:
+        """Bits of the exceptions caught by func_name (see ExceptionHierarchy)"""
+        mask = self._handler_masks.get(func_name)
+        if mask is None:
+            mask = self._handler_masks[func_name] = self.hierarchy.handler_mask(
+                self.catch_nodes.get(func_name, ()))
+        return mask
+
+    def is_caught(self, func_name: str, raise_type: str) -> bool:
+        """Whether func_name catches raise_type, itself or one of its base classes"""
+        return bool(self.hierarchy.ancestors(raise_type) & self.handler_mask(func_name))
 
     # def get_uncaught_exceptions(self, func_name: str, raise_types: list[str]) -> dict[str, list[str]]:
     def get_uncaught_exceptions(self, func_name: str, raise_types: list) -> dict:
@@ -114,12 +232,151 @@ class CFG():
                 export_data[called_by] = raise_types
                 continue
 
-            for raise_type in raise_types:
-                if raise_type not in self.catch_nodes[called_by]:
-                    if called_by not in export_data.keys():
-                        export_data[called_by] = []
+            uncaught = [raise_type for raise_type in dict.fromkeys(raise_types)
+                        if not self.is_caught(called_by, raise_type)]
+            if uncaught:
+                export_data[called_by] = uncaught
 
-                    export_data[called_by].append(raise_type)
-                    export_data[called_by] = list(set(export_data[called_by]))
+        return export_data
 
+    def strongly_connected_components(self) -> list:
+        """Strongly connected components of the call graph, callees before callers"""
+        graph = self.compact_graph
+        return [[graph.names[node] for node in component]
+                for component in strongly_connected_components(range(len(graph)), graph.calls)]
+
+    def propagate_exceptions(self, raise_nodes: dict) -> ExceptionPropagation:
+        """
+        Exceptions that can escape every function for the exceptions raised by raise_nodes
+            ({raiser: exception types}). An exception leaves a caller unless the caller
+            catches that type or one of its base classes. For each exception type the callers reached from its raisers
+            are collapsed into strongly connected components (the calls of the functions that
+            catch the type are cut, so a whole component lets the same raisers escape) and
+            the condensed DAG is walked callees first, with the raisers as int bitsets.
+        """
+        raisers = {}
+        for raiser, raise_types in raise_nodes.items():
+            for raise_type in dict.fromkeys(raise_types):
+                raisers.setdefault(raise_type, []).append(raiser)
+
+        graph = self.compact_graph
+        handler_masks = {graph.ids[node]: self.handler_mask(node)
+                         for node in self.catch_nodes if node in graph.ids}
+        escaping = {}
+        for raise_type, type_raisers in raisers.items():
+            ancestors = self.hierarchy.ancestors(raise_type)
+
+            def passes(node):
+                return not ancestors & handler_masks.get(node, 0)
+
+            own = {}
+            for bit, raiser in enumerate(type_raisers):
+                if raiser in graph.ids:
+                    own[graph.ids[raiser]] = 1 << bit
+                else:
+                    escaping.setdefault(raiser, {})[raise_type] = 1 << bit  # no callers
+
+            # the callers that may receive the exception, not going past the ones catching it
+            reached = set(own)
+            pending = list(own)
+            while pending:
+                node = pending.pop()
+                for caller in graph.called_by(node):
+                    if caller not in reached:
+                        reached.add(caller)
+                        if passes(caller):
+                            pending.append(caller)
+
+            def successors(node):
+                if not passes(node):
+                    return ()
+                return [call for call in graph.calls(node) if call in reached]
+
+            bits = {}
+            for component in strongly_connected_components(reached, successors):
+                value = 0
+                for node in component:
+                    value |= own.get(node, 0)
+                    for call in successors(node):
+                        value |= bits.get(call, 0)  # 0 for the members of this component
+                for node in component:
+                    bits[node] = value
+                    if value:
+                        escaping.setdefault(graph.names[node], {})[raise_type] = value
+
+        return ExceptionPropagation(raisers, escaping)
+
+    def get_transitive_uncaught_exceptions(self, raise_nodes: dict) -> dict:
+        """
+        Like get_uncaught_exceptions for every raiser at once, but following the callers up
+            the whole graph: {function: {raiser: [exception types escaping the function]}}
+            for the functions other than the raiser itself.
+        """
+        export_data = {}
+        propagation = self.propagate_exceptions(raise_nodes)
+        for func_name in propagation:
+            for raise_type, raisers in propagation.escaping(func_name).items():
+                for raiser in raisers:
+                    if raiser != func_name:
+                        export_data.setdefault(func_name, {}).setdefault(raiser, []).append(raise_type)
         return export_data
+
+
+def annotate_uncaught_exceptions(df, call_graph, function_index, transitive=False):
+    """
+    Fill df['str_uncaught_exceptions'] with '<raise node>:<exception>' entries for the callers
+        that do not handle the exceptions raised by the functions they call. The call graph
+        nodes are matched to rows by module and function name with function_index (see
+        FunctionIndex.find). With transitive=True the exceptions are followed through all the
+        callers that let them escape, not only the direct ones.
+    """
+    raise_identifiers = df['str_raise_identifiers'].tolist()
+    except_identifiers = df['str_except_identifiers'].tolist()
+
+    catch_nodes = {}
+    raise_nodes = {}
+    for func_name in call_graph.keys():
+        if not func_name.startswith('...'):
+            continue  # skip external libraries
+
+        names = func_name[3:].split('.')
+        if len(names) == 1:
+            continue  # skip built-in functions
+
+        row_id = function_index.find('.'.join(names[0:-1]), names[-1])
+        if row_id is None:
+            continue
+
+        if raise_identifiers[row_id]:
+            raise_nodes[func_name] = raise_identifiers[row_id].split(' ')
+        if except_identifiers[row_id]:
+            catch_nodes[func_name] = except_identifiers[row_id].split(' ')
+
+    call_graph_cfg = CFG(call_graph, catch_nodes)
+
+    if transitive:
+        callers_uncaught = call_graph_cfg.get_transitive_uncaught_exceptions(raise_nodes)
+        edges = ((raiser, caller, raise_types)
+                 for caller, raisers in sorted(callers_uncaught.items())
+                 for raiser, raise_types in sorted(raisers.items()))
+    else:
+        edges = ((func_name, caller, raise_types)
+                 for func_name, raise_types in raise_nodes.items()
+                 for caller, raise_types in call_graph_cfg.get_uncaught_exceptions(
+                     func_name, raise_types).items())
+
+    uncaught = {}
+    for func_name, f_full_identifier, uncaught_exceptions in edges:
+        names = f_full_identifier.lstrip('.').split('.')
+
+        row_id = function_index.find('.'.join(names[0:-1]), names[-1])
+        if row_id is None:
+            continue
+
+        uncaught.setdefault(row_id, []).extend(
+            f'{func_name}:{uncaught_exception}' for uncaught_exception in uncaught_exceptions)
+
+    column = df['str_uncaught_exceptions'].tolist()
+    for row_id, values in uncaught.items():
+        column[row_id] = (str(column[row_id]) + ' ' + ' '.join(values)).strip()
+    df['str_uncaught_exceptions'] = column
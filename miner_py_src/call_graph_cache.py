@@ -0,0 +1,66 @@
+import hashlib
+import os
+import subprocess
+from importlib import metadata
+
+from .compact_graph import CompactCallGraph
+from .metrics_cache import PickleEntries
+
+# bump when generate_cfg builds a different graph from the same PyCG output
+CALL_GRAPH_VERSION = 1
+
+
+def repo_head(folder: str) -> str:
+    """Commit SHA checked out in folder, None if it is not a git repository or has local changes"""
+    try:
+        head = subprocess.run(['git', '-C', folder, 'rev-parse', 'HEAD'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        status = subprocess.run(['git', '-C', folder, 'status', '--porcelain', '--untracked-files=no'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    if status.stdout.strip():
+        return None
+    return head.stdout.decode('utf-8').strip()
+
+
+def pycg_version() -> str:
+    try:
+        return metadata.version('pycg')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def call_graph_key(commit: str, files: list, root: str, **flags) -> str:
+    """Hash of the commit, the sorted input files (relative to root), the PyCG version and flags"""
+    key = hashlib.sha1()
+    key.update(f'v{CALL_GRAPH_VERSION}\0{pycg_version()}\0{commit}\0'.encode('utf-8'))
+    for name, value in sorted(flags.items()):
+        key.update(f'{name}={value}\0'.encode('utf-8'))
+    for file_path in sorted(os.path.relpath(f, root) for f in files):
+        key.update(file_path.encode('utf-8') + b'\0')
+    return key.hexdigest()
+
+
+class CallGraphCache(PickleEntries):
+    """
+    On-disk cache of the call graphs built by generate_cfg, keyed by call_graph_key. A hit
+        skips PyCG completely. Writes are atomic, so several miners can share the directory.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> CompactCallGraph:
+        graph = self._load(key)
+        if graph is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return graph
+
+    def put(self, key: str, graph: CompactCallGraph):
+        self._dump(key, graph)
@@ -0,0 +1,102 @@
+import importlib.util
+import os
+from typing import List
+
+# columns with few distinct values, stored once per row group with an index per row
+DICTIONARY_COLUMNS = frozenset(("file", "project", "commit_fix", "repo_url", "url_issue", "func_blob"))
+
+INT_COLUMNS = frozenset(("start_byte", "end_byte"))
+
+
+def has_pyarrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def column_types(columns: List[str]) -> dict:
+    """Arrow type of the columns of the miners' rows: int32 counters (n_*), int64 offsets and strings"""
+    import pyarrow as pa
+
+    types = {}
+    for column in columns:
+        if column.startswith("n_"):
+            types[column] = pa.int32()
+        elif column in INT_COLUMNS:
+            types[column] = pa.int64()
+        elif column in DICTIONARY_COLUMNS:
+            types[column] = pa.dictionary(pa.int32(), pa.string())
+        else:
+            types[column] = pa.string()
+    return types
+
+
+class ParquetRowWriter:
+    """
+    Write rows (dicts, like RowAccumulator.append) to a Parquet file, row_group_size rows
+        at a time, so the rows are not all kept in memory. The n_* columns are int32,
+        DICTIONARY_COLUMNS are dictionary encoded (categorical with pd.read_parquet) and the
+        pages are compressed with compression. The rows are written in the order they are
+        appended. Needs pyarrow.
+    """
+
+    def __init__(self, path: str, columns: List[str], row_group_size: int = 10000, compression: str = "zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.columns = list(columns)
+        self.row_group_size = max(row_group_size, 1)
+        self.rows = 0
+        self._types = column_types(self.columns)
+        self._schema = pa.schema([(column, self._types[column]) for column in self.columns])
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+        self._data = {column: [] for column in self.columns}
+        self._size = 0
+
+    def __len__(self):
+        return self.rows + self._size
+
+    def append(self, row: dict):
+        for column, values in self._data.items():
+            values.append(row.get(column))
+        self._size += 1
+        if self._size >= self.row_group_size:
+            self.flush()
+
+    def write_dataframe(self, df):
+        """Append the rows of a DataFrame with (at least) the writer columns"""
+        for start in range(0, len(df), self.row_group_size):
+            self._write({column: df[column].iloc[start:start + self.row_group_size].tolist()
+                         for column in self.columns})
+
+    def flush(self):
+        if self._size:
+            self._write(self._data)
+            self._data = {column: [] for column in self.columns}
+            self._size = 0
+
+    def _write(self, data: dict):
+        import pyarrow as pa
+
+        arrays = [pa.array(data[column], type=self._types[column]) for column in self.columns]
+        table = pa.Table.from_arrays(arrays, schema=self._schema)
+        self._writer.write_table(table, row_group_size=table.num_rows)
+        self.rows += table.num_rows
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_parquet(df, path: str, row_group_size: int = 10000, compression: str = "zstd") -> str:
+    """Write a DataFrame of miner rows with ParquetRowWriter"""
+    with ParquetRowWriter(path, list(df.columns), row_group_size, compression) as writer:
+        writer.write_dataframe(df)
+    return path
@@ -0,0 +1,121 @@
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def _csr(keys: array, values: array, size: int):
+    """Offsets and values of the (key, value) pairs grouped by key, keeping their order"""
+    keys_np = np.frombuffer(keys, dtype=np.int32) if len(keys) else np.zeros(0, dtype=np.int32)
+    values_np = np.frombuffer(values, dtype=np.int32) if len(values) else np.zeros(0, dtype=np.int32)
+
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys_np, minlength=size), out=offsets[1:])
+    grouped = values_np[np.argsort(keys_np, kind='stable')]
+
+    offsets_array, values_array = array('q'), array('i')
+    offsets_array.frombytes(offsets.tobytes())
+    values_array.frombytes(grouped.astype(np.int32).tobytes())
+    return offsets_array, values_array
+
+
+class CompactCallGraph(Mapping):
+    """
+    Call graph with the function names interned to int ids (in the order they were first seen)
+        and the calls and callers of every function in CSR arrays. As a mapping it is a read only
+        view like the generate_cfg dict: graph[name] == {'calls': [...], 'called_by': [...]}.
+        The int API (ids, names, calls, called_by) is the one to use for whole graph passes.
+    """
+
+    def __init__(self, names: list, sources: array, targets: array, ids: dict = None):
+        self.names = names
+        self.ids = ids if ids is not None else {name: node for node, name in enumerate(names)}
+        self.call_offsets, self.call_targets = _csr(sources, targets, len(names))
+        self.caller_offsets, self.caller_sources = _csr(targets, sources, len(names))
+
+    @classmethod
+    def from_dict(cls, graph: dict) -> 'CompactCallGraph':
+        """Graph from a generate_cfg style dict (callers only listed in 'called_by' are kept)"""
+        builder = CallGraphBuilder()
+        for func_name, node in graph.items():
+            builder.add_calls(func_name, node['calls'])
+        for func_name, node in graph.items():
+            for caller in node['called_by']:
+                if caller not in graph or func_name not in graph[caller]['calls']:
+                    builder.add_calls(caller, [func_name])
+        return builder.build()
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.call_targets)
+
+    def calls(self, node: int) -> array:
+        return self.call_targets[self.call_offsets[node]:self.call_offsets[node + 1]]
+
+    def called_by(self, node: int) -> array:
+        return self.caller_sources[self.caller_offsets[node]:self.caller_offsets[node + 1]]
+
+    def edges(self):
+        """(sources, targets) arrays of the calls, grouped by caller"""
+        counts = np.diff(np.frombuffer(self.call_offsets, dtype=np.int64))
+        sources = array('i')
+        sources.frombytes(np.repeat(np.arange(len(self.names), dtype=np.int32), counts).tobytes())
+        return sources, array('i', self.call_targets)
+
+    def __reduce__(self):
+        # the ids and the callers arrays are rebuilt on load
+        return CompactCallGraph, (self.names, *self.edges())
+
+    def nbytes(self) -> int:
+        """Size of the adjacency arrays (the names and ids are not counted)"""
+        return sum(a.itemsize * len(a) for a in (self.call_offsets, self.call_targets,
+                                                  self.caller_offsets, self.caller_sources))
+
+    def __getitem__(self, func_name: str) -> dict:
+        node = self.ids[func_name]
+        return {
+            'calls': [self.names[call] for call in self.calls(node)],
+            'called_by': [self.names[caller] for caller in self.called_by(node)],
+        }
+
+    def __contains__(self, func_name) -> bool:
+        return func_name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def to_dict(self) -> dict:
+        return {func_name: self[func_name] for func_name in self.names}
+
+
+class CallGraphBuilder:
+    """Collect the calls of each function as int edges, then build a CompactCallGraph"""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.sources = array('i')
+        self.targets = array('i')
+
+    def node(self, func_name: str) -> int:
+        node = self.ids.get(func_name)
+        if node is None:
+            node = self.ids[func_name] = len(self.names)
+            self.names.append(func_name)
+        return node
+
+    def add_calls(self, func_name: str, calls):
+        source = self.node(func_name)
+        ids, node = self.ids, self.node
+        targets = [ids[call] if call in ids else node(call) for call in calls]
+        self.sources.extend([source] * len(targets))
+        self.targets.extend(targets)
+
+    def build(self) -> CompactCallGraph:
+        graph = CompactCallGraph(self.names, self.sources, self.targets, self.ids)
+        self.names, self.ids = [], {}
+        self.sources, self.targets = array('i'), array('i')
+        return graph
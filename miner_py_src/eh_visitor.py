@@ -0,0 +1,269 @@
+from tree_sitter.binding import Node
+
+# bump when a metric changes, invalidates the metrics cache
+METRICS_VERSION = 2
+
+METRIC_NAMES = [
+    "n_try_except",
+    "n_try_pass",
+    "n_finally",
+    "n_generic_except",
+    "n_raise",
+    "n_captures_broad_raise",
+    "n_captures_try_except_raise",
+    "n_captures_misplaced_bare_raise",
+    "n_try_else",
+    "n_try_return",
+    "str_except_identifiers",
+    "str_raise_identifiers",
+    "str_except_block",
+    "n_nested_try",
+    "n_bare_except",
+    "n_bare_raise_finally",
+]
+
+
+class _Frame:
+    __slots__ = ("type", "block_seen", "candidates", "broad", "captured", "generic",
+                 "has_pass", "identifiers", "ignore", "tries", "counted")
+
+    def __init__(self, node_type: str):
+        self.type = node_type
+        self.block_seen = False
+        self.candidates = 0
+        self.broad = False
+        self.captured = False
+        self.generic = False
+        self.has_pass = False
+        self.identifiers = None
+        self.ignore = None
+        self.tries = 0
+        self.counted = False
+
+
+_LEAVE_TYPES = frozenset(
+    ("except_clause", "try_statement", "function_definition", "finally_clause"))
+
+
+class ExceptionHandlingVisitor:
+    """
+    Compute every exception handling metric of a function definition walking its
+    subtree once with a TreeCursor. The values match the query based helpers in
+    miner_py_utils (count_raise, get_except_identifiers, is_bare_except, ...).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n_try = 0
+        self.n_try_except = 0
+        self.n_try_pass = 0
+        self.n_finally = 0
+        self.n_generic_except = 0
+        self.n_raise = 0
+        self.n_captures_broad_raise = 0
+        self.n_captures_try_except_raise = 0
+        self.n_captures_misplaced_bare_raise = 0
+        self.n_try_else = 0
+        self.n_try_return = 0
+        self.n_nested_try = 0
+        self.n_bare_except = 0
+        self.n_bare_raise_finally = 0
+        self.raise_identifiers = []
+        self.except_blocks = []
+
+        self._stack = []
+        self._except_slots = []
+        self._except_stack = []
+        self._try_stack = []
+        self._scope_stack = []
+        self._candidate = None
+
+    def visit(self, func_def: Node) -> dict:
+        self.reset()
+        stack = self._stack
+        cursor = func_def.walk()
+        while True:
+            frame = self._enter(cursor.node)
+            stack.append(frame)
+            if cursor.goto_first_child():
+                continue
+            while True:
+                frame = stack.pop()
+                if frame.type in _LEAVE_TYPES or frame is self._candidate:
+                    self._leave(frame)
+                if cursor.goto_next_sibling():
+                    break
+                if not cursor.goto_parent():
+                    return self.to_dict()
+
+    @property
+    def except_identifiers(self) -> list:
+        return [identifier for slot in self._except_slots for identifier in slot]
+
+    def to_dict(self) -> dict:
+        return {
+            "n_try_except": self.n_try_except,
+            "n_try_pass": self.n_try_pass,
+            "n_finally": self.n_finally,
+            "n_generic_except": self.n_generic_except,
+            "n_raise": self.n_raise,
+            "n_captures_broad_raise": self.n_captures_broad_raise,
+            "n_captures_try_except_raise": self.n_captures_try_except_raise,
+            "n_captures_misplaced_bare_raise": self.n_captures_misplaced_bare_raise,
+            "n_try_else": self.n_try_else,
+            "n_try_return": self.n_try_return,
+            "str_except_identifiers": " ".join(self.except_identifiers),
+            "str_raise_identifiers": " ".join(self.raise_identifiers),
+            "str_except_block": " ".join(self.except_blocks),
+            "n_nested_try": self.n_nested_try,
+            "n_bare_except": self.n_bare_except,
+            "n_bare_raise_finally": self.n_bare_raise_finally
+        }
+
+    def _enter(self, node: Node) -> _Frame:
+        stack = self._stack
+        node_type = node.type
+        frame = _Frame(node_type)
+        parent = stack[-1] if stack else None
+
+        # children of an except clause before its block are the except expressions
+        # (same as QUERY_EXCEPT_EXPRESSION). The queries run over the whole clause, so
+        # the expressions of nested clauses also count for every enclosing clause.
+        if parent is not None and parent.type == "except_clause" and not parent.block_seen:
+            if node_type == "block":
+                parent.block_seen = True
+                if parent.candidates:
+                    for except_frame in self._except_stack:
+                        except_frame.captured = True
+                        except_frame.generic = except_frame.generic or parent.broad
+                        if except_frame is not parent:
+                            except_frame.identifiers.extend(parent.identifiers)
+                else:
+                    del parent.identifiers[:]
+                self.except_blocks.append(node.text.decode("utf-8"))
+            elif node.is_named:
+                parent.candidates += 1
+                try:
+                    frame.ignore = node.text.decode(
+                        "utf-8").split("as")[1].strip()
+                except IndexError:
+                    frame.ignore = None
+                self._candidate = frame
+
+        if node_type == "identifier":
+            if self._candidate is not None:
+                except_frame = self._except_stack[-1]
+                identifier = node.text.decode("utf-8")
+                if identifier == "Exception":
+                    except_frame.broad = True
+                if identifier != self._candidate.ignore:
+                    except_frame.identifiers.append(identifier)
+
+        elif node_type == "except_clause":
+            self.n_try_except += 1
+            frame.identifiers = []
+            self._except_slots.append(frame.identifiers)
+            self._except_stack.append(frame)
+            self._scope_stack.append(node_type)
+
+        elif node_type == "pass_statement":
+            if parent is not None and parent.type == "block":
+                for except_frame in self._except_stack:
+                    except_frame.has_pass = True
+
+        elif node_type == "return_statement":
+            if (parent is not None and parent.type == "block" and not parent.counted
+                    and len(stack) > 1 and stack[-2].type == "try_statement"):
+                parent.counted = True
+                self.n_try_return += 1
+
+        elif node_type == "raise_statement":
+            self._enter_raise(node, parent)
+
+        elif node_type == "try_statement":
+            self.n_try += 1
+            self._try_stack.append(frame)
+
+        elif node_type == "else_clause":
+            if parent is not None and parent.type == "try_statement":
+                self.n_try_else += 1
+
+        elif node_type == "finally_clause":
+            self.n_finally += 1
+            self._scope_stack.append(node_type)
+
+        elif node_type == "function_definition":
+            self._scope_stack.append(node_type)
+
+        return frame
+
+    def _enter_raise(self, node: Node, parent: _Frame):
+        self.n_raise += 1
+
+        # first identifier (or called identifier) raised, as in QUERY_RAISE_STATEMENT_IDENTIFIER
+        identifier = None
+        for child in node.named_children:
+            if child.type == "identifier":
+                identifier = child.text
+                break
+            if child.type == "call":
+                function = child.child_by_field_name("function")
+                if function is not None and function.type == "identifier":
+                    identifier = function.text
+                    break
+
+        if identifier is not None:
+            self.raise_identifiers.append(identifier.decode("utf-8"))
+            if identifier == b"Exception":
+                self.n_captures_broad_raise += 1
+
+        is_bare = node.end_byte - node.start_byte == 5 and node.text == b"raise"
+
+        stack = self._stack
+        if (parent is not None and parent.type == "block"
+                and len(stack) > 1 and stack[-2].type == "except_clause"):
+            if is_bare:
+                self.n_captures_try_except_raise += 1
+            if identifier == b"Exception":
+                self.n_captures_try_except_raise += 1
+
+        if not is_bare:
+            return
+
+        # walk up to the nearest scope, as in has_misplaced_bare_raise and has_bare_raise_finally
+        scope = next(
+            (s for s in reversed(self._scope_stack) if s != "finally_clause"), None)
+        if scope != "except_clause":
+            self.n_captures_misplaced_bare_raise += 1
+
+        scope = next(
+            (s for s in reversed(self._scope_stack) if s != "except_clause"), None)
+        if scope is None or scope == "finally_clause":
+            self.n_bare_raise_finally += 1
+
+    def _leave(self, frame: _Frame):
+        if frame is self._candidate:
+            self._candidate = None
+            return
+
+        if frame.type == "except_clause":
+            self._except_stack.pop()
+            self._scope_stack.pop()
+            if frame.has_pass:
+                self.n_try_pass += 1
+            if not frame.captured:
+                self.n_bare_except += 1
+            if frame.generic:
+                self.n_generic_except += 1
+
+        elif frame.type == "try_statement":
+            self._try_stack.pop()
+            if frame.tries >= 2:
+                self.n_nested_try += 1
+            if self._try_stack:
+                self._try_stack[-1].tries += frame.tries + 1
+
+        else:
+            self._scope_stack.pop()
@@ -20,3 +20,7 @@ class TreeSitterNodeException(MinerPyError):
 
 class CallGraphError(MinerPyError):
     pass
+
+
+class LintError(MinerPyError):
+    pass
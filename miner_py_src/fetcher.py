@@ -0,0 +1,113 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Optional
+
+from .repo_cache import RepoCache
+
+# a repository to have at path: commits=None when only its HEAD is mined
+FetchJob = namedtuple("FetchJob", ["name", "url", "path", "commits"])
+FetchResult = namedtuple("FetchResult", ["job", "error", "seconds"])
+
+
+def clone_args(url: str, path: str, commits: Optional[List[str]] = None, partial: bool = True) -> List[str]:
+    """
+    git clone command of a job. A partial clone is shallow when only HEAD is needed, and
+        without blobs when specific commits are: checkout fetches the blobs of the commit,
+        and git_objects.fetch_missing_blobs the ones cat-file is about to read, in one batch.
+    """
+    if not partial:
+        return ["git", "clone", "--quiet", "--recursive", url, path]
+    if commits is None:
+        return ["git", "clone", "--quiet", "--depth", "1", "--recursive", "--shallow-submodules", url, path]
+    return ["git", "clone", "--quiet", "--filter=blob:none", "--no-checkout", url, path]
+
+
+async def _git(args: List[str], cwd: str = None):
+    process = await asyncio.create_subprocess_exec(
+        *args, cwd=cwd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    return process.returncode, stderr.decode("utf-8", errors="replace")
+
+
+async def _has_commit(path: str, commit: str) -> bool:
+    returncode, _ = await _git(["git", "cat-file", "-e", f"{commit}^{{commit}}"], cwd=path)
+    return returncode == 0
+
+
+async def fetch_repository(job: FetchJob, partial: bool = True) -> Optional[str]:
+    """Clone job.url at job.path, or fetch it if a commit is missing. Returns the error, None if it worked"""
+    if not os.path.exists(os.path.join(job.path, ".git")):  # a file in the worktrees of a mirror
+        os.makedirs(os.path.dirname(os.path.abspath(job.path)), exist_ok=True)
+        returncode, stderr = await _git(clone_args(job.url, job.path, job.commits, partial))
+        return (stderr or f"git clone exited with {returncode}") if returncode != 0 else None
+
+    for commit in job.commits or ():
+        if not await _has_commit(job.path, commit):
+            returncode, stderr = await _git(["git", "fetch", "--quiet", "origin"], cwd=job.path)
+            return (stderr or f"git fetch exited with {returncode}") if returncode != 0 else None
+    return None
+
+
+def _mirror_job(mirrors: RepoCache, job: FetchJob) -> Optional[str]:
+    try:
+        if job.commits is None:
+            mirrors.worktree(job.url, job.path)
+            return None
+        missing = [commit for commit in job.commits if not mirrors.ensure_commit(job.url, commit)]
+    except OSError as ex:
+        return str(ex)
+    return f"Commits not found: {' '.join(missing)}" if missing else None
+
+
+async def fetch_all(jobs: Iterable[FetchJob], concurrency: int = 4, partial: bool = True,
+                    mirrors: RepoCache = None):
+    """Yield a FetchResult per job as soon as it is ready, running up to concurrency jobs at a time"""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(job: FetchJob) -> FetchResult:
+        async with semaphore:
+            start = time.perf_counter()
+            if mirrors is not None:  # RepoCache is synchronous, its git commands run in a thread
+                error = await asyncio.to_thread(_mirror_job, mirrors, job)
+            else:
+                error = await fetch_repository(job, partial)
+            return FetchResult(job, error, time.perf_counter() - start)
+
+    for task in asyncio.as_completed([run(job) for job in jobs]):
+        yield await task
+
+
+def iter_fetched(jobs: Iterable[FetchJob], concurrency: int = 4, partial: bool = True,
+                 mirrors: RepoCache = None) -> Iterator[FetchResult]:
+    """
+    fetch_all driven by an event loop in a background thread, so the repositories are cloned
+        while the caller mines the ones that are already there. Jobs with the same path must
+        be merged by the caller (one job per repository).
+    """
+    results = queue.Queue()
+    done = object()
+    errors = []
+
+    async def produce():
+        try:
+            async for result in fetch_all(jobs, concurrency, partial, mirrors):
+                results.put(result)
+        except Exception as ex:
+            errors.append(ex)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=asyncio.run, args=(produce(),), daemon=True)
+    thread.start()
+    while True:
+        result = results.get()
+        if result is done:
+            break
+        yield result
+    thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,204 @@
+from collections import namedtuple
+from functools import partial
+from multiprocessing import Pool
+from typing import List, Optional
+
+from tqdm import tqdm
+
+from .eh_visitor import METRIC_NAMES, ExceptionHandlingVisitor
+from .exceptions import FunctionDefNotFoundException
+from .metrics_cache import MetricsCache, blob_hash
+from .miner_py_utils import get_function_defs
+from .tree_sitter_lang import parser as tree_sitter_parser
+from .ts_call_graph import extract_call_facts
+from .ts_lint import lint_tree
+
+FunctionRecord = namedtuple(
+    "FunctionRecord",
+    [
+        "function",
+        "func_body",
+        "node_id",
+        "n_try",
+        "metrics",
+        "start_byte",
+        "end_byte",
+    ],
+)
+
+
+def get_method_name(node):  # -> str | None:
+    for child in node.children:
+        if child.type == 'identifier':
+            return child.text.decode("utf-8")
+
+
+def record_to_dict(record: FunctionRecord) -> dict:
+    return dict(zip(METRIC_NAMES, record.metrics))
+
+
+def read_file(file_path) -> Optional[bytes]:
+    try:
+        with open(file_path, "rb") as file:
+            return file.read()
+    except FileNotFoundError as ex:
+        tqdm.write(
+            f"###### FileNotFoundError Error!!! file: {file_path}.\n{str(ex)}")
+        return None
+
+
+def function_record(child, visitor: ExceptionHandlingVisitor = None) -> FunctionRecord:
+    function_identifier = get_method_name(child)
+    if function_identifier is None:
+        raise FunctionDefNotFoundException(
+            f'Function identifier not found:\n {child.text}')
+
+    visitor = visitor or ExceptionHandlingVisitor()
+    metrics = visitor.visit(child)
+    return FunctionRecord(
+        function_identifier,
+        child.text.decode("utf-8"),
+        child.id,
+        visitor.n_try,
+        tuple(metrics[name] for name in METRIC_NAMES),
+        child.start_byte,
+        child.end_byte,
+    )
+
+
+def _parse_tree(content: bytes, file_path=None):
+    try:
+        return tree_sitter_parser.parse(content)
+    except SyntaxError as ex:
+        tqdm.write(
+            f"###### SyntaxError Error!!! file: {file_path}.\n{str(ex)}")
+        return None
+
+
+def parse_content(content: bytes, file_path=None) -> List[FunctionRecord]:
+    """
+    Parse the source of a file and return one FunctionRecord per function definition, in the
+        order they appear in the file. The metrics are in METRIC_NAMES order.
+    """
+    return parse_content_with_calls(content, file_path, call_facts=False)[0]
+
+
+def parse_content_with_calls(content: bytes, file_path=None, call_facts=True):
+    """parse_content and the FileCallFacts of the same tree (None when call_facts is False)"""
+    return _parse_content(content, file_path, call_facts)[:2]
+
+
+def _parse_content(content: bytes, file_path=None, call_facts=False, lint=False):
+    tree = _parse_tree(content, file_path)
+    if tree is None:
+        return [], None, None
+
+    visitor = ExceptionHandlingVisitor()
+    records = [function_record(child, visitor) for child in get_function_defs(tree)]
+    return records, *_tree_facts(tree, file_path, call_facts, lint)
+
+
+def _tree_facts(tree, file_path, call_facts=False, lint=False):
+    """(FileCallFacts, ts_lint messages) of a tree, None for the ones not asked for"""
+    facts = extract_call_facts(tree.root_node) if call_facts and tree is not None else None
+    messages = lint_tree(tree.root_node, str(file_path)) if lint and tree is not None else None
+    return facts, messages
+
+
+def parse_file(file_path, cache: MetricsCache = None) -> List[FunctionRecord]:
+    return _parse_file_job(file_path, cache)[1]
+
+
+def _parse_file_job(file_path, cache: MetricsCache = None, call_facts=False, lint=False):
+    return _parse_content_job((file_path, read_file(file_path)), cache, call_facts, lint)
+
+
+def _parse_content_job(item, cache: MetricsCache = None, call_facts=False, lint=False):
+    file_path, content = item
+    if content is None:
+        return file_path, [], False, None, None
+
+    if cache is None:
+        records, facts, messages = _parse_content(content, file_path, call_facts, lint)
+        return file_path, records, False, facts, messages
+
+    key = blob_hash(content)
+    records = cache.get(key)
+    if records is not None:
+        facts = messages = None
+        if call_facts or lint:
+            tree = _parse_tree(content, file_path)  # the records come from the cache
+            facts, messages = _tree_facts(tree, file_path, call_facts, lint)
+        return file_path, [FunctionRecord(*record) for record in records], True, facts, messages
+
+    records, facts, messages = _parse_content(content, file_path, call_facts, lint)
+    cache.put(key, records)
+    return file_path, records, False, facts, messages
+
+
+def _parse_file_incremental(file_path, incremental, hunks, lint=False):
+    return _parse_content_incremental((file_path, read_file(file_path)), incremental, hunks, lint)
+
+
+def _parse_content_incremental(item, incremental, hunks, lint=False):
+    file_path, content = item
+    if content is None:
+        incremental.forget(file_path)
+        return file_path, [], False, None, None
+    records = incremental.parse(file_path, content, hunks.get(file_path))
+    messages = _tree_facts(incremental.tree(file_path), file_path, lint=lint)[1]
+    return file_path, records, False, None, messages
+
+
+def iter_file_records(files, jobs=1, cache: MetricsCache = None, incremental=None, hunks=None,
+                      call_facts: dict = None, contents=None, lint_messages: dict = None):
+    """
+    Yield (file_path, records) for every file in the same order as files. With jobs > 1
+        the files are parsed by a process pool, each worker with its own tree-sitter parser.
+        Files whose content is in the cache are not parsed again. With an IncrementalParser
+        the files are parsed in this process, reusing the trees of the previous commit
+        (hunks maps a file path to its `git diff -U0` hunks from that commit).
+        A call_facts dict is filled with the FileCallFacts of every file, taken from the same
+        parse (not with an IncrementalParser), for ts_call_graph.build_call_graph.
+        contents maps a file path to its bytes (None if it is missing) instead of reading the
+        file from disk, e.g. to read the blobs of a commit with a GitObjectReader; it is called
+        in this process, the workers get the bytes.
+        A lint_messages dict is filled with the pylint-compatible exceptions checker records
+        of every file (ts_lint), computed on the same tree.
+    """
+    pbar = tqdm(total=len(files))
+    if incremental is not None:
+        job = partial(_parse_content_incremental if contents is not None else _parse_file_incremental,
+                      incremental=incremental, hunks=hunks or {}, lint=lint_messages is not None)
+        cache = None
+    else:
+        job = partial(_parse_content_job if contents is not None else _parse_file_job,
+                      cache=cache, call_facts=call_facts is not None, lint=lint_messages is not None)
+    items = files if contents is None else ((file_path, contents(file_path)) for file_path in files)
+
+    if incremental is not None or jobs is None or jobs <= 1:
+        results = map(job, items)
+        pool = None
+    else:
+        pool = Pool(jobs)
+        chunksize = max(1, min(64, len(files) // (jobs * 8)))
+        results = pool.imap(job, items, chunksize=chunksize)
+
+    try:
+        for file_path, records, cache_hit, facts, messages in results:
+            if call_facts is not None and facts is not None:
+                call_facts[file_path] = facts
+            if lint_messages is not None and messages is not None:
+                lint_messages[file_path] = messages
+            if cache is not None:
+                cache.hits += cache_hit
+                cache.misses += not cache_hit
+            pbar.set_description(
+                f"Processing {str(file_path)[-40:].ljust(40)}")
+            pbar.update()
+            yield file_path, records
+    finally:
+        pbar.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,47 @@
+import os
+import re
+from typing import Optional
+
+
+def module_path(file_path) -> str:
+    """Dotted module path of a file: 'projects/py/p/pkg/mod.py' -> 'projects.py.p.pkg.mod', __init__.py -> its package"""
+    parts = [part for part in re.split(r'[\\/]', os.path.splitext(str(file_path))[0]) if part not in ('', '.')]
+    if parts and parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+class FunctionIndex:
+    """
+    Rows of the collected functions by (module, function name), built while parsing. A call
+        graph node matches the first row (in DataFrame order) with the same function name whose
+        dotted module path ends with the node module ('teste.a' matches projects/py/teste/teste/a.py
+        but not teste/xa.py); an empty module matches any file.
+    """
+
+    def __init__(self, reverse: bool = False):
+        self.reverse = reverse
+        self._size = 0
+        self._positions = {}
+
+    def __len__(self):
+        return self._size
+
+    def add(self, file_path, function: str) -> int:
+        position = self._size
+        self._size += 1
+        parts = module_path(file_path).split('.')
+        for start in range(len(parts) + 1):
+            key = ('.'.join(parts[start:]), function)
+            if self.reverse:
+                self._positions[key] = position  # the last one added is the first row
+            else:
+                self._positions.setdefault(key, position)
+        return position
+
+    def row_id(self, position: int) -> int:
+        return self._size - 1 - position if self.reverse else position
+
+    def find(self, module: str, function: str) -> Optional[int]:
+        position = self._positions.get((module, function))
+        return None if position is None else self.row_id(position)
@@ -0,0 +1,136 @@
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class GitObjectReader:
+    """
+    Read objects of a repository with one long-lived `git cat-file --batch` process, so the
+        files of a commit can be read without checking it out. Thread safe: the requests are
+        serialized on the process.
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            ["git", "cat-file", "--batch"], cwd=repo_path,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, revision: str) -> Optional[bytes]:
+        """Content of an object ('<commit>:<path>', a blob hash...), None if it does not exist"""
+        if "\n" in revision:
+            return None
+        with self._lock:
+            if self._process is None:
+                raise ValueError("GitObjectReader is closed")
+            self._process.stdin.write(revision.encode("utf-8") + b"\n")
+            self._process.stdin.flush()
+            header = self._process.stdout.readline()
+            if not header:
+                raise OSError(f"git cat-file exited in {self.repo_path}")
+            # '<revision> missing' or '<revision> ambiguous', the revision may have spaces in its path
+            if header.endswith((b" missing\n", b" ambiguous\n")):
+                return None
+            size = int(header.rsplit(maxsplit=2)[2])  # '<sha> <type> <size>'
+            content = self._process.stdout.read(size)
+            self._process.stdout.read(1)  # newline after the content
+            return content
+
+    def blob(self, commit: str, path: str) -> Optional[bytes]:
+        """Content of path (relative to the repository root) at commit"""
+        return self.read(f"{commit}:{path}")
+
+    def close(self):
+        with self._lock:
+            if self._process is None:
+                return
+            self._process.stdin.close()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def symlinks(repo_path: str, commit: str, paths: Iterable[str]) -> Set[str]:
+    """The paths (relative to the repository root) that are symbolic links at commit"""
+    paths = list(paths)
+    if not paths:
+        return set()
+    process = subprocess.run(
+        ["git", "ls-tree", "-z", commit, "--", *paths],
+        cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    links = set()
+    for entry in process.stdout.split(b"\0"):
+        if not entry:
+            continue
+        info, _, path = entry.partition(b"\t")
+        if info.split(b" ")[0] == b"120000":
+            links.add(path.decode("utf-8"))
+    return links
+
+
+def existing_commits(repo_path: str, commits: Iterable[str]) -> Dict[str, str]:
+    """{full hash: commit} of the commits of the list that are in the repository, from one `git cat-file --batch-check`"""
+    commits = [commit for commit in dict.fromkeys(commits) if "\n" not in commit]
+    process = subprocess.run(
+        ["git", "cat-file", "--batch-check=%(objectname) %(objecttype)"], cwd=repo_path,
+        input="".join(f"{commit}^{{commit}}\n" for commit in commits).encode("utf-8"),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    lines = process.stdout.decode("utf-8").splitlines()
+    return {line.split()[0]: commit for commit, line in zip(commits, lines) if line.endswith(" commit")}
+
+
+def modified_files(repo_path: str, commits: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Paths (relative to the repository root) added or modified by each commit, from one
+        `git log --stdin` for all of them. Merge commits are compared with their first parent
+        and root commits with the empty tree; deleted files are left out. Commits that are
+        not in the repository are not in the result.
+    """
+    full_hashes = existing_commits(repo_path, commits)
+    result = {commit: [] for commit in full_hashes.values()}
+    if not full_hashes:
+        return result
+    process = subprocess.run(
+        ["git", "-c", "core.quotePath=false", "log", "--stdin", "--no-walk=unsorted", "--root", "-m",
+         "--first-parent", "--diff-filter=d", "--name-only", "--format=%x00%H"],
+        cwd=repo_path, input="".join(f"{full_hash}\n" for full_hash in full_hashes).encode("utf-8"),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    paths = None
+    for line in process.stdout.decode("utf-8", errors="surrogateescape").splitlines():
+        if line.startswith("\0"):
+            paths = result.get(full_hashes.get(line[1:]))
+        elif line and paths is not None:
+            paths.append(line)
+    return result
+
+
+def fetch_missing_blobs(repo_path: str, commit: str, paths: Iterable[str], remote: str = "origin") -> int:
+    """
+    In a partial (blobless) clone, fetch the blobs of paths at commit that are not in the
+        repository yet with one `git fetch`, instead of one lazy fetch per object while
+        GitObjectReader reads them. Returns the number of blobs fetched (0 in full clones).
+    """
+    paths = list(paths)
+    if not paths:
+        return 0
+    process = subprocess.run(
+        ["git", "--literal-pathspecs", "rev-list", "--objects", "--no-walk", "--missing=print", commit, "--", *paths],
+        cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    missing = [line[1:] for line in process.stdout.decode("utf-8", errors="replace").splitlines()
+               if line.startswith("?")]
+    if not missing:
+        return 0
+    process = subprocess.run(
+        ["git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "--quiet", "--no-tags", "--no-write-fetch-head",
+         "--recurse-submodules=no", "--filter=blob:none", "--stdin", remote],
+        cwd=repo_path, input="".join(f"{blob}\n" for blob in missing).encode("utf-8"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return len(missing) if process.returncode == 0 else 0
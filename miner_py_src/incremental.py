@@ -0,0 +1,195 @@
+import os
+import re
+import subprocess
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from .eh_visitor import ExceptionHandlingVisitor
+from .file_metrics import FunctionRecord, function_record
+from .miner_py_utils import get_function_defs
+from .tree_sitter_lang import parser as tree_sitter_parser
+
+# line ranges of a `git diff -U0` hunk (as in the @@ header)
+Hunk = namedtuple("Hunk", ["old_start", "old_count", "new_start", "new_count"])
+
+# byte range of an edit in the old content, new_end_byte = start_byte + size of the new text
+Edit = namedtuple("Edit", ["start_byte", "old_end_byte", "new_end_byte"])
+
+HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def parse_unified_diff(diff: bytes) -> Dict[str, List[Hunk]]:
+    """Hunks of each file (new path) of a `git diff -U0` output"""
+    hunks = {}
+    current = None
+    for line in diff.splitlines():
+        if line.startswith(b"+++ "):
+            path = line[4:].decode("utf-8", errors="replace")
+            current = None if path == "/dev/null" else hunks.setdefault(
+                path[2:] if path.startswith("b/") else path, [])
+            continue
+
+        match = HUNK_HEADER.match(line)
+        if match and current is not None:
+            old_start, old_count, new_start, new_count = match.groups()
+            current.append(Hunk(int(old_start), 1 if old_count is None else int(old_count),
+                                int(new_start), 1 if new_count is None else int(new_count)))
+    return hunks
+
+
+def _line_offsets(content: bytes) -> List[int]:
+    return [0] + [m.end() for m in re.finditer(b"\n", content)]
+
+
+def _line_offset(offsets: List[int], line: int, size: int) -> int:
+    return offsets[line] if line < len(offsets) else size
+
+
+def hunks_to_edits(old: bytes, new: bytes, hunks: List[Hunk]) -> Optional[List[Edit]]:
+    """
+    Byte edits of the hunks, or None when the hunks do not describe the change from old
+        to new (the text between hunks must be the same in both versions).
+    """
+    old_offsets, new_offsets = _line_offsets(old), _line_offsets(new)
+    edits = []
+    old_pos, new_pos = 0, 0
+    for hunk in hunks:
+        # with count 0, start is the line before the insertion/deletion point
+        old_line = hunk.old_start if hunk.old_count == 0 else hunk.old_start - 1
+        new_line = hunk.new_start if hunk.new_count == 0 else hunk.new_start - 1
+        start = _line_offset(old_offsets, old_line, len(old))
+        old_end = _line_offset(old_offsets, old_line + hunk.old_count, len(old))
+        new_start = _line_offset(new_offsets, new_line, len(new))
+        new_end = _line_offset(new_offsets, new_line + hunk.new_count, len(new))
+
+        if start < old_pos or new_start - start != new_pos - old_pos \
+                or old[old_pos:start] != new[new_pos:new_start]:
+            return None
+
+        edits.append(Edit(start, old_end, start + new_end - new_start))
+        old_pos, new_pos = old_end, new_end
+
+    if old[old_pos:] != new[new_pos:]:
+        return None
+    return edits
+
+
+def _common_prefix(a: bytes, b: bytes, step: int = 4096) -> int:
+    size = min(len(a), len(b))
+    prefix = 0
+    while prefix + step <= size and a[prefix:prefix + step] == b[prefix:prefix + step]:
+        prefix += step
+    while prefix < size and a[prefix] == b[prefix]:
+        prefix += 1
+    return prefix
+
+
+def content_edit(old: bytes, new: bytes) -> Edit:
+    """Single edit covering every change between old and new (common prefix and suffix trimmed)"""
+    prefix = _common_prefix(old, new)
+    suffix = min(_common_prefix(old[prefix:][::-1], new[prefix:][::-1]),
+                 len(old) - prefix, len(new) - prefix)
+    return Edit(prefix, len(old) - suffix, len(new) - suffix)
+
+
+def _point(content: bytes, byte: int):
+    return content.count(b"\n", 0, byte), byte - (content.rfind(b"\n", 0, byte) + 1)
+
+
+class IncrementalParser:
+    """
+    Keep the last tree and records of each path. A new version of a path is parsed incrementally
+        from the old tree edited with the diff hunks (or with a single edit spanning the changes),
+        and only the functions that intersect the edited or changed ranges are measured again.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self.reused = 0
+        self.recomputed = 0
+
+    def forget(self, path: str):
+        self._files.pop(path, None)
+
+    def tree(self, path: str):
+        """The last tree parsed for path (None if it was never parsed)"""
+        previous = self._files.get(path)
+        return previous[1] if previous is not None else None
+
+    def parse(self, path: str, content: bytes, hunks: List[Hunk] = None) -> List[FunctionRecord]:
+        previous = self._files.get(path)
+        if previous is None:
+            tree = tree_sitter_parser.parse(content)
+            records = self._measure(tree, [], None)
+            self._files[path] = (content, tree, records)
+            return records
+
+        old_content, old_tree, old_records = previous
+        if old_content == content:
+            self.reused += len(old_records)
+            return old_records
+
+        edits = hunks_to_edits(old_content, content, hunks) if hunks else None
+        if edits is None:
+            edits = [content_edit(old_content, content)]
+
+        # edited ranges in the new content, each one shifted by the size change of the previous ones
+        dirty, shifts, delta = [], [], 0
+        for edit in edits:
+            dirty.append((edit.start_byte + delta, edit.new_end_byte + delta))
+            delta += edit.new_end_byte - edit.old_end_byte
+            shifts.append((dirty[-1][1], delta))
+
+        # bottom-up, so the start of every edit is still in old coordinates
+        for edit, (new_start, new_end) in reversed(list(zip(edits, dirty))):
+            start_point = _point(old_content, edit.start_byte)
+            old_end_point = _point(old_content, edit.old_end_byte)
+            new_text = content[new_start:new_end]
+            new_end_point = (start_point[0] + new_text.count(b"\n"),
+                             len(new_text) - (new_text.rfind(b"\n") + 1)
+                             if b"\n" in new_text else start_point[1] + len(new_text))
+            old_tree.edit(edit.start_byte, edit.old_end_byte, edit.new_end_byte,
+                          start_point, old_end_point, new_end_point)
+
+        tree = tree_sitter_parser.parse(content, old_tree)
+        dirty.extend((r.start_byte, r.end_byte) for r in old_tree.get_changed_ranges(tree))
+
+        records = self._measure(tree, old_records, (dirty, shifts))
+        self._files[path] = (content, tree, records)
+        return records
+
+    def _measure(self, tree, old_records, changes):
+        visitor = ExceptionHandlingVisitor()
+        old_by_start = {record.start_byte: record for record in old_records}
+        records = []
+        for child in get_function_defs(tree):
+            record = None
+            if changes is not None:
+                dirty, shifts = changes
+                start, end = child.start_byte, child.end_byte
+                if not any(start <= d_end and d_start <= end for d_start, d_end in dirty):
+                    delta = 0
+                    for shift_end, shift_delta in shifts:
+                        if shift_end <= start:
+                            delta = shift_delta
+                    old = old_by_start.get(start - delta)
+                    if old is not None and old.end_byte == end - delta:
+                        record = old._replace(node_id=child.id, start_byte=start, end_byte=end)
+                        self.reused += 1
+
+            if record is None:
+                record = function_record(child, visitor)
+                self.recomputed += 1
+            records.append(record)
+        return records
+
+
+def diff_hunks(repo_path: str, old_hash: str, new_hash: str) -> Dict[str, List[Hunk]]:
+    """Hunks between two commits of a repository, by absolute file path ({} if git fails)"""
+    process = subprocess.run(
+        ["git", "diff", "-U0", "--no-color", "--no-ext-diff", old_hash, new_hash, "--", "*.py"],
+        cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if process.returncode != 0:
+        return {}
+    return {os.path.join(repo_path, path): hunks
+            for path, hunks in parse_unified_diff(process.stdout).items()}
@@ -0,0 +1,58 @@
+import gzip
+import io
+import json
+import os
+from typing import Iterator, List
+
+LINT_DIRECTORY = "output/pytlint"
+
+
+def lint_output_path(project: str, compress: bool = False, directory: str = LINT_DIRECTORY) -> str:
+    return os.path.join(directory, f"{project}.jsonl{'.gz' if compress else ''}")
+
+
+class JsonlSink:
+    """
+    JSON Lines file of lint messages, one pylint JSON record per line, written through a
+        buffer of buffer_size bytes and fsynced on close. Every record keeps the 'path' of
+        its file relative to the working directory, so files with the same name do not
+        collide. A path ending in .gz is gzip compressed (appending adds a gzip member,
+        read back as one stream). append=False starts the file again, e.g. for a new run.
+    """
+
+    def __init__(self, path: str, append: bool = False, buffer_size: int = 1 << 20):
+        self.path = path
+        self.records = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._raw = open(path, "ab" if append else "wb", buffering=0)
+        self._buffer = io.BufferedWriter(self._raw, buffer_size)
+        self._file = gzip.GzipFile(fileobj=self._buffer, mode="wb") if path.endswith(".gz") else self._buffer
+
+    def write(self, messages: List[dict]):
+        if messages:
+            self._file.write(b"".join(json.dumps(message).encode("utf-8") + b"\n" for message in messages))
+            self.records += len(messages)
+
+    def close(self):
+        if self._raw.closed:
+            return
+        if self._file is not self._buffer:
+            self._file.close()  # the gzip trailer, the buffer stays open
+        self._buffer.flush()
+        os.fsync(self._raw.fileno())
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_messages(path: str) -> Iterator[dict]:
+    """The records of a JsonlSink file (also `pd.read_json(path, lines=True)`)"""
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,146 @@
+import argparse
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from typing import Iterable, List, Optional
+
+RUNNING, DONE, FAILED, SKIPPED = "running", "done", "failed", "skipped"
+FINISHED = (DONE, SKIPPED)
+
+ManifestRow = namedtuple("ManifestRow", ["project", "commit_hash", "stage", "status", "started_at",
+                                         "finished_at", "seconds", "output", "message"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    project TEXT NOT NULL,
+    commit_hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    seconds REAL,
+    output TEXT,
+    message TEXT,
+    PRIMARY KEY (project, commit_hash, stage)
+);
+CREATE INDEX IF NOT EXISTS runs_stage_status ON runs (stage, status);
+"""
+
+
+class RunManifest:
+    """
+    SQLite table of the mining runs, one row per (project, commit, stage) with its status,
+        timings and output. A row is 'running' from start() until finish(), fail() or skip();
+        a row still 'running' after a restart is a run that was interrupted. is_finished()
+        is true for done and skipped rows, so a restart retries the failed and interrupted
+        runs only. `python -m miner_py_src.manifest <path>` shows the rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")  # readable while a miner writes
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _upsert(self, project: str, commit_hash: str, stage: str, **values):
+        columns = ["project", "commit_hash", "stage", *values]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._connection:
+            self._connection.execute(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (project, commit_hash, stage) DO UPDATE SET {updates}",
+                (project, commit_hash, stage, *values.values()))
+
+    def start(self, project: str, commit_hash: str, stage: str):
+        self._upsert(project, commit_hash, stage, status=RUNNING, started_at=time.time(),
+                     finished_at=None, seconds=None, output=None, message=None)
+
+    def _finish(self, project: str, commit_hash: str, stage: str, status: str, output=None, message=None,
+                seconds: float = None):
+        now = time.time()
+        row = self.get(project, commit_hash, stage)
+        started_at = row.started_at if row is not None and row.started_at is not None else now
+        if seconds is None:
+            seconds = now - started_at
+        self._upsert(project, commit_hash, stage, status=status, started_at=started_at, finished_at=now,
+                     seconds=seconds, output=output, message=message)
+
+    def finish(self, project: str, commit_hash: str, stage: str, output: str = None, seconds: float = None):
+        self._finish(project, commit_hash, stage, DONE, output=output, seconds=seconds)
+
+    def fail(self, project: str, commit_hash: str, stage: str, message: str):
+        self._finish(project, commit_hash, stage, FAILED, message=message)
+
+    def skip(self, project: str, commit_hash: str, stage: str, message: str = None):
+        self._finish(project, commit_hash, stage, SKIPPED, message=message)
+
+    def get(self, project: str, commit_hash: str, stage: str) -> Optional[ManifestRow]:
+        row = self._connection.execute(
+            "SELECT * FROM runs WHERE project = ? AND commit_hash = ? AND stage = ?",
+            (project, commit_hash, stage)).fetchone()
+        return ManifestRow(*row) if row is not None else None
+
+    def is_finished(self, project: str, commit_hash: str, stage: str) -> bool:
+        row = self._connection.execute(
+            "SELECT status FROM runs WHERE project = ? AND commit_hash = ? AND stage = ?",
+            (project, commit_hash, stage)).fetchone()
+        return row is not None and row[0] in FINISHED
+
+    def rows(self, stage: str = None, status: str = None) -> List[ManifestRow]:
+        conditions, params = [], []
+        if stage is not None:
+            conditions.append("stage = ?")
+            params.append(stage)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return [ManifestRow(*row) for row in self._connection.execute(
+            f"SELECT * FROM runs{where} ORDER BY project, commit_hash, stage", params)]
+
+    def import_finished(self, stage: str, outputs: Iterable[tuple]):
+        """Record (project, commit_hash, output) of runs done before the manifest existed"""
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO runs (project, commit_hash, stage, status, output) VALUES (?, ?, ?, ?, ?)",
+                ((project, commit_hash, stage, DONE, output) for project, commit_hash, output in outputs))
+
+    def summary(self) -> dict:
+        """{(stage, status): number of rows}"""
+        return {(stage, status): count for stage, status, count in self._connection.execute(
+            "SELECT stage, status, COUNT(*) FROM runs GROUP BY stage, status ORDER BY stage, status")}
+
+
+def main(argv: list = None):
+    arg_parser = argparse.ArgumentParser(prog="python -m miner_py_src.manifest",
+                                         description="Show the runs recorded in a mining manifest")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--stage", default=None)
+    arg_parser.add_argument("--status", default=None, choices=[RUNNING, DONE, FAILED, SKIPPED])
+    args = arg_parser.parse_args(argv)
+
+    with RunManifest(args.path) as manifest:
+        if args.status is None:
+            for (stage, status), count in manifest.summary().items():
+                print(f"{stage}\t{status}\t{count}")
+            return
+        for row in manifest.rows(args.stage, args.status):
+            seconds = f"{row.seconds:.1f}s" if row.seconds is not None else ""
+            print("\t".join([row.project, row.commit_hash, row.stage, row.status, seconds,
+                             row.output or "", (row.message or "").splitlines()[0] if row.message else ""]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+
+from .eh_visitor import METRICS_VERSION
+from .tree_sitter_lang import grammar_version
+
+
+def blob_hash(content: bytes) -> str:
+    """Same hash git gives to a blob with this content"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def cache_version() -> str:
+    return f"v{METRICS_VERSION}-{grammar_version()}"
+
+
+class PickleEntries:
+    """
+    Pickled values under <path>/<key[:2]>/<key>.pickle. Writes go to a temporary file renamed
+        over the entry, so processes sharing the directory never read half written entries;
+        an entry that cannot be unpickled is removed and read as missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".pickle")
+
+    def _load(self, key: str):
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as entry:
+                return pickle.load(entry)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            self._remove(path)
+            return None
+
+    def _dump(self, key: str, value):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as entry:
+                pickle.dump(value, entry, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MetricsCache(PickleEntries):
+    """
+    On-disk cache of the per-function records of a file, keyed by the blob hash of its content.
+        Entries live under <directory>/<version>/, so a new METRICS_VERSION or grammar never
+        reads old entries. get() refreshes the entry mtime and evict() removes the least
+        recently used entries (and the other versions) until the cache fits in max_bytes.
+        Writes are atomic, so worker processes can share the same directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30, version: str = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version or cache_version()
+        super().__init__(os.path.join(directory, self.version))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        records = self._load(key)
+        if records is not None:
+            try:
+                os.utime(self._entry_path(key))
+            except OSError:
+                pass
+        return records
+
+    def put(self, key: str, records: list):
+        self._dump(key, [tuple(record) for record in records])
+
+    def entries(self):
+        """(mtime, size, path) of every entry of the current version"""
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        for bucket in os.scandir(self.path):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".pickle"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Remove other versions and the least recently used entries. Returns the number of removed entries"""
+        if os.path.isdir(self.directory):
+            for version in os.scandir(self.directory):
+                if version.is_dir() and version.name != self.version:
+                    shutil.rmtree(version.path, ignore_errors=True)
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
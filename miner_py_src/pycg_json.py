@@ -0,0 +1,168 @@
+import json
+import re
+import sys
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+from miner_py_src.compact_graph import CallGraphBuilder, CompactCallGraph
+from miner_py_src.exceptions import CallGraphError
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONStream:
+    """Text stream read in chunks, decoded one JSON value at a time"""
+
+    def __init__(self, stream, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non whitespace character ('' at the end of the stream)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._read():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise CallGraphError(f"call_graph.json: expected {' or '.join(chars)}, found {char or 'EOF'!r}")
+        self.pos += 1
+        return char
+
+    def value(self, decoder: json.JSONDecoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # the keys are strings and the values lists, so a truncated value never decodes
+                if not self._read():
+                    raise CallGraphError(f"call_graph.json: {e.msg}") from e
+            else:
+                self.pos = end
+                return value
+
+
+def iter_call_graph_json(stream, chunk_size: int = 1 << 16):
+    """
+    Yield the (function, [calls]) entries of a PyCG call_graph.json text stream one at a time,
+        without loading the whole JSON object (only the current entry is kept in memory).
+    """
+    reader = _JSONStream(stream, chunk_size)
+    decoder = json.JSONDecoder()
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        func_name = reader.value(decoder)
+        reader.expect(':')
+        calls = reader.value(decoder)
+        if not isinstance(func_name, str) or not isinstance(calls, list):
+            raise CallGraphError(f"call_graph.json: unexpected entry {func_name!r}")
+        yield func_name, calls
+        if reader.expect(',}') == '}':
+            return
+
+
+def load_call_graph(path: str, chunk_size: int = 1 << 16) -> CompactCallGraph:
+    """Stream PyCG's call_graph.json at path into a CompactCallGraph"""
+    builder = CallGraphBuilder()
+    with open(path, encoding='utf-8') as stream:
+        for func_name, calls in iter_call_graph_json(stream, chunk_size):
+            builder.add_calls(func_name, calls)
+    return builder.build()
+
+
+# PyCG names the modules of the analyzed files relative to --package, a sibling folder of the
+# packages in generate_cfg, so the functions of the project start with this prefix
+PROJECT_PREFIX = '...'
+
+
+def qualified_names(names) -> dict:
+    """
+    {name: project function} for the names that are not project functions but the dotted
+        suffix (module and function at least) of exactly one of them: the calls PyCG could not
+        resolve in a shard because the function is in the files of another one ('a.h' or
+        'demo.a.h' for '...demo.a.h').
+    """
+    suffixes = {}
+    for name in names:
+        if name.startswith(PROJECT_PREFIX):
+            parts = name[len(PROJECT_PREFIX):].split('.')
+            for start in range(len(parts) - 1):
+                suffixes.setdefault('.'.join(parts[start:]), []).append(name)
+    return {name: suffixes[name][0] for name in names
+            if not name.startswith(PROJECT_PREFIX) and len(suffixes.get(name, ())) == 1}
+
+
+def _merge_entries(entries, qualify: bool = False) -> CompactCallGraph:
+    merged = {}
+    for func_name, calls in entries:
+        merged.setdefault(func_name, {}).update(dict.fromkeys(calls))
+
+    if qualify:
+        names = dict.fromkeys(merged)
+        for calls in merged.values():
+            names.update(calls)
+        qualified = qualified_names(names)
+        if qualified:
+            resolved = {}
+            for func_name, calls in merged.items():
+                resolved.setdefault(qualified.get(func_name, func_name), {}).update(
+                    dict.fromkeys(qualified.get(call, call) for call in calls))
+            merged = resolved
+
+    builder = CallGraphBuilder()
+    for func_name, calls in merged.items():
+        builder.add_calls(func_name, calls)
+    return builder.build()
+
+
+def _iter_files(paths: list, chunk_size: int):
+    for path in paths:
+        with open(path, encoding='utf-8') as stream:
+            yield from iter_call_graph_json(stream, chunk_size)
+
+
+def load_call_graphs(paths: list, chunk_size: int = 1 << 16) -> CompactCallGraph:
+    """
+    Merge the call_graph.json of several PyCG runs (shards of the same package) into one
+        CompactCallGraph. The functions are matched by name, so a call from one shard to a
+        function of another one becomes an edge, and the calls found by more than one shard
+        are kept once. With more than one output, the calls a shard left unresolved to a
+        function of another shard are rewritten to its project name (see qualified_names).
+    """
+    return _merge_entries(_iter_files(paths, chunk_size), qualify=len(paths) > 1)
+
+
+def merge_call_graphs(edge_maps: list) -> CompactCallGraph:
+    """Like load_call_graphs for PyCG outputs already in memory ({function: [calls]})"""
+    return _merge_entries((entry for edge_map in edge_maps for entry in edge_map.items()),
+                          qualify=len(edge_maps) > 1)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (None where it is not available)"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1 << 20) if sys.platform == 'darwin' else max_rss / 1024  # bytes / KB
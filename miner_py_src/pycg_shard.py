@@ -0,0 +1,161 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from .exceptions import CallGraphError
+
+package_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ShardResult = namedtuple('ShardResult', ['output_path', 'returncode', 'stdout', 'stderr'])
+
+
+def top_level_package(file_path: str, root: str) -> str:
+    """First directory of file_path under root ('' for the modules at the root)"""
+    parts = os.path.relpath(file_path, root).split(os.sep)
+    return parts[0] if len(parts) > 1 else ''
+
+
+def shard_files(files: list, root: str, num_shards: int) -> list:
+    """
+    Split files into at most num_shards lists of about the same size, keeping the files of a
+        top level package together (greedy, biggest packages first). A package bigger than
+        the target size is split by its subpackages.
+    """
+    files = list(files)
+    if num_shards <= 1 or len(files) <= 1:
+        return [files] if files else []
+
+    target = -(-len(files) // num_shards)
+    groups = []
+    pending = [(root, files)]
+    while pending:
+        group_root, group_files = pending.pop()
+        packages = {}
+        for file_path in group_files:
+            packages.setdefault(top_level_package(file_path, group_root), []).append(file_path)
+        for package, package_files in packages.items():
+            subpackage_root = os.path.join(group_root, package)
+            if (package and len(package_files) > target
+                    and len({top_level_package(f, subpackage_root) for f in package_files}) > 1):
+                pending.append((subpackage_root, package_files))
+            else:
+                groups.append(package_files)
+
+    shards = [[] for _ in range(min(num_shards, len(groups)))]
+    for group in sorted(groups, key=len, reverse=True):
+        min(shards, key=len).extend(group)
+    return shards
+
+
+def run_pycg(files: list, package: str, output_path: str, cwd: str = None,
+             max_iter: int = 1) -> ShardResult:
+    """
+    Run PyCG on files, writing the call graph to output_path. The file list is passed in
+        <output_path>.files (one path per line) instead of the command line, so a big
+        project does not hit ARG_MAX.
+    """
+    list_path = output_path + '.files'
+    with open(list_path, 'w', encoding='utf-8') as list_file:
+        list_file.write('\n'.join(files))
+
+    args = [
+        sys.executable, '-m', 'miner_py_src.pycg_shard', list_path,
+        '--package', package,
+        '--max-iter', str(max_iter),
+        '--output', output_path]
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath(package_root),
+                                                      env.get('PYTHONPATH')]))
+    proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+    return ShardResult(output_path, proc.returncode, proc.stdout, proc.stderr)
+
+
+def run_pycg_shards(shards: list, package: str, output_folder: str, jobs: int = 1,
+                    cwd: str = None, max_iter: int = 1) -> list:
+    """
+    Run PyCG on every shard, jobs of them at a time. The shard outputs are
+        <output_folder>/call_graph.json for a single shard, shard_<n>.json otherwise.
+    """
+    if len(shards) == 1:
+        output_paths = [os.path.join(output_folder, 'call_graph.json')]
+    else:
+        output_paths = [os.path.join(output_folder, f'shard_{n}.json') for n in range(len(shards))]
+
+    def run(shard):
+        files, output_path = shard
+        return run_pycg(files, package, output_path, cwd, max_iter)
+
+    if jobs <= 1 or len(shards) == 1:
+        return [run(shard) for shard in zip(shards, output_paths)]
+
+    # the work happens in the pycg processes, the threads only wait for them
+    with ThreadPool(min(jobs, len(shards))) as pool:
+        return pool.map(run, zip(shards, output_paths))
+
+
+# PyCG installs its import hooks in sys.path and sys.path_hooks while it runs
+_pycg_lock = threading.Lock()
+
+
+def has_pycg_api() -> bool:
+    return importlib.util.find_spec('pycg') is not None
+
+
+def pycg_call_graph(files: list, package: str, root: str = None, max_iter: int = 1) -> dict:
+    """
+    Run PyCG on files in this process and return its {function: [calls]} output. package is
+        the path the module names are relative to and root (the project folder) is put first
+        in sys.path while PyCG runs, as the working directory is for the pycg command.
+    """
+    from pycg import formats
+    from pycg.pycg import CallGraphGenerator
+    from pycg.utils.constants import CALL_GRAPH_OP
+
+    with _pycg_lock:
+        old_path = list(sys.path)
+        if root is not None:
+            sys.path.insert(0, root)
+        generator = CallGraphGenerator(files, package, max_iter, CALL_GRAPH_OP)
+        try:
+            generator.analyze()
+            return formats.Simple(generator).generate()
+        except Exception as e:
+            raise CallGraphError(f"PyCG failed: {e!r}") from e
+        finally:
+            # PyCG leaves its import hooks installed when a module fails
+            sys.path[:] = old_path
+            if generator.import_manager.old_path_hooks is not None:
+                sys.path_hooks[:] = generator.import_manager.old_path_hooks
+                sys.path_importer_cache.clear()
+
+
+def pycg_call_graph_shards(shards: list, package: str, root: str = None, jobs: int = 1,
+                           max_iter: int = 1) -> list:
+    """pycg_call_graph of every shard, in a pool of jobs processes when there is more than one"""
+    if jobs <= 1 or len(shards) <= 1:
+        return [pycg_call_graph(files, package, root, max_iter) for files in shards]
+
+    with Pool(min(jobs, len(shards))) as pool:
+        return pool.map(partial(pycg_call_graph, package=package, root=root, max_iter=max_iter), shards)
+
+
+def main(argv: list):
+    """python -m miner_py_src.pycg_shard <file list> <pycg options>"""
+    with open(argv[0], encoding='utf-8') as list_file:
+        files = [line for line in list_file.read().splitlines() if line]
+
+    from pycg.__main__ import main as pycg_main
+
+    sys.argv = ['pycg', *files, *argv[1:]]
+    pycg_main()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from .exceptions import LintError
+
+# the messages of the pylint exceptions checker (W0702, W0718, W0706, W0707, E0701, E0704...)
+PYLINT_ARGS = ("--disable=all", "--enable=exceptions")
+
+# pylint exit status bits: 1 fatal, 32 usage error; the others only say which messages were emitted
+_FAILED = 32
+
+
+def pylint_command(files: List[str], jobs: int = 1, args=PYLINT_ARGS) -> List[str]:
+    return [sys.executable, "-m", "pylint", f"--jobs={max(jobs, 0)}", "--output-format=json",
+            "--score=n", *args, *files]
+
+
+def split_messages(messages: List[dict], files: List[str], cwd: str = None) -> Dict[str, List[dict]]:
+    """The messages of a pylint run by file of files (their 'path' is relative to the working directory)"""
+    cwd = os.path.abspath(cwd or os.getcwd())
+    by_path = {os.path.normpath(os.path.join(cwd, file_path)): file_path for file_path in files}
+    result = {file_path: [] for file_path in files}
+    for message in messages:
+        file_path = by_path.get(os.path.normpath(os.path.join(cwd, message.get("path", ""))))
+        if file_path is not None:
+            result[file_path].append(message)
+    return result
+
+
+def run_pylint(files: List[str], jobs: int = 1, args=PYLINT_ARGS, cwd: str = None) -> Dict[str, List[dict]]:
+    """Lint files with one pylint process (with jobs worker processes). Raises LintError if pylint fails"""
+    if not files:
+        return {}
+    process = subprocess.run(pylint_command(files, jobs, args), cwd=cwd,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        messages = json.loads(process.stdout or b"[]")
+    except ValueError:
+        messages = None
+    if messages is None or process.returncode & _FAILED:
+        raise LintError(f"pylint exited with {process.returncode}:\n"
+                        f"{process.stderr.decode('utf-8', errors='replace')[-2000:]}")
+    return split_messages(messages, files, cwd)
+
+
+def iter_pylint_results(files: List[str], jobs: int = 1, chunk_size: int = 500, args=PYLINT_ARGS,
+                        on_error: Callable[[List[str], LintError], None] = None) -> Iterator[Tuple[str, List[dict]]]:
+    """
+    Yield (file_path, messages) for every file, in the same order as files, linting chunks of
+        chunk_size files with one pylint process each instead of one process per file, so
+        the interpreter startup and the inference of the shared imports are paid once per chunk.
+        A chunk pylint fails on raises LintError, or is passed to on_error(chunk, error) and
+        skipped when on_error is given, the next chunks are still linted.
+    """
+    chunk_size = max(chunk_size, 1)
+    for start in range(0, len(files), chunk_size):
+        chunk = files[start:start + chunk_size]
+        try:
+            results = run_pylint(chunk, jobs, args)
+        except LintError as ex:
+            if on_error is None:
+                raise
+            on_error(chunk, ex)
+            continue
+        for file_path in chunk:
+            yield file_path, results[file_path]
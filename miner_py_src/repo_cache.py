@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import List
+
+from .git_objects import GitObjectReader
+
+_LAST_USED = "miner-last-used"
+
+
+def repo_key(url: str) -> str:
+    """Directory name of the mirror of url; the same for 'u', 'u.git' and 'u/'"""
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-len(".git")]
+    name = re.sub(r"[^\w.-]", "_", url.rsplit("/", 1)[-1]) or "repo"
+    return f"{name}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.git"
+
+
+def _git(*args, cwd=None) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _list_worktrees(mirror: str) -> List[str]:
+    process = _git("worktree", "list", "--porcelain", cwd=mirror)
+    paths = [line[len("worktree "):] for line in process.stdout.decode("utf-8").splitlines()
+             if line.startswith("worktree ")]
+    return paths[1:]  # the first one is the mirror itself
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RepoCache:
+    """
+    Bare mirrors of the mined repositories, one per URL under <directory>/, shared by the
+        miners and by the runs. A mirror is cloned once and updated with `git fetch` (once
+        per RepoCache, or again when a commit is missing); the miners work on worktrees of
+        the mirror or read its objects. evict() removes the least recently used mirrors,
+        with their worktrees, until the cache fits in max_bytes; the mirrors used by this
+        RepoCache are kept. Any git URL works, including local paths and file:// remotes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 20 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._fetched = set()
+        self._used = set()
+
+    def mirror_path(self, url: str) -> str:
+        return os.path.join(self.directory, repo_key(url))
+
+    def _touch(self, path: str):
+        self._used.add(os.path.basename(path))
+        with open(os.path.join(path, _LAST_USED), "w") as file:
+            file.write(str(time.time()))
+
+    def mirror(self, url: str) -> str:
+        """Path of the up-to-date mirror of url. Raises OSError if it cannot be cloned"""
+        path = self.mirror_path(url)
+        if not os.path.isdir(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")
+            process = _git("clone", "--mirror", "--quiet", url, tmp_path)
+            if process.returncode != 0:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise OSError(f"git clone --mirror {url} failed:\n{process.stderr.decode(errors='replace')}")
+            try:
+                os.rename(tmp_path, path)
+            except OSError:  # cloned at the same time by another process
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            self._fetched.add(path)
+        elif path not in self._fetched:
+            self.fetch(url)
+        self._touch(path)
+        return path
+
+    def fetch(self, url: str) -> bool:
+        path = self.mirror_path(url)
+        self._fetched.add(path)
+        return _git("fetch", "--prune", "--quiet", "origin", cwd=path).returncode == 0
+
+    def has_commit(self, url: str, commit: str) -> bool:
+        return _git("cat-file", "-e", f"{commit}^{{commit}}", cwd=self.mirror_path(url)).returncode == 0
+
+    def ensure_commit(self, url: str, commit: str) -> bool:
+        """Mirror url, fetching it again if commit is not there yet. False if the commit does not exist"""
+        self.mirror(url)
+        if self.has_commit(url, commit):
+            return True
+        self.fetch(url)
+        return self.has_commit(url, commit)
+
+    def worktree(self, url: str, path: str, commit: str = "HEAD", checkout: bool = True) -> str:
+        """
+        Worktree of the mirror of url at path, detached at commit (created the first time, then
+            checked out). With checkout=False a new worktree has no files yet, for object reads.
+        """
+        if not self.ensure_commit(url, commit):
+            raise OSError(f"Commit {commit} not found in {url}")
+        mirror = self.mirror_path(url)
+        # resolved in the mirror: in the worktree HEAD would be its own detached HEAD, not the fetched one
+        process = _git("rev-parse", "--verify", "--quiet", f"{commit}^{{commit}}", cwd=mirror)
+        if process.returncode != 0:
+            raise OSError(f"Commit {commit} not found in {url}")
+        sha = process.stdout.decode("utf-8").strip()
+        if os.path.exists(os.path.join(path, ".git")):
+            if checkout:
+                process = _git("checkout", "--quiet", "-f", "--detach", sha, cwd=path)
+                if process.returncode != 0:
+                    raise OSError(f"git checkout {commit} failed in {path}:\n"
+                                  f"{process.stderr.decode(errors='replace')}")
+            return path
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        args = ["worktree", "add", "--quiet", "--force", "--detach"]
+        if not checkout:
+            args.append("--no-checkout")
+        process = _git(*args, os.path.abspath(path), sha, cwd=mirror)
+        if process.returncode != 0:
+            raise OSError(f"git worktree add {path} failed:\n{process.stderr.decode(errors='replace')}")
+        return path
+
+    def worktrees(self, url: str) -> List[str]:
+        return _list_worktrees(self.mirror_path(url))
+
+    def reader(self, url: str) -> GitObjectReader:
+        return GitObjectReader(self.mirror(url))
+
+    def entries(self):
+        """(last use, size, path) of every mirror"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or not entry.name.endswith(".git"):
+                continue
+            try:
+                last_used = os.stat(os.path.join(entry.path, _LAST_USED)).st_mtime
+            except OSError:
+                last_used = entry.stat().st_mtime
+            entries.append((last_used, _tree_size(entry.path), entry.path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Remove the least recently used mirrors and their worktrees. Returns the number of removed mirrors"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.basename(path) in self._used:
+                continue
+            for worktree in _list_worktrees(path):
+                shutil.rmtree(worktree, ignore_errors=True)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def remove_worktree(self, url: str, path: str):
+        _git("worktree", "remove", "--force", os.path.abspath(path), cwd=self.mirror_path(url))
+        _git("worktree", "prune", cwd=self.mirror_path(url))
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import zlib
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from .eh_visitor import ExceptionHandlingVisitor
+from .file_metrics import read_file
+from .metrics_cache import blob_hash
+from .tree_sitter_lang import parser as tree_sitter_parser
+
+# columns of the rows in the lazy body mode, instead of func_body and str_except_block
+REFERENCE_COLUMNS = ["func_blob", "start_byte", "end_byte"]
+
+
+def reference_columns(columns: List[str]) -> List[str]:
+    """columns of the lazy body mode: REFERENCE_COLUMNS in place of func_body, without str_except_block"""
+    result = []
+    for column in columns:
+        if column == "func_body":
+            result.extend(REFERENCE_COLUMNS)
+        elif column != "str_except_block":
+            result.append(column)
+    return result
+
+
+class SourceStore:
+    """
+    Content-addressed store of the mined source files: each content is kept once, zlib
+        compressed, under <directory>/<id[:2]>/<id> where id is its git blob hash (the blob
+        id git gives it), however many commits and rows refer to it. Writes are atomic, so
+        several miners can share the directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, blob_id[:2], blob_id)
+
+    def __contains__(self, blob_id: str) -> bool:
+        return os.path.exists(self._path(blob_id))
+
+    def put(self, content: bytes) -> str:
+        blob_id = blob_hash(content)
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            return blob_id
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(zlib.compress(content))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return blob_id
+
+    def get(self, blob_id: str) -> bytes:
+        """The content of a blob. Raises KeyError if it is not in the store"""
+        try:
+            with open(self._path(blob_id), "rb") as file:
+                return zlib.decompress(file.read())
+        except FileNotFoundError:
+            raise KeyError(blob_id) from None
+
+
+class StoredContents:
+    """
+    iter_file_records contents callable that puts every content it reads in a SourceStore;
+        ids maps the file paths to their blob id. read is the contents callable it wraps
+        (file_metrics.read_file, reading the files from disk, by default).
+    """
+
+    def __init__(self, store: SourceStore, read: Callable[[str], Optional[bytes]] = read_file):
+        self.store = store
+        self.read = read
+        self.ids = {}
+
+    def __call__(self, file_path) -> Optional[bytes]:
+        content = self.read(file_path)
+        if content is not None:
+            self.ids[file_path] = self.store.put(content)
+        return content
+
+    def reference(self, file_path, record) -> dict:
+        """REFERENCE_COLUMNS of a FunctionRecord of file_path"""
+        return {"func_blob": self.ids[file_path], "start_byte": record.start_byte, "end_byte": record.end_byte}
+
+
+class FunctionBodies:
+    """
+    Accessor of the function bodies of rows written in the lazy body mode (REFERENCE_COLUMNS):
+        the sources are read from the store only when a body is asked for, keeping the last
+        cache_size decoded blobs.
+    """
+
+    def __init__(self, store: SourceStore, cache_size: int = 64):
+        self.store = store
+        self.cache_size = cache_size
+        self._blobs = OrderedDict()
+        self._trees = OrderedDict()
+
+    def _cached(self, cache: OrderedDict, blob_id: str, load):
+        value = cache.pop(blob_id, None)
+        if value is None:
+            value = load(blob_id)
+        cache[blob_id] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def source(self, blob_id: str) -> bytes:
+        return self._cached(self._blobs, blob_id, self.store.get)
+
+    def body(self, blob_id: str, start_byte: int, end_byte: int) -> str:
+        """The func_body of a row"""
+        return self.source(blob_id)[int(start_byte):int(end_byte)].decode("utf-8")
+
+    def except_block(self, blob_id: str, start_byte: int, end_byte: int) -> str:
+        """The str_except_block of a row, measured again on its function"""
+        tree = self._cached(self._trees, blob_id, lambda key: tree_sitter_parser.parse(self.source(key)))
+        start_byte, end_byte = int(start_byte), int(end_byte)
+        node = tree.root_node
+        while not (node.type == "function_definition" and (node.start_byte, node.end_byte) == (start_byte, end_byte)):
+            node = next((child for child in node.children
+                         if child.start_byte <= start_byte and end_byte <= child.end_byte), None)
+            if node is None:
+                raise KeyError((blob_id, start_byte, end_byte))
+        return ExceptionHandlingVisitor().visit(node)["str_except_block"]
+
+    def materialize(self, df, except_block: bool = False):
+        """A copy of df with the func_body (and str_except_block) column of its rows"""
+        df = df.copy()
+        references = list(zip(df["func_blob"], df["start_byte"], df["end_byte"]))
+        df["func_body"] = [self.body(*reference) for reference in references]
+        if except_block:
+            df["str_except_block"] = [self.except_block(*reference) for reference in references]
+        return df
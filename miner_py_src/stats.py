@@ -1,27 +1,11 @@
 from collections import Counter
+from .eh_visitor import METRIC_NAMES, ExceptionHandlingVisitor
 from .miner_py_utils import (
     count_except,
-    count_raise,
     statement_couter,
-    is_try_except_pass,
-    is_generic_except,
-    count_broad_exception_raised,
-    count_try_except_raise,
-    count_misplaced_bare_raise,
-    count_try_else,
-    count_try_return,
-    count_finally,
-    get_except_identifiers,
-    get_raise_identifiers,
-    get_except_clause,
-    get_except_block,
-    count_nested_try,
-    is_bare_except,
-    count_bare_raise_inside_finally
 )
 from tqdm import tqdm
 from tree_sitter.binding import Node
-from .miner_py_utils import QUERY_TRY_STMT, QUERY_EXCEPT_CLAUSE
 
 
 class FileStats:
@@ -36,21 +20,33 @@ class FileStats:
     func_has_except_handler = set()
     func_has_nested_try = set()
 
-    def metrics(self, func_def: Node, file_path: str):
-        if len(QUERY_TRY_STMT.captures(func_def)) != 0:
-            self.files_try_except.add(file_path)
+    def metrics(self, func_def: Node, file_path: str, visitor: ExceptionHandlingVisitor = None):
+        if visitor is None:
+            visitor = ExceptionHandlingVisitor()
+            visitor.visit(func_def)
+
+        self.add_function(file_path, func_def.id, visitor.n_try, visitor.n_try_except,
+                          visitor.n_try_pass, visitor.n_generic_except)
 
-        captures_except = QUERY_EXCEPT_CLAUSE.captures(func_def)
+    def add_record(self, file_path: str, record):
+        """Update the stats from a file_metrics.FunctionRecord"""
+        metrics = dict(zip(METRIC_NAMES, record.metrics))
+        self.add_function(file_path, record.node_id, record.n_try, metrics["n_try_except"],
+                          metrics["n_try_pass"], metrics["n_generic_except"])
 
-        for except_clause, _ in captures_except:
-            self.func_try_except.add(f"{file_path}:{func_def.id}")
-            if is_try_except_pass(except_clause):
-                self.func_try_pass.add(f"{file_path}:{func_def.id}")
-                self.files_try_pass.add(file_path)
-            if is_generic_except(except_clause):
-                tqdm.write(f"{file_path}:{func_def.id}")
-                self.files_generic_except.add(file_path)
-                self.func_generic_except.add(f"{file_path}:{func_def.id}")
+    def add_function(self, file_path: str, func_id, n_try, n_try_except, n_try_pass, n_generic_except):
+        if n_try != 0:
+            self.files_try_except.add(file_path)
+
+        if n_try_except != 0:
+            self.func_try_except.add(f"{file_path}:{func_id}")
+        if n_try_pass != 0:
+            self.func_try_pass.add(f"{file_path}:{func_id}")
+            self.files_try_pass.add(file_path)
+        if n_generic_except != 0:
+            tqdm.write(f"{file_path}:{func_id}")
+            self.files_generic_except.add(file_path)
+            self.func_generic_except.add(f"{file_path}:{func_id}")
 
     def __str__(self) -> str:
         return (
@@ -67,73 +63,18 @@ class FileStats:
             f"# generic exception per function definition: {(len(self.func_generic_except) / max(self.num_functions, 1)) * 100:.2f}%\n"
         )
 
-    def get_metrics(self, func_def: Node):
+    def get_metrics(self, func_def: Node, file_path: str = None):
         """
-        Return a list of exception handling metrics in the following order: try-except clauses,
-            try-pass, generic-except
+        Return a dict of exception handling metrics (see eh_visitor.METRIC_NAMES) computed in a
+            single walk over the function. If file_path is given, the file stats are updated too.
         """
-        n_try_except, n_try_pass, n_generic_except, n_bare_except = 0, 0, 0, 0
-
-        captures_except = get_except_clause(func_def)
-
-        n_captures_broad_raise = count_broad_exception_raised(func_def)
-
-        n_captures_try_except_raise = count_try_except_raise(func_def)
-
-        n_captures_misplaced_bare_raise = count_misplaced_bare_raise(func_def)
-
-        n_bare_raise_finally = count_bare_raise_inside_finally(func_def)
-
-        n_raise = count_raise(func_def)
-
-        n_try_else = count_try_else(func_def)
-
-        n_try_return = count_try_return(func_def)
-
-        #captures_except_ident = QUERY_EXCEPT_IDENTIFIER.captures(func_def)       
-
-        n_nested_try = count_nested_try(func_def)
-
-        n_finally = count_finally(func_def) 
-    
-        captures_except_ident = get_except_identifiers(func_def)
-
-        captures_raise_ident = get_raise_identifiers(func_def)
-
-        captures_except_block = list(map(lambda x: x[0].text.decode('utf-8'), get_except_block(func_def)))
-        
-        for except_clause, _ in captures_except:
-            n_try_except += 1
-            if is_try_except_pass(except_clause):
-                n_try_pass += 1
-            if is_generic_except(except_clause):
-                # tqdm.write(f"{file_path}:{func_def.id}")
-                n_generic_except += 1
-            if is_bare_except(except_clause):
-                n_bare_except += 1
+        visitor = ExceptionHandlingVisitor()
+        metrics = visitor.visit(func_def)
 
-        str_except_identifiers = " ".join(captures_except_ident)
-        str_raise_identifiers = " ".join(captures_raise_ident)
-        str_except_block = " ".join(captures_except_block)
+        if file_path is not None:
+            self.metrics(func_def, file_path, visitor)
 
-        return {
-            "n_try_except": n_try_except,
-            "n_try_pass": n_try_pass,
-            "n_finally": n_finally,
-            "n_generic_except": n_generic_except,
-            "n_raise": n_raise,
-            "n_captures_broad_raise": n_captures_broad_raise,
-            "n_captures_try_except_raise": n_captures_try_except_raise,
-            "n_captures_misplaced_bare_raise": n_captures_misplaced_bare_raise,
-            "n_try_else": n_try_else,
-            "n_try_return": n_try_return,
-            "str_except_identifiers": str_except_identifiers,
-            "str_raise_identifiers": str_raise_identifiers,
-            "str_except_block": str_except_block,
-            "n_nested_try": n_nested_try,
-            "n_bare_except": n_bare_except,
-            "n_bare_raise_finally" : n_bare_raise_finally
-        }
+        return metrics
 
 
 class TBLDStats:
@@ -1,3 +1,6 @@
+import hashlib
+import os
+
 from tree_sitter import Language, Parser
 from tree_sitter.binding import Query
 
@@ -6,74 +9,149 @@ if __name__ == '__main__':
 else:
     root = ''
 
-Language.build_library(
-    root + 'build/my-languages.so',
-    [
-        root + 'tree-sitter-python'
-    ]
-)
+# prebuilt shared library with the python grammar, skips the build step
+LIBRARY_ENV = 'TREE_SITTER_PYTHON_LIB'
+LIBRARY_PATH = 'build/my-languages.so'
+GRAMMAR_PATH = 'tree-sitter-python'
+
+package_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def is_library_outdated(library_path, grammar_path):
+    sources = [os.path.join(grammar_path, 'src', name)
+               for name in ('parser.c', 'scanner.c', 'scanner.cc')]
+    library_mtime = os.path.getmtime(library_path)
+    return any(os.path.exists(source) and os.path.getmtime(source) > library_mtime
+               for source in sources)
+
+
+def load_language() -> Language:
+    """
+    Load the python grammar from, in order: the shared library in $TREE_SITTER_PYTHON_LIB,
+        an up to date build/my-languages.so (relative to the working directory or to the
+        repository), the tree_sitter_languages package, and only then build tree-sitter-python
+        with Language.build_library (needs a C compiler and a writable build/ directory).
+    """
+    library_path = os.environ.get(LIBRARY_ENV)
+    if library_path:
+        return Language(library_path, 'python')
+
+    bases = [root, package_root]
+    for base in bases:
+        library_path = os.path.join(base, LIBRARY_PATH)
+        if (os.path.exists(library_path)
+                and not is_library_outdated(library_path, os.path.join(base, GRAMMAR_PATH))):
+            return Language(library_path, 'python')
+
+    try:
+        from tree_sitter_languages import get_language
+    except ImportError:
+        pass
+    else:
+        return get_language('python')
+
+    base = next((b for b in bases if os.path.isdir(os.path.join(b, GRAMMAR_PATH))), root)
+    Language.build_library(
+        os.path.join(base, LIBRARY_PATH),
+        [
+            os.path.join(base, GRAMMAR_PATH)
+        ]
+    )
+    return Language(os.path.join(base, LIBRARY_PATH), 'python')
+
+
+def grammar_version(language: Language = None) -> str:
+    """Hash of the shared library the grammar was loaded from"""
+    language = language or PY_LANGUAGE
+    with open(language.lib._name, 'rb') as library:
+        return hashlib.sha1(library.read()).hexdigest()[:12]
+
+
+class LazyQuery:
+    """Tree-sitter query compiled the first time it is used"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self._query = None
+
+    @property
+    def is_compiled(self) -> bool:
+        return self._query is not None
+
+    @property
+    def query(self) -> Query:
+        if self._query is None:
+            self._query = PY_LANGUAGE.query(self.source)
+        return self._query
+
+    def captures(self, node, *args, **kwargs):
+        return self.query.captures(node, *args, **kwargs)
+
+    def matches(self, node, *args, **kwargs):
+        return self.query.matches(node, *args, **kwargs)
+
 
-PY_LANGUAGE = Language(root + 'build/my-languages.so', 'python')
+PY_LANGUAGE = load_language()
 
 parser = Parser()
 parser.set_language(PY_LANGUAGE)
 
-QUERY_FUNCTION_DEF: Query = PY_LANGUAGE.query(
+QUERY_FUNCTION_DEF: LazyQuery = LazyQuery(
     "(function_definition) @function.def")
 
-QUERY_FUNCTION_IDENTIFIER: Query = PY_LANGUAGE.query(
+QUERY_FUNCTION_IDENTIFIER: LazyQuery = LazyQuery(
     """(function_definition (identifier) @function.def)""")
 
-QUERY_FUNCTION_BODY: Query = PY_LANGUAGE.query(
+QUERY_FUNCTION_BODY: LazyQuery = LazyQuery(
     """ (function_definition body: (block) @body)""")
 
-QUERY_EXPRESSION_STATEMENT: Query = PY_LANGUAGE.query(
+QUERY_EXPRESSION_STATEMENT: LazyQuery = LazyQuery(
     """(expression_statement) @expression.stmt""")
 
-QUERY_TRY_STMT: Query = PY_LANGUAGE.query(
+QUERY_TRY_STMT: LazyQuery = LazyQuery(
     """(try_statement) @try.statement""")
 
-QUERY_TRY_EXCEPT: Query = PY_LANGUAGE.query(
+QUERY_TRY_EXCEPT: LazyQuery = LazyQuery(
     """(try_statement
         (except_clause)* @except.clause) @try.stmt""")
 
-QUERY_EXCEPT_CLAUSE: Query = PY_LANGUAGE.query(
+QUERY_EXCEPT_CLAUSE: LazyQuery = LazyQuery(
     """(except_clause) @except.clause""")
 
-QUERY_EXCEPT_BLOCK: Query = PY_LANGUAGE.query(
+QUERY_EXCEPT_BLOCK: LazyQuery = LazyQuery(
     """(except_clause (block) @body)""")
 
-QUERY_EXCEPT_EXPRESSION: Query = PY_LANGUAGE.query(
+QUERY_EXCEPT_EXPRESSION: LazyQuery = LazyQuery(
     """(except_clause (_) @except.expression (block))""")
 
-QUERY_PASS_BLOCK: Query = PY_LANGUAGE.query(
+QUERY_PASS_BLOCK: LazyQuery = LazyQuery(
     """(block 
 	(pass_statement) @pass.stmt )""")
 
-QUERY_FIND_IDENTIFIERS: Query = PY_LANGUAGE.query(
+QUERY_FIND_IDENTIFIERS: LazyQuery = LazyQuery(
     """(identifier) @identifier""")
 
-QUERY_RAISE_STATEMENT: Query = PY_LANGUAGE.query(
+QUERY_RAISE_STATEMENT: LazyQuery = LazyQuery(
     """(raise_statement) @raise.stmt""")
 
-QUERY_RAISE_STATEMENT_IDENTIFIER: Query = PY_LANGUAGE.query(
+QUERY_RAISE_STATEMENT_IDENTIFIER: LazyQuery = LazyQuery(
     """(raise_statement [
                 (identifier) @raise.identifier 
                 (call function: (identifier) @raise.identifier)
             ]*)""")
 
-QUERY_TRY_EXCEPT_RAISE: Query = PY_LANGUAGE.query(
+QUERY_TRY_EXCEPT_RAISE: LazyQuery = LazyQuery(
     """(except_clause (block 
             (raise_statement [
                 (identifier) @raise.identifier 
                 (call function: (identifier) @raise.identifier)
             ]*) @raise.stmt))""")
 
-QUERY_TRY_ELSE: Query = PY_LANGUAGE.query(
+QUERY_TRY_ELSE: LazyQuery = LazyQuery(
     """(try_statement (else_clause) @else.clause )""")
 
-QUERY_TRY_RETURN: Query = PY_LANGUAGE.query(
+QUERY_TRY_RETURN: LazyQuery = LazyQuery(
     """(try_statement (block (return_statement)) @return.stmt )""")
 
-QUERY_FINALLY_BLOCK: Query = PY_LANGUAGE.query(
+QUERY_FINALLY_BLOCK: LazyQuery = LazyQuery(
     """(finally_clause) @finally.stmt""")
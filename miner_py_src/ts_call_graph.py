@@ -0,0 +1,271 @@
+import builtins
+import os
+from collections import namedtuple
+
+from .compact_graph import CallGraphBuilder, CompactCallGraph
+
+# what a file contributes to the call graph, extracted from the tree collect_parser already has
+#   imports: (alias, level, target) with level the number of leading dots of a relative import
+#            and alias '*' for `from target import *`
+#   definitions: qualified names of the functions ('f', 'C.m', 'f.inner')
+#   classes: (qualified name, (base class expressions))
+#   calls: (caller qualified name, '' for module level code; enclosing class; callee expression)
+FileCallFacts = namedtuple('FileCallFacts', ['imports', 'definitions', 'classes', 'calls'])
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+_MAX_ALIAS_DEPTH = 8
+
+
+def _text(node) -> str:
+    return node.text.decode('utf-8')
+
+
+def dotted_expression(node):
+    """'a.b.c' for an identifier or a chain of attributes of an identifier, None otherwise"""
+    parts = []
+    while node.type == 'attribute':
+        attribute = node.child_by_field_name('attribute')
+        parts.append(_text(attribute))
+        node = node.child_by_field_name('object')
+    if node.type != 'identifier':
+        return None
+    parts.append(_text(node))
+    return '.'.join(reversed(parts))
+
+
+def _callee_expression(node):
+    """dotted_expression of the called function, 'super().<method>' for super().<method>()"""
+    if node.type == 'attribute':
+        obj = node.child_by_field_name('object')
+        if obj.type == 'call' and _text(obj.child_by_field_name('function')) == 'super':
+            return f"super().{_text(node.child_by_field_name('attribute'))}"
+    return dotted_expression(node)
+
+
+def _import_names(node):
+    """(alias, name) of the names of an import statement"""
+    for child in node.children_by_field_name('name'):
+        if child.type == 'aliased_import':
+            name = _text(child.child_by_field_name('name'))
+            yield _text(child.child_by_field_name('alias')), name
+        else:
+            yield None, _text(child)
+
+
+def _import_facts(node):
+    if node.type == 'import_statement':
+        for alias, name in _import_names(node):
+            if alias is None:  # `import a.b` binds a
+                alias = name = name.split('.')[0]
+            yield alias, 0, name
+        return
+
+    module = node.child_by_field_name('module_name')
+    level, module_name = 0, _text(module)
+    if module.type == 'relative_import':
+        prefix = next(c for c in module.children if c.type == 'import_prefix')
+        level = len(_text(prefix))
+        module_name = next((_text(c) for c in module.children if c.type == 'dotted_name'), '')
+
+    if any(child.type == 'wildcard_import' for child in node.children):
+        yield '*', level, module_name
+        return
+    for alias, name in _import_names(node):
+        target = f'{module_name}.{name}' if module_name else name
+        yield alias or name, level, target
+
+
+def extract_call_facts(root) -> FileCallFacts:
+    """Imports, definitions and calls of a module tree, walking it once"""
+    imports, definitions, classes, calls = [], [], [], []
+
+    # (node, enclosing function or class qualified name, caller, enclosing class)
+    stack = [(root, '', '', '')]
+    while stack:
+        node, scope, caller, class_name = stack.pop()
+        node_type = node.type
+
+        if node_type in ('import_statement', 'import_from_statement'):
+            imports.extend(_import_facts(node))
+            continue
+
+        if node_type == 'function_definition':
+            name = _text(node.child_by_field_name('name'))
+            qualified_name = f'{scope}.{name}' if scope else name
+            definitions.append(qualified_name)
+            body = node.child_by_field_name('body')
+            if body is not None:
+                stack.append((body, qualified_name, qualified_name, class_name))
+            continue
+
+        if node_type == 'class_definition':
+            name = _text(node.child_by_field_name('name'))
+            qualified_name = f'{scope}.{name}' if scope else name
+            superclasses = node.child_by_field_name('superclasses')
+            bases = () if superclasses is None else tuple(
+                base for base in map(dotted_expression, superclasses.named_children) if base)
+            classes.append((qualified_name, bases))
+            body = node.child_by_field_name('body')
+            if body is not None:
+                stack.append((body, qualified_name, caller, qualified_name))
+            continue
+
+        if node_type == 'call':
+            callee = _callee_expression(node.child_by_field_name('function'))
+            if callee is not None:
+                calls.append((caller, class_name, callee))
+
+        stack.extend((child, scope, caller, class_name) for child in reversed(node.named_children))
+
+    return FileCallFacts(tuple(imports), tuple(definitions), tuple(classes), tuple(calls))
+
+
+def module_name(file_path: str, root: str) -> str:
+    """Dotted module name of file_path under root ('pkg' for pkg/__init__.py)"""
+    name = os.path.splitext(os.path.relpath(file_path, root))[0].replace(os.sep, '.')
+    if name == '__init__' or name.endswith('.__init__'):
+        name = name[:-len('__init__')].rstrip('.')
+    return name
+
+
+class _Resolver:
+    def __init__(self, facts_by_file: dict, root: str):
+        self.facts = {}
+        self.packages = set()
+        for file_path, facts in facts_by_file.items():
+            module = module_name(file_path, root)
+            self.facts[module] = facts
+            if os.path.basename(file_path) == '__init__.py':
+                self.packages.add(module)
+
+        self.definitions = set()
+        self.bases = {}
+        self.imports = {}
+        self.wildcards = {}
+        for module, facts in self.facts.items():
+            self.definitions.update(f'{module}.{name}' if module else name for name in facts.definitions)
+            for name, bases in facts.classes:
+                self.bases[f'{module}.{name}' if module else name] = (module, bases)
+            aliases = self.imports[module] = {}
+            for alias, level, target in facts.imports:
+                target = self.absolute(module, level, target)
+                if alias == '*':
+                    self.wildcards.setdefault(module, []).append(target)
+                else:
+                    aliases[alias] = target
+
+    def absolute(self, module: str, level: int, target: str) -> str:
+        if level == 0:
+            return target
+        package = module.split('.') if module in self.packages else module.split('.')[:-1]
+        package = package[:len(package) - (level - 1)] if level > 1 else package
+        return '.'.join(filter(None, ['.'.join(package), target]))
+
+    def is_internal(self, name: str) -> bool:
+        parts = name.split('.')
+        return any('.'.join(parts[:i]) in self.facts for i in range(len(parts), 0, -1))
+
+    def resolve(self, name: str, depth: int = 0):
+        """Function or class defined in the project that the absolute name refers to"""
+        if name in self.definitions or name in self.bases:
+            return name
+        if depth > _MAX_ALIAS_DEPTH:
+            return None
+
+        # name is <module>.<alias>[.<attribute>...], follow the alias imported by the module
+        parts = name.split('.')
+        for i in range(len(parts) - 1, -1, -1):
+            module = '.'.join(parts[:i])
+            if module not in self.facts:
+                continue
+            alias, rest = parts[i], parts[i + 1:]
+            target = self.imports[module].get(alias)
+            if target is not None:
+                return self.resolve('.'.join([target, *rest]), depth + 1)
+            for wildcard in self.wildcards.get(module, ()):
+                found = self.resolve('.'.join([wildcard, alias, *rest]), depth + 1)
+                if found is not None:
+                    return found
+            return None
+        return None
+
+    def lookup(self, module: str, scope: str, name: str):
+        """Absolute name bound to name in scope (a qualified function name) of module"""
+        parts = scope.split('.') if scope else []
+        for i in range(len(parts), -1, -1):
+            candidate = '.'.join(filter(None, [module, *parts[:i], name]))
+            if candidate in self.definitions or candidate in self.bases:
+                return candidate
+        if name in self.imports.get(module, {}):
+            return self.imports[module][name]
+        for wildcard in self.wildcards.get(module, ()):
+            found = self.resolve(f'{wildcard}.{name}')
+            if found is not None:
+                return found
+        return None
+
+    def method(self, class_name: str, name: str, seen=None, inherited_only=False):
+        """class_name.name or the method of a base class (depth first, like a simple MRO)"""
+        candidate = f'{class_name}.{name}'
+        if candidate in self.definitions and not inherited_only:
+            return candidate
+        seen = seen if seen is not None else set()
+        seen.add(class_name)
+        module, bases = self.bases.get(class_name, ('', ()))
+        for base in bases:
+            head, _, rest = base.partition('.')
+            bound = self.lookup(module, '', head)
+            base_class = bound and self.resolve('.'.join(filter(None, [bound, rest])))
+            if base_class in self.bases and base_class not in seen:
+                found = self.method(base_class, name, seen)
+                if found is not None:
+                    return found
+        return None
+
+    def callee(self, module: str, caller: str, class_name: str, expression: str):
+        """Call graph node of the called function (PyCG names), None if it is unknown"""
+        head, _, rest = expression.partition('.')
+        if head in ('self', 'cls', 'super()') and class_name and rest and '.' not in rest:
+            found = self.method(f'{module}.{class_name}' if module else class_name, rest,
+                                inherited_only=head == 'super()')
+            return f'...{found}' if found else None
+
+        bound = self.lookup(module, caller, head)
+        if bound is None:
+            return f'<builtin>.{head}' if head in BUILTIN_NAMES and not rest else None
+
+        name = '.'.join(filter(None, [bound, rest]))
+        found = self.resolve(name)
+        if found is None:
+            return None if self.is_internal(name) else name  # external library
+        if found in self.bases:
+            init = self.method(found, '__init__')
+            return f'...{init}' if init else None
+        return f'...{found}'
+
+
+def build_call_graph(facts_by_file: dict, root: str) -> CompactCallGraph:
+    """
+    Call graph of the project from the FileCallFacts of its files ({file path: facts}), with
+        the node names PyCG gives them in generate_cfg ('...<module>.<function>' for the
+        project, '<module>.<function>' for libraries and '<builtin>.<name>').
+        Imports, module level functions, classes (their __init__), self/cls methods (looked
+        up in the base classes too) and super() methods are resolved; calls on other objects
+        are not.
+    """
+    resolver = _Resolver(facts_by_file, root)
+    builder = CallGraphBuilder()
+    for module, facts in sorted(resolver.facts.items()):
+        calls = {}
+        calls[''] = []
+        for name in facts.definitions:
+            calls[name] = []
+        for caller, class_name, expression in facts.calls:
+            callee = resolver.callee(module, caller, class_name, expression)
+            if callee is not None:
+                calls.setdefault(caller, []).append(callee)
+
+        for caller, callees in calls.items():
+            builder.add_calls('...' + '.'.join(filter(None, [module, caller])), dict.fromkeys(callees))
+    return builder.build()
@@ -0,0 +1,363 @@
+import builtins
+import os
+import re
+
+# symbol: (message id, message) of the pylint exceptions checker messages this module emits
+MESSAGES = {
+    "bad-except-order": ("E0701", "Bad except clauses order ({})"),
+    "raising-bad-type": ("E0702", "Raising {} while only classes or instances are allowed"),
+    "misplaced-bare-raise": ("E0704", "The raise statement is not inside an except clause"),
+    "bad-exception-cause": ("E0705", "Exception cause set to something which is not an exception, nor None"),
+    "raising-non-exception": ("E0710", "Raising a class which doesn't inherit from BaseException"),
+    "notimplemented-raised": ("E0711", "NotImplemented raised - should raise NotImplementedError"),
+    "bare-except": ("W0702", "No exception type(s) specified"),
+    "broad-exception-caught": ("W0718", "Catching too general exception {}"),
+    "duplicate-except": ("W0705", "Catching previously caught exception type {}"),
+    "try-except-raise": ("W0706", "The except handler raises immediately"),
+    "raise-missing-from": ("W0707", "Consider explicitly re-raising using {}'{} from {}'"),
+    "binary-op-exception": ("W0711", 'Exception to catch is the result of a binary "{}" operation'),
+    "raising-format-tuple": ("W0715", "Exception arguments suggest string formatting might be intended"),
+    "wrong-exception-operation": ("W0716", "Invalid exception operation. {}"),
+    "broad-exception-raised": ("W0719", "Raising too general exception: {}"),
+}
+
+OVERGENERAL_EXCEPTIONS = frozenset(("Exception", "BaseException"))
+
+_BUILTIN_CLASSES = {name: value for name, value in vars(builtins).items() if isinstance(value, type)}
+
+_HANDLER_TYPES = ("except_clause", "except_group_clause")
+
+_PRAGMA = re.compile(r"#.*?\bpylint:\s*(disable|disable-next)\s*=\s*([\w\-, ]+)")
+
+# nodes with their own locals (astroid LocalsDictNodeNG): an except clause around them does not count
+_SCOPE_TYPES = frozenset(("function_definition", "class_definition", "lambda", "list_comprehension",
+                          "set_comprehension", "dictionary_comprehension", "generator_expression"))
+
+# literal: the class pylint infers for it (raising-bad-type, bad-exception-cause)
+_LITERAL_TYPES = {"integer": "int", "float": "float", "true": "bool", "false": "bool", "none": "NoneType",
+                  "concatenated_string": "str", "tuple": "tuple", "list": "List", "dictionary": "Dict",
+                  "set": "Set"}
+
+
+def _text(node) -> str:
+    return node.text.decode("utf-8")
+
+
+def _named_children(node):
+    return [child for child in node.named_children if child.type != "comment"]
+
+
+def _unparenthesize(node):
+    while node is not None and node.type == "parenthesized_expression":
+        children = _named_children(node)
+        node = children[0] if len(children) == 1 else None
+    return node
+
+
+def _literal_type(node):
+    """Class name of a literal (None for f-strings and for anything that is not a literal)"""
+    if node.type == "string":
+        if any(child.type == "interpolation" for child in node.named_children):
+            return None
+        prefix = re.match(rb"[A-Za-z]*", node.text).group().lower()
+        return "bytes" if b"b" in prefix else "str"
+    return _LITERAL_TYPES.get(node.type)
+
+
+def _builtin_class(node):
+    """The builtin class an identifier names (shadowing is not followed)"""
+    if node is not None and node.type == "identifier":
+        return _BUILTIN_CLASSES.get(_text(node))
+    return None
+
+
+def _is_exception_class(cls) -> bool:
+    return cls is not None and issubclass(cls, BaseException)
+
+
+def module_name(file_path: str) -> str:
+    """Dotted module name pylint gives to file_path, following the __init__.py of its parents"""
+    path = os.path.abspath(file_path)
+    parts = [os.path.splitext(os.path.basename(path))[0]]
+    directory = os.path.dirname(path)
+    while os.path.isfile(os.path.join(directory, "__init__.py")):
+        parts.append(os.path.basename(directory))
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    if parts[0] == "__init__" and len(parts) > 1:
+        parts = parts[1:]
+    return ".".join(reversed(parts))
+
+
+class _Handler:
+    __slots__ = ("node", "type", "name", "body")
+
+    def __init__(self, node):
+        self.node = node
+        self.type, self.name, self.body = None, None, []
+        for child in _named_children(node):
+            if child.type == "block":
+                self.body = _named_children(child)
+            elif child.type == "as_pattern":
+                children = _named_children(child)
+                self.type = _unparenthesize(children[0]) if children else None
+                alias = child.child_by_field_name("alias")
+                if alias is not None:
+                    self.name = _text(alias).strip()
+            elif self.type is None:
+                self.type = _unparenthesize(child)
+
+    def raises(self) -> bool:
+        return any(statement.type == "raise_statement" for statement in self.body)
+
+    def parts(self):
+        """The caught expressions, the elements of a tuple"""
+        if self.type is None:
+            return []
+        if self.type.type in ("tuple", "list"):
+            return [_unparenthesize(child) for child in _named_children(self.type)]
+        return [self.type]
+
+
+def _disabled_range(comment, source: bytes):
+    """(first line, last line, names) disabled by a `# pylint: disable=` comment, None for other comments"""
+    match = _PRAGMA.search(_text(comment))
+    if match is None:
+        return None
+    names = {name.strip() for name in match.group(2).split(",")} - {""}
+    line = comment.start_point[0] + 1
+    if match.group(1) == "disable-next":
+        return line + 1, line + 1, names
+    if source[comment.start_byte - comment.start_point[1]:comment.start_byte].strip():
+        return line, line, names  # after a statement
+    parent = comment.parent
+    return line, (parent.end_point[0] + 1 if parent is not None else line), names
+
+
+def _raise_parts(node):
+    cause = node.child_by_field_name("cause")
+    exc = next((child for child in _named_children(node) if cause is None or child.id != cause.id), None)
+    return _unparenthesize(exc), _unparenthesize(cause)
+
+
+class ExceptionsChecker:
+    """
+    The pylint exceptions checker on a tree-sitter tree, without inference: names are taken
+        as written and only the builtin classes are resolved (for the class hierarchy of
+        bad-except-order and try-except-raise, and raising-non-exception).
+        lint() returns pylint JSON reporter records ('message-id', 'symbol', 'line'...),
+        with lines from 1 and columns in bytes from 0, like pylint. The `# pylint: disable=`
+        comments are followed: on the line of a statement for that line, on a line of their
+        own up to the end of the enclosing block, and disable-next for the next line.
+        catching-non-exception (E0712) needs inference and is not reported.
+    """
+
+    def __init__(self, path: str = "", module: str = ""):
+        self.path = path
+        self.module = module
+        self.messages = []
+
+    def add(self, symbol: str, node, obj: str, *args):
+        message_id, template = MESSAGES[symbol]
+        self.messages.append({
+            "type": "error" if message_id[0] == "E" else "warning",
+            "module": self.module,
+            "obj": obj,
+            "line": node.start_point[0] + 1,
+            "column": node.start_point[1],
+            "endLine": node.end_point[0] + 1,
+            "endColumn": node.end_point[1],
+            "path": self.path,
+            "symbol": symbol,
+            "message": template.format(*args),
+            "message-id": message_id,
+        })
+
+    def lint(self, root) -> list:
+        self.messages = []
+        disabled = []  # (first line, last line, message ids and symbols)
+        source = None
+        # (node, obj, except clause in the same locals scope, except clause in the same function,
+        #  name of the function if it is a method)
+        stack = [(root, "", None, None, None)]
+        while stack:
+            node, obj, scope_handler, function_handler, method = stack.pop()
+            node_type = node.type
+
+            if node_type == "comment":
+                source = root.text if source is None else source
+                pragma = _disabled_range(node, source)
+                if pragma is not None:
+                    disabled.append(pragma)
+            elif node_type == "try_statement":
+                self._check_try(node, obj)
+            elif node_type == "raise_statement":
+                self._check_raise(node, obj, scope_handler, function_handler, method)
+
+            if node_type in _HANDLER_TYPES:
+                scope_handler = function_handler = node
+            elif node_type in _SCOPE_TYPES:
+                scope_handler = None
+                if node_type == "function_definition":
+                    function_handler = None
+                    parent = node.parent.parent if node.parent.type == "decorated_definition" else node.parent
+                    in_class = parent is not None and parent.type == "block" and parent.parent.type == "class_definition"
+                    name = _text(node.child_by_field_name("name"))
+                    method = name if in_class else None
+                    obj = f"{obj}.{name}" if obj else name
+                elif node_type == "class_definition":
+                    method = None
+                    name = _text(node.child_by_field_name("name"))
+                    obj = f"{obj}.{name}" if obj else name
+
+            stack.extend((child, obj, scope_handler, function_handler, method)
+                         for child in reversed(node.named_children))
+        if disabled:
+            self.messages = [message for message in self.messages if not any(
+                first <= message["line"] <= last and (names & {"all", message["symbol"], message["message-id"]})
+                for first, last, names in disabled)]
+        return self.messages
+
+    def _check_try(self, node, obj: str):
+        handlers = [_Handler(child) for child in node.named_children if child.type in _HANDLER_TYPES]
+        self._check_try_except_raise(handlers, obj)
+
+        caught = []
+        for index, handler in enumerate(handlers):
+            if handler.type is None:
+                if not handler.raises():
+                    self.add("bare-except", handler.node, obj)
+                if index < len(handlers) - 1:
+                    self.add("bad-except-order", node, obj, "empty except clause should always appear last")
+                continue
+
+            if handler.type.type == "boolean_operator":
+                operator = handler.type.child_by_field_name("operator")
+                self.add("binary-op-exception", handler.node, obj, _text(operator))
+                continue
+            if handler.type.type in ("binary_operator", "comparison_operator"):
+                self._check_exception_operation(handler.type, obj)
+
+            parts = [part for part in handler.parts() if part is not None and part.type in ("identifier", "attribute")]
+            for part in parts:
+                name = _text(part)
+                cls = _builtin_class(part)
+                for previous_name, previous_cls in caught:
+                    if previous_cls is not None and cls is not None and previous_cls is not cls \
+                            and issubclass(cls, previous_cls):
+                        self.add("bad-except-order", handler.type, obj,
+                                 f"{previous_cls.__name__} is an ancestor class of {cls.__name__}")
+                if name in OVERGENERAL_EXCEPTIONS and not handler.raises():
+                    self.add("broad-exception-caught", handler.type, obj, name)
+                if any(previous_name == name for previous_name, _ in caught):
+                    self.add("duplicate-except", handler.type, obj, name.rsplit(".", 1)[-1])
+            caught.extend((_text(part), _builtin_class(part)) for part in parts)
+
+    def _check_exception_operation(self, operation, obj: str):
+        left = operation.child_by_field_name("left")
+        if operation.type == "comparison_operator":
+            operands = _named_children(operation)
+            suggestion = f"Did you mean '({', '.join(_text(operand) for operand in operands)})' instead?"
+            self.add("wrong-exception-operation", operation, obj, suggestion)
+            return
+        right = operation.child_by_field_name("right")
+        if _unparenthesize(left).type == "tuple" and _unparenthesize(right).type == "tuple":
+            if _text(operation.child_by_field_name("operator")) == "+":
+                return
+            suggestion = f"Did you mean '({_text(left)} + {_text(right)})' instead?"
+        else:
+            suggestion = f"Did you mean '({_text(left)}, {_text(right)})' instead?"
+        self.add("wrong-exception-operation", operation, obj, suggestion)
+
+    def _check_try_except_raise(self, handlers, obj: str):
+        bare_raise, bare_handler, bare_classes = False, None, []
+        for handler in handlers:
+            if bare_raise:
+                # a later handler catching a parent class of the re-raised ones makes the raise useful
+                current = handler.parts()
+                if not current:
+                    return
+                for part in current:
+                    cls = _builtin_class(part)
+                    if cls is not None and any(previous is not None and previous is not cls
+                                               and issubclass(previous, cls) for previous in bare_classes):
+                        bare_raise = False
+                        break
+            first = handler.body[0] if handler.body else None
+            if first is not None and first.type == "raise_statement" and _raise_parts(first)[0] is None:
+                bare_raise, bare_handler = True, handler
+                bare_classes = [_builtin_class(part) for part in handler.parts()]
+        if bare_raise:
+            self.add("try-except-raise", bare_handler.node, obj)
+
+    def _check_raise(self, node, obj: str, scope_handler, function_handler, method):
+        exc, cause = _raise_parts(node)
+        if exc is None:
+            if function_handler is None and method != "__exit__":
+                self.add("misplaced-bare-raise", node, obj)
+            return
+
+        if cause is None:
+            self._check_raise_missing_from(node, exc, obj, scope_handler)
+        elif cause.type != "none" and _literal_type(cause) is not None:
+            self.add("bad-exception-cause", node, obj)
+
+        callee = exc.child_by_field_name("function") if exc.type == "call" else exc
+        if callee is not None and callee.type == "identifier":
+            name = _text(callee)
+            if name == "NotImplemented":
+                self.add("notimplemented-raised", node, obj)
+                if exc is callee:
+                    self.add("raising-bad-type", node, obj, "NotImplementedType")
+            elif name in OVERGENERAL_EXCEPTIONS:
+                self.add("broad-exception-raised", node, obj, name)
+
+        if exc.type == "call":
+            arguments = exc.child_by_field_name("arguments")
+            positional = [arg for arg in _named_children(arguments) if arg.type not in (
+                "keyword_argument", "list_splat", "dictionary_splat")] if arguments is not None else []
+            if len(positional) >= 2 and positional[0].type in ("string", "concatenated_string") \
+                    and _literal_type(positional[0]) == "str":
+                message = _text(positional[0])
+                if "%" in message or ("{" in message and "}" in message):
+                    self.add("raising-format-tuple", node, obj)
+            return
+
+        literal = _literal_type(exc)
+        if literal is not None:
+            self.add("raising-bad-type", node, obj, literal)
+            return
+        cls = _builtin_class(exc)
+        if cls is not None and not _is_exception_class(cls):
+            self.add("raising-non-exception", node, obj)
+
+    def _check_raise_missing_from(self, node, exc, obj: str, handler_node):
+        if handler_node is None:
+            return
+        handler = _Handler(handler_node)
+        statement = re.sub(r"\s+", " ", _text(node))
+        if handler.name is None:
+            caught = "Exception"
+            if handler.type is not None and handler.type.type in ("identifier", "tuple"):
+                caught = _text(handler.type)
+            self.add("raise-missing-from", node, obj, f"'except {caught} as exc' and ", statement, "exc")
+        elif (exc.type == "call" and exc.child_by_field_name("function").type == "identifier") or \
+                (exc.type == "identifier" and _text(exc) != handler.name):
+            self.add("raise-missing-from", node, obj, "", statement, handler.name)
+
+
+def lint_tree(root, file_path: str = "", module: str = None) -> list:
+    """
+    pylint exceptions checker records of a module tree (see ExceptionsChecker). Their 'path'
+        is file_path relative to the working directory when it is inside it, as in pylint.
+    """
+    if module is None:
+        module = module_name(file_path) if file_path else ""
+    path = file_path
+    if file_path:
+        prefix = os.getcwd() + os.sep
+        absolute = os.path.abspath(file_path)
+        path = absolute[len(prefix):] if absolute.startswith(prefix) else file_path
+    return ExceptionsChecker(path, module).lint(root)
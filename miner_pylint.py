@@ -1,28 +1,31 @@
-import json
+import argparse
 import os
 import pathlib
-from subprocess import PIPE, call, run
 
 import pandas as pd
 from pydriller import Git
 from tqdm import tqdm
 
+from miner_py_src.fetcher import FetchJob, iter_fetched
+from miner_py_src.file_metrics import iter_file_records
+from miner_py_src.lint_sink import JsonlSink, lint_output_path
+from miner_py_src.pylint_runner import iter_pylint_results, run_pylint
+from miner_py_src.repo_cache import RepoCache
 from utils import create_logger
 
 logger = create_logger("exception_miner", "exception_miner.log")
 
 
-def fetch_gh(projects, dir='projects/py/'):
-    for index, row in projects.iterrows():
-        project = row['name']
-        try:
-            path = os.path.join(os.getcwd(), dir, project)
-            git_cmd = "git clone {}.git --recursive {}".format(
-                row['repo'], path)
-            call(git_cmd, shell=True)
-            logger.warning("EH MINING: cloned project")
-        except Exception as e:
-            logger.warning(f"EH MINING: error cloing project {project} {e}")
+def fetch_gh(projects, dir='projects/py/', mirrors: RepoCache = None, jobs=4, partial=True):
+    """Clone the projects, jobs at a time, and yield the name of each one as soon as it is cloned"""
+    fetch_jobs = [FetchJob(row['name'], f"{row['repo']}.git", os.path.join(os.getcwd(), dir, str(row['name'])), None)
+                  for index, row in projects.iterrows()]
+    for result in iter_fetched(fetch_jobs, jobs, partial, mirrors):
+        if result.error is not None:
+            logger.warning(f"EH MINING: error cloing project {result.job.name} {result.error}")
+            continue
+        logger.warning(f"EH MINING: cloned project {result.job.name} in {result.seconds:.1f}s")
+        yield result.job.name
 
 
 def fetch_repositories(project):
@@ -33,12 +36,6 @@ def fetch_repositories(project):
     # for commit in Repository(row['repo'], clone_repo_to="projects").traverse_commits():
     # project = row["name"]
 
-    if not os.path.exists("output/pytlint"):
-        os.mkdir("output/pytlint")
-
-    if not os.path.exists(f"output/pytlint/{project}"):
-        os.mkdir(f"output/pytlint/{project}")
-
     try:
         path = os.path.join(os.getcwd(), "projects/py", project)
         # git_cmd = "git clone {}.git --recursive {}".format(row["repo"], path)
@@ -64,41 +61,83 @@ def fetch_repositories(project):
         )
 
 
-def collect_smells(files, project):
+def collect_smells(files, project, sink: JsonlSink):
     for file in tqdm(files):
         if pathlib.Path(file).suffix == ".py":
             try:
-                command = "pylint {0} -v --output {1} --output-format json --disable=all --enable {2}".format(
-                    file,
-                    f"output/pytlint/{project}/{os.path.basename(file)}.json",
-                    "exceptions",
-                    # "E0701,E0702,E0704,E0710,E0711,E0712,W0702,W0718,W0705,W0706,W0707,W0711,W0715,W0716,W0719",
-                    # os.path.dirname(file),
-                    # os.path.basename(file),
-                )
-                run([command], shell=True, executable="/bin/bash", stdout=PIPE)
-
-                # open json file a get if there is empty list, if empty list, delete file, if not empty list, keep file:
-                with open(
-                    f"output/pytlint/{project}/{os.path.basename(file)}.json", "r"
-                ) as json_file:
-                    data = json.load(json_file)
-                    if data == []:
-                        os.remove(
-                            f"output/pytlint/{project}/{os.path.basename(file)}.json"
-                        )
-
+                sink.write(run_pylint([file])[file])
             except Exception as ex:
                 tqdm.write(
-                    "###### Error!!! in project {0} and file: {1}. exception: ##########".format(
+                    "###### Error!!! in project {0} and file: {1}. exception: {2} ##########".format(
                         project, file, str(ex)
                     )
                 )
 
 
+def collect_smells_batched(files, project, sink: JsonlSink, jobs=1, chunk_size=500):
+    """
+    collect_smells with one pylint process (with jobs workers) per chunk of chunk_size files.
+        A chunk pylint fails on is reported and skipped, the next chunks are still linted.
+    """
+    files = [file for file in files if pathlib.Path(file).suffix == ".py"]
+    with tqdm(total=len(files)) as pbar:
+        def skip(chunk, ex):
+            tqdm.write(f"###### Error!!! in project {project} and files {chunk[0]} to {chunk[-1]}. "
+                       f"exception: {ex}")
+            pbar.update(len(chunk))
+
+        for _, messages in iter_pylint_results(files, jobs, chunk_size, on_error=skip):
+            sink.write(messages)
+            pbar.update(1)
+
+
+def collect_smells_native(files, project, sink: JsonlSink, jobs=1):
+    """collect_smells with the tree-sitter port of the pylint exceptions checker (ts_lint), no pylint run"""
+    files = [file for file in files if pathlib.Path(file).suffix == ".py"]
+    lint_messages = {}
+    for file, _ in iter_file_records(files, jobs, lint_messages=lint_messages):
+        sink.write(lint_messages.pop(file, None))
+
+
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--mirror-dir", default=None,
+                            help="Directory of the shared bare mirrors; projects/py/<name> become worktrees of them")
+    arg_parser.add_argument("--mirror-size", type=int, default=20480,
+                            help="Maximum size of the mirrors in MB")
+    arg_parser.add_argument("--fetch-jobs", type=int, default=4,
+                            help="Number of repositories cloned or fetched at a time, while the cloned ones are mined")
+    arg_parser.add_argument("--full-clone", action="store_true",
+                            help="Clone the whole history with blobs instead of shallow or blobless partial clones")
+    arg_parser.add_argument("--batched", action="store_true",
+                            help="Lint chunks of files with one pylint process each instead of one process per file")
+    arg_parser.add_argument("--pylint-jobs", type=int, default=1,
+                            help="Number of pylint worker processes in batched mode (0 for one per CPU)")
+    arg_parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Number of files linted by each pylint process in batched mode")
+    arg_parser.add_argument("--native", action="store_true",
+                            help="Emit the exceptions checker messages from the tree-sitter trees instead of running pylint")
+    arg_parser.add_argument("--jobs", type=int, default=1,
+                            help="Number of processes used to parse the files in native mode")
+    arg_parser.add_argument("--gzip", action="store_true",
+                            help="Compress the output/pytlint/<project>.jsonl files with gzip")
+    args = arg_parser.parse_args()
+
+    mirrors = None
+    if args.mirror_dir is not None:
+        mirrors = RepoCache(args.mirror_dir, args.mirror_size * 1024 * 1024)
+
     projects = pd.read_csv("projects_py.csv", sep=",")
-    fetch_gh(projects=projects)
-    for index, row in projects.iterrows():
-        files = fetch_repositories(row['name'])
-        collect_smells(files, row['name'])
+    # the projects are linted in the order their clones finish
+    for name in fetch_gh(projects, mirrors=mirrors, jobs=args.fetch_jobs, partial=not args.full_clone):
+        files = fetch_repositories(name)
+        with JsonlSink(lint_output_path(name, args.gzip)) as sink:
+            if args.native:
+                collect_smells_native(files or [], name, sink, args.jobs)
+            elif args.batched:
+                collect_smells_batched(files or [], name, sink, args.pylint_jobs, args.chunk_size)
+            else:
+                collect_smells(files or [], name, sink)
+        logger.warning(f"EH MINING: {sink.records} lint messages in {sink.path}")
+    if mirrors is not None:
+        logger.warning(f"Mirrors: {mirrors.evict()} evicted")
@@ -0,0 +1,39 @@
+import unittest
+
+import pandas as pd
+
+from miner_py_src.accumulator import RowAccumulator
+
+
+class TestRowAccumulator(unittest.TestCase):
+    def test_same_frame_as_prepending_concat(self):
+        columns = ["file", "function", "n_raise"]
+        rows = [{"file": "a.py", "function": f"f{i}", "n_raise": i} for i in range(5)]
+
+        expected = pd.DataFrame(columns=columns)
+        for row in rows:
+            expected = pd.concat([pd.DataFrame([row], columns=columns), expected],
+                                 ignore_index=True)
+
+        accumulator = RowAccumulator(columns, reverse=True)
+        for row in rows:
+            accumulator.append(row)
+
+        actual = accumulator.to_dataframe()
+        self.assertEqual(len(accumulator), 5)
+        self.assertEqual(actual.to_csv(index=False), expected.to_csv(index=False))
+
+    def test_append_order(self):
+        accumulator = RowAccumulator(["function", "n_raise"])
+        accumulator.append({"function": "f1", "n_raise": 1})
+        accumulator.append({"function": "f2"})
+
+        actual = accumulator.to_dataframe()
+        self.assertEqual(list(actual["function"]), ["f1", "f2"])
+        self.assertTrue(pd.isna(actual["n_raise"][1]))
+
+    def test_empty(self):
+        actual = RowAccumulator(["file", "function"]).to_dataframe()
+
+        self.assertTrue(actual.empty)
+        self.assertEqual(list(actual.columns), ["file", "function"])
@@ -0,0 +1,37 @@
+import builtins
+import unittest
+
+from miner_py_src.builtin import (ANCESTOR_MASKS, BUILTIN_EXCEPTIONS,
+                                  EXCEPTION_IDS, ExceptionHierarchy)
+
+
+class TestExceptionTable(unittest.TestCase):
+    def test_same_as_python_hierarchy(self):
+        for name, _ in BUILTIN_EXCEPTIONS:
+            exception = getattr(builtins, name, None)
+            if exception is None:
+                continue  # not in this python version
+            for other, _ in BUILTIN_EXCEPTIONS:
+                other_exception = getattr(builtins, other, None)
+                if other_exception is None:
+                    continue
+                self.assertEqual(bool(ANCESTOR_MASKS[name] & 1 << EXCEPTION_IDS[other]),
+                                 issubclass(exception, other_exception), (name, other))
+
+    def test_is_caught(self):
+        hierarchy = ExceptionHierarchy()
+        handlers = hierarchy.handler_mask(['OSError', 'KeyError'])
+
+        self.assertTrue(hierarchy.is_caught('FileNotFoundError', handlers))
+        self.assertTrue(hierarchy.is_caught('IOError', handlers))
+        self.assertTrue(hierarchy.is_caught('KeyError', handlers))
+        self.assertFalse(hierarchy.is_caught('LookupError', handlers))
+        self.assertFalse(hierarchy.is_caught('ValueError', handlers))
+
+    def test_user_exceptions(self):
+        hierarchy = ExceptionHierarchy()
+
+        self.assertTrue(hierarchy.is_subclass('MyError', 'Exception'))
+        self.assertTrue(hierarchy.is_subclass('MyError', 'MyError'))
+        self.assertFalse(hierarchy.is_subclass('MyError', 'OtherError'))
+        self.assertFalse(hierarchy.is_subclass('KeyboardInterrupt', 'MyError'))
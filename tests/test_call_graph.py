@@ -1,3 +1,5 @@
+import json
+import random
 import unittest
 import unittest.mock
 
@@ -38,6 +40,15 @@ class TestCFG(unittest.TestCase):
 
         self.assertEqual(actual, expected)
 
+    def test_flow_exception_handled_by_base_class(self):
+        graph = CFG(cfg_mock,
+                    {'teste.except_caller': ["OSError", "LookupError"]})
+
+        actual = graph.get_uncaught_exceptions('teste.raise_exception',
+                                               ['FileNotFoundError', 'KeyError', 'ValueError'])
+
+        self.assertEqual(actual, {'teste.except_caller': ['ValueError']})
+
     def test_no_exception_handlers(self):
         graph = CFG(cfg_mock, {})
 
@@ -49,18 +60,92 @@ class TestCFG(unittest.TestCase):
         self.assertEqual(actual, expected)
 
 
+def build_graph(edges):
+    graph = {}
+    for caller, callee in edges:
+        graph.setdefault(caller, {'calls': [], 'called_by': []})['calls'].append(callee)
+        graph.setdefault(callee, {'calls': [], 'called_by': []})['called_by'].append(caller)
+    return graph
+
+
+def naive_propagation(graph, catch_nodes, raise_nodes):
+    escapes = {node: {(t, node) for t in raise_nodes.get(node, [])} for node in graph}
+    changed = True
+    while changed:
+        changed = False
+        for node in graph:
+            for call in graph[node]['calls']:
+                new = {item for item in escapes[call]
+                       if item[0] not in catch_nodes.get(node, [])} - escapes[node]
+                if new:
+                    escapes[node] |= new
+                    changed = True
+    return escapes
+
+
+class TestTransitivePropagation(unittest.TestCase):
+    def test_propagates_through_callers(self):
+        graph = build_graph([('a', 'b'), ('b', 'c'), ('c', 'raiser'), ('d', 'raiser')])
+        cfg = CFG(graph, {'b': ['KeyError']})
+
+        propagation = cfg.propagate_exceptions({'raiser': ['ValueError', 'KeyError']})
+
+        self.assertEqual(propagation.escaping('c'), {'ValueError': ['raiser'], 'KeyError': ['raiser']})
+        self.assertEqual(propagation.exceptions('a'), {'ValueError'})
+        self.assertEqual(cfg.get_transitive_uncaught_exceptions({'raiser': ['ValueError', 'KeyError']})['b'],
+                         {'raiser': ['ValueError']})
+
+    def test_recursion(self):
+        graph = build_graph([('a', 'b'), ('b', 'a'), ('b', 'b'), ('main', 'a'), ('a', 'raiser')])
+        cfg = CFG(graph, {'main': ['ValueError']})
+
+        propagation = cfg.propagate_exceptions({'raiser': ['ValueError'], 'b': ['OSError']})
+
+        self.assertEqual(propagation.escaping('a'), {'ValueError': ['raiser'], 'OSError': ['b']})
+        self.assertEqual(propagation.escaping('main'), {'OSError': ['b']})
+
+    def test_caught_by_base_class(self):
+        graph = build_graph([('main', 'a'), ('a', 'raiser')])
+        cfg = CFG(graph, {'a': ['ArithmeticError'], 'main': ['Exception']})
+
+        propagation = cfg.propagate_exceptions({'raiser': ['ZeroDivisionError', 'MyError', 'KeyError']})
+
+        self.assertEqual(propagation.exceptions('a'), {'MyError', 'KeyError'})
+        self.assertEqual(propagation.exceptions('main'), set())
+
+    def test_same_as_fixpoint(self):
+        rng = random.Random(7)
+        types = ['ValueError', 'KeyError', 'OSError']
+        for _ in range(30):
+            nodes = [f'f{i}' for i in range(40)]
+            graph = build_graph([(rng.choice(nodes), rng.choice(nodes)) for _ in range(80)])
+            names = list(graph)
+            catch_nodes = {n: rng.sample(types, 1) for n in rng.sample(names, len(names) // 3)}
+            raise_nodes = {n: rng.sample(types, 2) for n in rng.sample(names, len(names) // 5)}
+
+            propagation = CFG(graph, catch_nodes).propagate_exceptions(raise_nodes)
+            expected = naive_propagation(graph, catch_nodes, raise_nodes)
+
+            for node in graph:
+                actual = {(t, r) for t, raisers in propagation.escaping(node).items() for r in raisers}
+                self.assertEqual(actual, expected[node])
+
+
 class TestGenerateCFG(unittest.TestCase):
     @unittest.mock.patch('os.makedirs')
     @unittest.mock.patch('os.chdir')
     @unittest.mock.patch('glob.iglob', return_value=['teste'])
-    @unittest.mock.patch('subprocess.run', return_value=unittest.mock.Mock(returncode=0))
-    @unittest.mock.patch('json.load')
+    @unittest.mock.patch('subprocess.run', return_value=unittest.mock.Mock(returncode=0, stdout=b'', stderr=b''))
+    @unittest.mock.patch('os.path.isfile', return_value=True)
+    @unittest.mock.patch('miner_py_src.pycg_shard.open', unittest.mock.mock_open())
+    @unittest.mock.patch('miner_py_src.pycg_json.open')
     @unittest.mock.patch('miner_py_src.call_graph.open', return_value=unittest.mock.Mock())
     @unittest.mock.patch('tqdm.tqdm.write', return_value=unittest.mock.Mock())
     def test_generate_cfg(self,
                           tqdm_mock,
                           open_mock,
-                          json_load_mock,
+                          json_open_mock,
+                          isfile_mock,
                           run_mock,
                           iglob_mock,
                           chdir_mock,
@@ -75,9 +160,9 @@ class TestGenerateCFG(unittest.TestCase):
             "...teste.uncaught_exception": ["...teste.raise_exception"]
         }
 
-        json_load_mock.return_value = cfg_mock
+        json_open_mock.side_effect = unittest.mock.mock_open(read_data=json.dumps(cfg_mock))
 
-        cfg = generate_cfg('teste', 'teste')
+        cfg = generate_cfg('teste', 'teste', backend='subprocess')
 
         self.assertIsNotNone(cfg)
 
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import tempfile
+import unittest
+import unittest.mock
+
+from miner_py_src.call_graph import generate_cfg
+from miner_py_src.call_graph_cache import CallGraphCache, call_graph_key, repo_head
+from tests.test_compact_graph import build, pycg_mock
+
+
+def git(folder, *args):
+    subprocess.run(['git', '-C', folder, *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+
+class TestCallGraphCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self.tmp_dir.name, 'teste')
+        os.makedirs(self.project)
+        with open(os.path.join(self.project, 'a.py'), 'w') as file:
+            file.write('def f():\n    pass\n')
+        git(self.project, 'init', '-q')
+        git(self.project, 'add', 'a.py')
+        git(self.project, '-c', 'user.name=teste', '-c', 'user.email=teste@teste', 'commit', '-q', '-m', 'teste')
+        self.cache = CallGraphCache(os.path.join(self.tmp_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key(self):
+        files = ['/p/a.py', '/p/b.py']
+        key = call_graph_key('abc', files, '/p', max_iter=1)
+
+        self.assertEqual(key, call_graph_key('abc', files[::-1], '/p', max_iter=1))
+        self.assertEqual(key, call_graph_key('abc', ['/q/a.py', '/q/b.py'], '/q', max_iter=1))
+        self.assertNotEqual(key, call_graph_key('abd', files, '/p', max_iter=1))
+        self.assertNotEqual(key, call_graph_key('abc', files[:1], '/p', max_iter=1))
+        self.assertNotEqual(key, call_graph_key('abc', files, '/p', max_iter=2))
+
+    def test_put_get(self):
+        graph = build(pycg_mock)
+
+        self.assertIsNone(self.cache.get('ab12'))
+        self.cache.put('ab12', graph)
+
+        self.assertEqual(self.cache.get('ab12').to_dict(), graph.to_dict())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_repo_head(self):
+        self.assertEqual(len(repo_head(self.project)), 40)
+        self.assertIsNone(repo_head(self.tmp_dir.name))
+
+        with open(os.path.join(self.project, 'a.py'), 'a') as file:
+            file.write('\n')
+        self.assertIsNone(repo_head(self.project))
+
+    @unittest.mock.patch('tqdm.tqdm.write')
+    @unittest.mock.patch('miner_py_src.call_graph.pycg_call_graph_shards', return_value=[pycg_mock])
+    def test_hit_skips_pycg(self, pycg_mock_run, tqdm_mock):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp_dir.name)  # for output/call_graph
+
+        first = generate_cfg('teste', self.project, backend='api', cache=self.cache)
+        second = generate_cfg('teste', self.project, backend='api', cache=self.cache)
+
+        self.assertEqual(pycg_mock_run.call_count, 1)
+        self.assertEqual(second.to_dict(), first.to_dict())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        generate_cfg('teste', self.project, backend='api', jobs=2, cache=self.cache)
+        self.assertEqual(pycg_mock_run.call_count, 2)
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from miner_py_src.columnar import ParquetRowWriter, write_parquet
+
+COLUMNS = ['file', 'function', 'func_body', 'project', 'n_try_except', 'str_except_identifiers']
+
+ROWS = [{'file': f'a/{i % 2}.py', 'function': f'f{i}', 'func_body': f'def f{i}():\n    pass', 'project': 'p',
+         'n_try_except': i, 'str_except_identifiers': ''} for i in range(5)]
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+class TestParquetRowWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'output', 'p_stats.parquet')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_row_groups(self):
+        import pyarrow.parquet as pq
+
+        with ParquetRowWriter(self.path, COLUMNS, row_group_size=2) as writer:
+            for row in ROWS:
+                writer.append(row)
+            self.assertEqual(writer.rows, 4)  # the last row is still buffered
+        self.assertEqual(len(writer), 5)
+
+        parquet_file = pq.ParquetFile(self.path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        schema = parquet_file.schema_arrow
+        self.assertEqual(str(schema.field('n_try_except').type), 'int32')
+        self.assertEqual(str(schema.field('file').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(str(schema.field('func_body').type), 'string')
+
+        df = pd.read_parquet(self.path)
+        self.assertEqual(df.astype({'file': str, 'project': str}).to_dict('records'), ROWS)
+
+    def test_write_dataframe(self):
+        df = pd.DataFrame(ROWS, columns=COLUMNS)
+        write_parquet(df, self.path, row_group_size=3)
+
+        actual = pd.read_parquet(self.path)
+        pd.testing.assert_frame_equal(actual.astype({'file': str, 'project': str, 'n_try_except': 'int64'}), df)
+
+    def test_empty(self):
+        write_parquet(pd.DataFrame(columns=COLUMNS), self.path)
+        self.assertEqual(list(pd.read_parquet(self.path).columns), COLUMNS)
@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from miner_py_src.call_graph import CFG
+from miner_py_src.compact_graph import CallGraphBuilder, CompactCallGraph
+
+
+pycg_mock = {
+    "...teste": ["...teste.ClassB.method_name", "...teste.ClassA.method_name"],
+    "...teste.ClassA.method_name": [],
+    "...teste.ClassB.method_name": [],
+    "...teste.raise_exception": [],
+    "...teste.uncaught_exception": ["...teste.raise_exception"],
+    "...teste.caller": ["...teste.raise_exception", "...teste.uncaught_exception"],
+}
+
+
+def dict_graph(json_obj):
+    """The dict generate_cfg used to build"""
+    call_graph = {}
+    for func_name, calls in json_obj.items():
+        call_graph.setdefault(func_name, {'calls': [], 'called_by': []})
+        for call in calls:
+            call_graph[func_name]['calls'].append(call)
+            call_graph.setdefault(call, {'calls': [], 'called_by': []})
+            call_graph[call]['called_by'].append(func_name)
+    return call_graph
+
+
+def build(json_obj) -> CompactCallGraph:
+    builder = CallGraphBuilder()
+    for func_name, calls in json_obj.items():
+        builder.add_calls(func_name, calls)
+    return builder.build()
+
+
+class TestCompactCallGraph(unittest.TestCase):
+    def test_same_as_dict_graph(self):
+        graph = build(pycg_mock)
+
+        self.assertEqual(graph.to_dict(), dict_graph(pycg_mock))
+        self.assertEqual(graph, dict_graph(pycg_mock))
+        self.assertEqual(list(graph.keys()), list(dict_graph(pycg_mock).keys()))
+        self.assertEqual(graph.num_edges, 5)
+
+    def test_int_api(self):
+        graph = build(pycg_mock)
+        raiser = graph.ids["...teste.raise_exception"]
+
+        self.assertEqual(graph.names[raiser], "...teste.raise_exception")
+        self.assertEqual([graph.names[n] for n in graph.called_by(raiser)],
+                         ["...teste.uncaught_exception", "...teste.caller"])
+        self.assertEqual(list(graph.calls(raiser)), [])
+        self.assertNotIn("...teste.missing", graph)
+        with self.assertRaises(KeyError):
+            graph["...teste.missing"]
+
+    def test_empty(self):
+        graph = CallGraphBuilder().build()
+
+        self.assertEqual(len(graph), 0)
+        self.assertEqual(graph.to_dict(), {})
+        self.assertEqual(graph.num_edges, 0)
+
+    def test_from_dict_keeps_called_by_only_edges(self):
+        graph = CompactCallGraph.from_dict({
+            "teste.raise_exception": {"calls": [], "called_by": ["teste.except_caller"]},
+            "teste.except_caller": {"calls": ["teste.raise_exception"],
+                                    "called_by": ["teste.except_caught"]},
+        })
+
+        self.assertEqual(graph["teste.except_caller"]["called_by"], ["teste.except_caught"])
+        self.assertEqual(graph["teste.except_caught"]["calls"], ["teste.except_caller"])
+        self.assertEqual(graph.num_edges, 2)
+
+    def test_random_graph_same_as_dict_graph(self):
+        rng = random.Random(7)
+        names = [f"...m{i % 10}.f{i}" for i in range(300)]
+        json_obj = {name: [rng.choice(names) for _ in range(rng.randint(0, 5))]
+                    for name in names}
+        graph = build(json_obj)
+
+        self.assertEqual(graph.to_dict(), dict_graph(json_obj))
+        # the callers are listed in the order of the dict keys, not of the pycg output
+        converted = CompactCallGraph.from_dict(dict_graph(json_obj))
+        for func_name, node in dict_graph(json_obj).items():
+            self.assertEqual(converted[func_name]['calls'], node['calls'])
+            self.assertEqual(sorted(converted[func_name]['called_by']), sorted(node['called_by']))
+
+    def test_cfg_same_results_as_dict_graph(self):
+        raise_nodes = {"...teste.raise_exception": ["ValueError", "KeyError"]}
+        catch_nodes = {"...teste.uncaught_exception": ["KeyError"]}
+        compact = CFG(build(pycg_mock), catch_nodes)
+        plain = CFG(dict_graph(pycg_mock), catch_nodes)
+
+        self.assertEqual(
+            compact.get_uncaught_exceptions("...teste.raise_exception", ["ValueError", "KeyError"]),
+            plain.get_uncaught_exceptions("...teste.raise_exception", ["ValueError", "KeyError"]))
+        self.assertEqual(compact.get_transitive_uncaught_exceptions(raise_nodes),
+                         plain.get_transitive_uncaught_exceptions(raise_nodes))
+        self.assertEqual(compact.strongly_connected_components(),
+                         plain.strongly_connected_components())
@@ -0,0 +1,136 @@
+import ast
+import os
+import unittest
+
+from miner_py_src.eh_visitor import ExceptionHandlingVisitor
+from miner_py_src.miner_py_utils import (count_bare_raise_inside_finally,
+                                         count_broad_exception_raised,
+                                         count_finally,
+                                         count_misplaced_bare_raise,
+                                         count_nested_try, count_raise,
+                                         count_try_else,
+                                         count_try_except_raise,
+                                         count_try_return, get_except_block,
+                                         get_except_clause,
+                                         get_except_identifiers,
+                                         get_function_defs,
+                                         get_raise_identifiers,
+                                         is_bare_except, is_generic_except,
+                                         is_try_except_pass)
+from miner_py_src.tree_sitter_lang import parser
+
+
+def query_metrics(func_def):
+    n_try_except, n_try_pass, n_generic_except, n_bare_except = 0, 0, 0, 0
+    for except_clause, _ in get_except_clause(func_def):
+        n_try_except += 1
+        if is_try_except_pass(except_clause):
+            n_try_pass += 1
+        if is_generic_except(except_clause):
+            n_generic_except += 1
+        if is_bare_except(except_clause):
+            n_bare_except += 1
+
+    return {
+        "n_try_except": n_try_except,
+        "n_try_pass": n_try_pass,
+        "n_finally": count_finally(func_def),
+        "n_generic_except": n_generic_except,
+        "n_raise": count_raise(func_def),
+        "n_captures_broad_raise": count_broad_exception_raised(func_def),
+        "n_captures_try_except_raise": count_try_except_raise(func_def),
+        "n_captures_misplaced_bare_raise": count_misplaced_bare_raise(func_def),
+        "n_try_else": count_try_else(func_def),
+        "n_try_return": count_try_return(func_def),
+        "str_except_identifiers": " ".join(get_except_identifiers(func_def)),
+        "str_raise_identifiers": " ".join(get_raise_identifiers(func_def)),
+        "str_except_block": " ".join(
+            map(lambda x: x[0].text.decode('utf-8'), get_except_block(func_def))),
+        "n_nested_try": count_nested_try(func_def),
+        "n_bare_except": n_bare_except,
+        "n_bare_raise_finally": count_bare_raise_inside_finally(func_def)
+    }
+
+
+def load_fixtures():
+    test_file = os.path.join(os.path.dirname(__file__), 'test_miner_py_utils.py')
+    with open(test_file, 'rb') as file:
+        content = file.read()
+
+    fixtures = [content]
+    for node in ast.walk(ast.parse(content)):
+        if isinstance(node, ast.Constant) and isinstance(node.value, bytes):
+            fixtures.append(node.value)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and 'def ' in node.value:
+            fixtures.append(node.value.encode('utf-8'))
+    return fixtures
+
+
+class TestExceptionHandlingVisitorParity(unittest.TestCase):
+    def test_parity_with_query_helpers(self):
+        visitor = ExceptionHandlingVisitor()
+        n_functions = 0
+        for code in load_fixtures():
+            for func_def in get_function_defs(parser.parse(code)):
+                n_functions += 1
+                with self.subTest(function=func_def.text[:60]):
+                    self.assertEqual(visitor.visit(func_def),
+                                     query_metrics(func_def))
+
+        self.assertGreater(n_functions, 30)
+
+    def test_parity_edge_cases(self):
+        code = b'''
+def edge_cases():
+    try:
+        return 1
+        return 2
+    except:  # comment
+        raise
+    except (ValueError, KeyError) as e:
+        if e:
+            pass
+    except asyncio.TimeoutError as err:
+        raise X from err
+    except Exception:
+        raise Exception("x") from Exception
+    try:
+        try:
+            pass
+        finally:
+            raise
+    except ValueError: raise a.B from E
+    else:
+        def inner():
+            raise
+'''
+        visitor = ExceptionHandlingVisitor()
+        for func_def in get_function_defs(parser.parse(code)):
+            with self.subTest(function=func_def.text[:60]):
+                self.assertEqual(visitor.visit(func_def), query_metrics(func_def))
+
+    def test_counters(self):
+        code = b'''
+def foo():
+    try:
+        try:
+            try:
+                print()
+            except:
+                pass
+        except Exception as e:
+            raise
+    finally:
+        raise'''
+
+        func_def = get_function_defs(parser.parse(code))[0]
+        actual = ExceptionHandlingVisitor().visit(func_def)
+
+        self.assertEqual(actual['n_try_except'], 2)
+        self.assertEqual(actual['n_try_pass'], 1)
+        self.assertEqual(actual['n_bare_except'], 1)
+        self.assertEqual(actual['n_generic_except'], 1)
+        self.assertEqual(actual['n_nested_try'], 1)
+        self.assertEqual(actual['n_bare_raise_finally'], 1)
+        self.assertEqual(actual['n_captures_misplaced_bare_raise'], 1)
+        self.assertEqual(actual['str_except_identifiers'], 'Exception')
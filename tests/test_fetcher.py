@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from miner_py_src.fetcher import FetchJob, clone_args, iter_fetched
+from miner_py_src.git_objects import GitObjectReader, fetch_missing_blobs
+from miner_py_src.repo_cache import RepoCache
+from tests.test_git_objects import git
+
+
+class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.urls = {}
+        for name in ('a', 'b', 'c'):
+            origin = os.path.join(self.tmp_dir.name, 'origin', name)
+            os.makedirs(origin)
+            git(origin, 'init', '-q')
+            git(origin, 'config', 'uploadpack.allowFilter', 'true')
+            self.commit(origin, 'first')
+            self.urls[name] = 'file://' + origin
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def commit(origin, message) -> str:
+        with open(os.path.join(origin, f'{message}.py'), 'w') as file:
+            file.write(f'def {message}():\n    pass\n')
+        git(origin, 'add', '-A')
+        git(origin, 'commit', '-q', '-m', message)
+        return git(origin, 'rev-parse', 'HEAD')
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, 'projects', name)
+
+    def jobs(self, commits=None):
+        return [FetchJob(name, url, self.path(name), commits) for name, url in self.urls.items()]
+
+    def test_clone_args(self):
+        self.assertIn('--depth', clone_args('u', 'p'))
+        self.assertIn('--filter=blob:none', clone_args('u', 'p', ['abc']))
+        self.assertEqual(clone_args('u', 'p', partial=False), ['git', 'clone', '--quiet', '--recursive', 'u', 'p'])
+
+    def test_clones_all(self):
+        results = list(iter_fetched(self.jobs(), concurrency=2))
+
+        self.assertEqual(sorted(result.job.name for result in results), ['a', 'b', 'c'])
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(git(result.job.path, 'rev-parse', '--is-shallow-repository'), 'true')
+            self.assertTrue(os.path.isfile(os.path.join(result.job.path, 'first.py')))
+
+    def test_fetches_missing_commits(self):
+        list(iter_fetched(self.jobs(commits=[])))
+        second = self.commit(self.urls['a'][len('file://'):], 'second')
+
+        results = list(iter_fetched(self.jobs(commits=[second])[:1]))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(git(self.path('a'), 'cat-file', '-t', second), 'commit')
+
+    def test_fetch_missing_blobs(self):
+        origin = self.urls['a'][len('file://'):]
+        second = self.commit(origin, 'second')
+        list(iter_fetched(self.jobs(commits=[second])[:1]))
+        path = self.path('a')
+
+        def missing():
+            return git(path, 'rev-list', '--objects', '--no-walk', '--missing=print', second).count('?')
+
+        self.assertEqual(missing(), 2)  # blobless clone
+        self.assertEqual(fetch_missing_blobs(path, second, ['second.py']), 1)
+        self.assertEqual(missing(), 1)
+        self.assertEqual(fetch_missing_blobs(path, second, ['second.py']), 0)
+        with GitObjectReader(path) as reader:
+            self.assertEqual(reader.blob(second, 'second.py'), b'def second():\n    pass\n')
+
+    def test_error(self):
+        job = FetchJob('missing', 'file://' + os.path.join(self.tmp_dir.name, 'missing'), self.path('missing'), None)
+        results = list(iter_fetched([job, *self.jobs()]))
+
+        errors = {result.job.name: result.error for result in results}
+        self.assertIsNotNone(errors['missing'])
+        self.assertIsNone(errors['a'])
+
+    def test_mirrors(self):
+        mirrors = RepoCache(os.path.join(self.tmp_dir.name, 'mirrors'))
+        results = list(iter_fetched(self.jobs(), concurrency=3, mirrors=mirrors))
+
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(len(mirrors.entries()), 3)
+        self.assertEqual(mirrors.worktrees(self.urls['b']), [self.path('b')])
+
+    def test_existing_worktree(self):
+        mirrors = RepoCache(os.path.join(self.tmp_dir.name, 'mirrors'))
+        mirrors.worktree(self.urls['a'], self.path('a'))  # left by a --mirror-dir run
+        second = self.commit(self.urls['a'][len('file://'):], 'second')
+
+        results = list(iter_fetched(self.jobs(commits=[second])[:1]))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(git(self.path('a'), 'cat-file', '-t', second), 'commit')
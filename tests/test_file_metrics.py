@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from miner_py_src.file_metrics import (iter_file_records, parse_file,
+                                       record_to_dict)
+
+
+class TestParseFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for i in range(6):
+            path = os.path.join(self.tmp_dir.name, f'module_{i}.py')
+            with open(path, 'w') as file:
+                file.write(f'''
+def func_{i}():
+    try:
+        print({i})
+    except ValueError:
+        pass
+
+class A:
+    def method_{i}(self):
+        raise Exception("{i}")
+''')
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_file(self):
+        records = parse_file(self.files[0])
+
+        self.assertEqual([r.function for r in records], ['func_0', 'method_0'])
+        self.assertEqual(record_to_dict(records[0])['n_try_pass'], 1)
+        self.assertEqual(record_to_dict(records[1])['n_captures_broad_raise'], 1)
+
+    def test_file_not_found(self):
+        self.assertEqual(parse_file(os.path.join(self.tmp_dir.name, 'missing.py')), [])
+
+    def test_parallel_same_order_as_serial(self):
+        serial = [(f, [r[:2] + r[3:] for r in records])
+                  for f, records in iter_file_records(self.files)]
+        parallel = [(f, [r[:2] + r[3:] for r in records])
+                    for f, records in iter_file_records(self.files, jobs=2)]
+
+        self.assertEqual([f for f, _ in serial], self.files)
+        self.assertEqual(serial, parallel)
@@ -0,0 +1,78 @@
+import unittest
+
+import pandas as pd
+
+from miner_py_src.call_graph import annotate_uncaught_exceptions
+from miner_py_src.function_index import FunctionIndex, module_path
+
+
+rows = [
+    ("projects/py/teste/teste/a.py", "raise_exception", "ValueError", ""),
+    ("projects/py/teste/teste/a.py", "except_caller", "", "KeyError"),
+    ("projects/py/teste/teste/b.py", "raise_exception", "OSError", ""),
+    ("projects/py/teste/teste/b.py", "uncaught", "", ""),
+    ("projects/py/teste/xa/b.py", "uncaught", "", ""),
+    ("projects/py/teste/teste/__init__.py", "uncaught", "", ""),
+]
+
+
+def build(reverse):
+    function_index = FunctionIndex(reverse=reverse)
+    for file_path, function, _, _ in rows:
+        function_index.add(file_path, function)
+
+    ordered = rows[::-1] if reverse else rows
+    df = pd.DataFrame([{
+        "file": file_path,
+        "function": function,
+        "str_uncaught_exceptions": "",
+        "str_raise_identifiers": raise_identifiers,
+        "str_except_identifiers": except_identifiers,
+    } for file_path, function, raise_identifiers, except_identifiers in ordered])
+    return df, function_index
+
+
+class TestFunctionIndex(unittest.TestCase):
+    def test_module_path(self):
+        self.assertEqual(module_path("projects/py/teste/teste/a.py"), "projects.py.teste.teste.a")
+        self.assertEqual(module_path("./teste/__init__.py"), "teste")
+        self.assertEqual(module_path("a.py"), "a")
+
+    def test_find(self):
+        for reverse in (False, True):
+            df, function_index = build(reverse)
+            for module, function, expected_file in [
+                    ("teste.a", "raise_exception", "projects/py/teste/teste/a.py"),
+                    ("teste.teste.b", "raise_exception", "projects/py/teste/teste/b.py"),
+                    ("a.b", "uncaught", None),  # not teste/xa/b.py
+                    ("xa.b", "uncaught", "projects/py/teste/xa/b.py"),
+                    ("teste", "uncaught", "projects/py/teste/teste/__init__.py"),
+                    ("teste.c", "uncaught", None),
+                    ("", "not_found", None)]:
+                with self.subTest(reverse=reverse, module=module, function=function):
+                    row_id = function_index.find(module, function)
+                    if expected_file is None:
+                        self.assertIsNone(row_id)
+                    else:
+                        self.assertEqual(df.loc[row_id, "file"], expected_file)
+                        self.assertEqual(df.loc[row_id, "function"], function)
+            for function in ("raise_exception", "uncaught"):
+                # any module: the first row of the function, in DataFrame order
+                first = df[df["function"] == function]
+                self.assertEqual(function_index.find("", function), int(first.index[0]))
+
+    def test_annotate_uncaught_exceptions(self):
+        df, function_index = build(reverse=True)
+        call_graph = {
+            "...teste.a.raise_exception": {"calls": [], "called_by": ["...teste.a.except_caller"]},
+            "...teste.a.except_caller": {"calls": ["...teste.a.raise_exception", "...teste.b.raise_exception"],
+                                         "called_by": []},
+            "...teste.b.raise_exception": {"calls": [], "called_by": ["...teste.a.except_caller"]},
+        }
+
+        annotate_uncaught_exceptions(df, call_graph, function_index)
+
+        actual = df.set_index("function")["str_uncaught_exceptions"]
+        self.assertEqual(actual["except_caller"],
+                         "...teste.a.raise_exception:ValueError ...teste.b.raise_exception:OSError")
+        self.assertEqual(actual["uncaught"].tolist(), ["", "", ""])
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from miner_py_src.file_metrics import iter_file_records, parse_content
+from miner_py_src.git_objects import GitObjectReader, modified_files, symlinks
+
+FIRST = b'''def f():
+    try:
+        pass
+    except:
+        raise
+'''
+
+SECOND = b'''def f():
+    pass
+
+
+def g():
+    raise ValueError()
+'''
+
+
+def git(folder, *args) -> str:
+    return subprocess.run(['git', '-C', folder, '-c', 'user.name=teste', '-c', 'user.email=teste@teste', *args],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout.decode().strip()
+
+
+class TestGitObjectReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = self.tmp_dir.name
+        git(self.repo, 'init', '-q')
+        os.makedirs(os.path.join(self.repo, 'pkg'))
+        self.commits = []
+        for content in (FIRST, SECOND):
+            with open(os.path.join(self.repo, 'pkg', 'a.py'), 'wb') as file:
+                file.write(content)
+            git(self.repo, 'add', '-A')
+            git(self.repo, 'commit', '-q', '-m', 'teste')
+            self.commits.append(git(self.repo, 'rev-parse', 'HEAD'))
+        self.reader = GitObjectReader(self.repo)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp_dir.cleanup()
+
+    def test_blob_of_each_commit(self):
+        self.assertEqual(self.reader.blob(self.commits[0], 'pkg/a.py'), FIRST)
+        self.assertEqual(self.reader.blob(self.commits[1], 'pkg/a.py'), SECOND)
+        self.assertEqual(self.reader.blob(self.commits[0], 'pkg/a.py'), FIRST)
+
+    def test_missing(self):
+        self.assertIsNone(self.reader.blob(self.commits[0], 'pkg/b.py'))
+        self.assertIsNone(self.reader.read('0' * 40))
+        self.assertIsNone(self.reader.blob(self.commits[0], 'pkg/my file.py'))
+        self.assertIsNone(self.reader.blob(self.commits[0], 'pkg/a b c.py'))
+        self.assertEqual(self.reader.blob(self.commits[1], 'pkg/a.py'), SECOND)
+
+    def test_symlinks(self):
+        os.symlink('a.py', os.path.join(self.repo, 'pkg', 'link.py'))
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'link')
+        head = git(self.repo, 'rev-parse', 'HEAD')
+
+        self.assertEqual(symlinks(self.repo, head, ['pkg/a.py', 'pkg/link.py']), {'pkg/link.py'})
+        self.assertEqual(symlinks(self.repo, head, []), set())
+
+    def test_records_without_checkout(self):
+        files = [os.path.join(self.repo, 'pkg', 'a.py'), os.path.join(self.repo, 'pkg', 'b.py')]
+
+        def contents(file_path):
+            return self.reader.blob(self.commits[0], os.path.relpath(file_path, self.repo))
+
+        for jobs in (1, 2):
+            records = dict(iter_file_records(files, jobs, contents=contents))
+            self.assertEqual([r._replace(node_id=None) for r in records[files[0]]],
+                             [r._replace(node_id=None) for r in parse_content(FIRST)])
+            self.assertEqual(records[files[1]], [])
+
+    def test_modified_files(self):
+        git(self.repo, 'checkout', '-q', '-b', 'branch', self.commits[0])
+        with open(os.path.join(self.repo, 'old.py'), 'wb') as file:
+            file.write(FIRST)
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'old')
+        os.remove(os.path.join(self.repo, 'old.py'))
+        with open(os.path.join(self.repo, 'b.py'), 'wb') as file:
+            file.write(SECOND)
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'branch')
+        branch = git(self.repo, 'rev-parse', 'HEAD')
+        git(self.repo, 'checkout', '-q', '-')
+        git(self.repo, 'merge', '-q', '--no-edit', 'branch')
+        merge = git(self.repo, 'rev-parse', 'HEAD')
+
+        files = modified_files(self.repo, [self.commits[0], self.commits[1][:10], branch, merge, '0' * 40])
+
+        self.assertEqual(files, {
+            self.commits[0]: ['pkg/a.py'],
+            self.commits[1][:10]: ['pkg/a.py'],
+            branch: ['b.py'],  # without the deleted old.py
+            merge: ['b.py'],  # compared with the first parent
+        })
+        self.assertEqual(modified_files(self.repo, []), {})
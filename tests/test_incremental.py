@@ -0,0 +1,112 @@
+import unittest
+
+from miner_py_src.file_metrics import parse_content
+from miner_py_src.incremental import (Hunk, IncrementalParser, content_edit,
+                                      hunks_to_edits, parse_unified_diff)
+
+OLD = b'''def first():
+    try:
+        print(1)
+    except ValueError:
+        pass
+
+
+def second():
+    raise Exception("second")
+
+
+class A:
+    def third(self):
+        try:
+            pass
+        except:
+            raise
+'''
+
+NEW = b'''def first():
+    try:
+        print(1)
+    except ValueError:
+        pass
+
+
+def second():
+    try:
+        raise Exception("second")
+    except Exception as e:
+        raise ValueError() from e
+
+
+class A:
+    def added(self):
+        return 1
+
+    def third(self):
+        try:
+            pass
+        except:
+            raise
+'''
+
+DIFF = b'''diff --git a/module.py b/module.py
+index 1111111..2222222 100644
+--- a/module.py
++++ b/module.py
+@@ -9 +9,4 @@ def second():
+-    raise Exception("second")
++    try:
++        raise Exception("second")
++    except Exception as e:
++        raise ValueError() from e
+@@ -12,0 +16,3 @@ class A:
++    def added(self):
++        return 1
++
+'''
+
+
+def without_node_id(records):
+    return [r._replace(node_id=None) for r in records]
+
+
+class TestParseUnifiedDiff(unittest.TestCase):
+    def test_hunks(self):
+        self.assertEqual(parse_unified_diff(DIFF),
+                         {'module.py': [Hunk(9, 1, 9, 4), Hunk(12, 0, 16, 3)]})
+
+    def test_hunks_to_edits(self):
+        edits = hunks_to_edits(OLD, NEW, parse_unified_diff(DIFF)['module.py'])
+
+        rebuilt, delta = OLD, 0
+        for edit in edits:
+            start = edit.start_byte + delta
+            rebuilt = rebuilt[:start] + NEW[start:edit.new_end_byte + delta] \
+                + rebuilt[edit.old_end_byte + delta:]
+            delta += edit.new_end_byte - edit.old_end_byte
+        self.assertEqual(rebuilt, NEW)
+
+    def test_hunks_of_other_version(self):
+        self.assertIsNone(hunks_to_edits(OLD, NEW + b'x = 1\n', [Hunk(9, 1, 9, 4)]))
+
+    def test_content_edit(self):
+        edit = content_edit(b'abcXdef', b'abcYYdef')
+        self.assertEqual(edit, (3, 4, 5))
+
+
+class TestIncrementalParser(unittest.TestCase):
+    def test_same_records_as_full_parse(self):
+        for hunks in (parse_unified_diff(DIFF)['module.py'], None):
+            parser = IncrementalParser()
+            parser.parse('module.py', OLD)
+            records = parser.parse('module.py', NEW, hunks)
+
+            self.assertEqual(without_node_id(records), without_node_id(parse_content(NEW)))
+            self.assertEqual(parser.reused, 1)
+            self.assertEqual(parser.recomputed, 6)
+
+    def test_consecutive_versions(self):
+        versions = [OLD, NEW, NEW.replace(b'pass\n\n\ndef second', b'return 0\n\n\ndef second'), OLD]
+        parser = IncrementalParser()
+        for content in versions:
+            self.assertEqual(without_node_id(parser.parse('module.py', content)),
+                             without_node_id(parse_content(content)))
@@ -0,0 +1,48 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from miner_py_src.lint_sink import JsonlSink, lint_output_path, read_messages
+
+MESSAGES = [
+    {'path': 'projects/py/p/a/util.py', 'line': 3, 'message-id': 'W0702'},
+    {'path': 'projects/py/p/b/util.py', 'line': 7, 'message-id': 'W0718'},
+]
+
+
+class TestJsonlSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_output_path(self):
+        self.assertEqual(lint_output_path('p'), os.path.join('output/pytlint', 'p.jsonl'))
+        self.assertEqual(lint_output_path('p', compress=True, directory='out'), os.path.join('out', 'p.jsonl.gz'))
+
+    def test_round_trip(self):
+        for name in ['p.jsonl', 'p.jsonl.gz']:
+            with self.subTest(name=name):
+                path = os.path.join(self.tmp_dir.name, 'output', name)
+                with JsonlSink(path) as sink:
+                    sink.write(MESSAGES[:1])
+                    sink.write([])
+                    sink.write(None)
+                    sink.write(MESSAGES[1:])
+                self.assertEqual(sink.records, 2)
+                self.assertEqual(list(read_messages(path)), MESSAGES)  # same basenames, both kept
+
+    def test_append(self):
+        path = os.path.join(self.tmp_dir.name, 'p.jsonl.gz')
+        for messages in MESSAGES:
+            with JsonlSink(path, append=True) as sink:
+                sink.write([messages])
+        self.assertEqual(list(read_messages(path)), MESSAGES)
+        with gzip.open(path) as file:
+            self.assertEqual(len(file.read().splitlines()), 2)
+
+        with JsonlSink(path) as sink:
+            sink.write(MESSAGES[:1])
+        self.assertEqual(list(read_messages(path)), MESSAGES[:1])
@@ -0,0 +1,74 @@
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from miner_py_src.manifest import DONE, FAILED, RUNNING, SKIPPED, RunManifest, main
+
+
+class TestRunManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'output', 'manifest.sqlite')
+        self.manifest = RunManifest(self.path)
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp_dir.cleanup()
+
+    def test_lifecycle(self):
+        self.assertIsNone(self.manifest.get('p', 'abc', 'parse'))
+
+        self.manifest.start('p', 'abc', 'parse')
+        self.assertEqual(self.manifest.get('p', 'abc', 'parse').status, RUNNING)
+        self.assertFalse(self.manifest.is_finished('p', 'abc', 'parse'))
+
+        self.manifest.finish('p', 'abc', 'parse', 'output/p_abc_stats.csv')
+        row = self.manifest.get('p', 'abc', 'parse')
+        self.assertEqual((row.status, row.output), (DONE, 'output/p_abc_stats.csv'))
+        self.assertGreaterEqual(row.seconds, 0)
+        self.assertTrue(self.manifest.is_finished('p', 'abc', 'parse'))
+        self.assertFalse(self.manifest.is_finished('p', 'abc', 'lint'))
+
+    def test_failed_runs_are_retried(self):
+        self.manifest.start('p', 'abc', 'parse')
+        self.manifest.fail('p', 'abc', 'parse', 'ValueError()')
+        self.manifest.skip('p', 'def', 'parse', 'no .py changes')
+
+        self.assertFalse(self.manifest.is_finished('p', 'abc', 'parse'))
+        self.assertTrue(self.manifest.is_finished('p', 'def', 'parse'))
+        self.assertEqual([row.commit_hash for row in self.manifest.rows(status=FAILED)], ['abc'])
+        self.assertEqual(self.manifest.get('p', 'abc', 'parse').message, 'ValueError()')
+
+        self.manifest.start('p', 'abc', 'parse')
+        self.manifest.finish('p', 'abc', 'parse', 'out.csv')
+        self.assertIsNone(self.manifest.get('p', 'abc', 'parse').message)
+        self.assertEqual(self.manifest.summary(), {('parse', DONE): 1, ('parse', SKIPPED): 1})
+
+    def test_persists_across_runs(self):
+        self.manifest.start('p', 'abc', 'parse')
+        self.manifest.close()
+
+        self.manifest = RunManifest(self.path)
+        self.assertEqual(self.manifest.rows()[0].status, RUNNING)  # interrupted
+
+    def test_import_finished(self):
+        self.manifest.fail('p', 'abc', 'parse', 'error')
+        self.manifest.import_finished('parse', [('p', 'abc', 'a.csv'), ('q', 'def', 'b.csv')])
+
+        self.assertEqual(self.manifest.get('p', 'abc', 'parse').status, FAILED)
+        self.assertEqual(self.manifest.get('q', 'def', 'parse').output, 'b.csv')
+
+    def test_main(self):
+        self.manifest.fail('p', 'abc', 'parse', 'error\ntraceback')
+        self.manifest.finish('p', 'def', 'parse', 'b.csv')
+
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            main([self.path])
+        self.assertEqual(stdout.getvalue().splitlines(), ['parse\tdone\t1', 'parse\tfailed\t1'])
+
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            main([self.path, '--status', 'failed'])
+        self.assertEqual(stdout.getvalue().split('\t')[:4], ['p', 'abc', 'parse', 'failed'])
+        self.assertTrue(stdout.getvalue().rstrip().endswith('\terror'))
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+
+from miner_py_src.file_metrics import iter_file_records, parse_file
+from miner_py_src.metrics_cache import MetricsCache, blob_hash
+
+
+class TestMetricsCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_blob_hash_is_git_blob_id(self):
+        path = self.write('a.py', 'def f():\n    raise ValueError()\n')
+        expected = subprocess.run(['git', 'hash-object', path], stdout=subprocess.PIPE,
+                                  check=True).stdout.decode('utf-8').strip()
+
+        with open(path, 'rb') as file:
+            self.assertEqual(blob_hash(file.read()), expected)
+
+    def test_same_content_parsed_once(self):
+        content = 'def f():\n    try:\n        pass\n    except:\n        pass\n'
+        files = [self.write('a.py', content), self.write('b.py', content)]
+        cache = MetricsCache(self.cache_dir)
+
+        actual = list(iter_file_records(files, cache=cache))
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(actual[0][1], actual[1][1])
+        self.assertEqual([r._replace(node_id=None) for r in actual[0][1]],
+                         [r._replace(node_id=None) for r in parse_file(files[0])])
+
+    def test_version_invalidates(self):
+        path = self.write('a.py', 'def f():\n    pass\n')
+        parse_file(path, MetricsCache(self.cache_dir, version='old'))
+        cache = MetricsCache(self.cache_dir, version='new')
+
+        list(iter_file_records([path], cache=cache))
+        cache.evict()
+
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(os.listdir(self.cache_dir), ['new'])
+
+    def test_lru_eviction(self):
+        cache = MetricsCache(self.cache_dir)
+        for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+            cache.put(key, [('f', 'x' * 100, i, 0, (), 0, 100)])
+            os.utime(cache._entry_path(key), (time.time() - 100 + i, time.time() - 100 + i))
+        cache.get('aa1')
+
+        cache.max_bytes = cache.size() - 1
+        removed = cache.evict()
+
+        self.assertEqual(removed, 1)
+        self.assertIsNotNone(cache.get('aa1'))
+        self.assertIsNone(cache.get('bb2'))
+        self.assertIsNotNone(cache.get('cc3'))
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from miner_py_src.manifest import RunManifest
+from tests.test_git_objects import git
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SOURCE = '''def f():
+    try:
+        pass
+    except:
+        raise
+
+
+def g():
+    raise ValueError()
+'''
+
+
+class TestMinerHashes(unittest.TestCase):
+    """miner_hashes.py run end to end, with github.com redirected to local repositories"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.remotes = os.path.join(self.tmp_dir.name, 'remotes')
+        origin = os.path.join(self.remotes, 'demo', 'proj.git')
+        os.makedirs(os.path.join(origin, 'pkg'))
+        git(origin, 'init', '-q')
+        with open(os.path.join(origin, 'pkg', 'a.py'), 'w') as file:
+            file.write(SOURCE)
+        with open(os.path.join(origin, 'README'), 'w') as file:
+            file.write('demo\n')
+        git(origin, 'add', '-A')
+        git(origin, 'commit', '-q', '-m', 'first')
+        self.hash = git(origin, 'rev-parse', 'HEAD')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_miner(self, cwd, *args):
+        os.makedirs(os.path.join(cwd, 'output'))
+        pd.DataFrame({'url_issue': ['https://github.com/demo/proj/issues/1'],
+                      'hash': [self.hash]}).to_csv(os.path.join(cwd, 'hashes_2.csv'), index=False)
+        env = dict(os.environ, GIT_CONFIG_COUNT='1',
+                   GIT_CONFIG_KEY_0=f'url.file://{self.remotes}/.insteadOf',
+                   GIT_CONFIG_VALUE_0='https://github.com/')
+        subprocess.run([sys.executable, os.path.join(ROOT, 'miner_hashes.py'), *args], cwd=cwd, env=env,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+    def test_mirrors(self):
+        for args in [[], ['--no-checkout']]:
+            with self.subTest(args=args):
+                cwd = os.path.join(self.tmp_dir.name, 'run' + ''.join(args))
+                self.run_miner(cwd, '--mirror-dir', os.path.join(self.tmp_dir.name, 'mirrors'), *args)
+
+                manifest = RunManifest(os.path.join(cwd, 'output', 'fixes_2', 'manifest.sqlite'))
+                self.assertEqual(manifest.summary(), {('fetch', 'done'): 1, ('parse', 'done'): 1})
+                manifest.close()
+                df = pd.read_csv(os.path.join(cwd, 'output', 'fixes_2', f'proj_{self.hash}_stats.csv'))
+                self.assertEqual(df['function'].tolist(), ['g', 'f'])
+                self.assertEqual(df['n_bare_except'].tolist(), [0, 1])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_same_rows_as_csv(self):
+        outputs = {}
+        for output_format in ['csv', 'parquet']:
+            cwd = os.path.join(self.tmp_dir.name, output_format)
+            self.run_miner(cwd, '--output-format', output_format)
+            path = os.path.join(cwd, 'output', 'fixes_2', f'proj_{self.hash}_stats.{output_format}')
+            outputs[output_format] = pd.read_csv(path) if output_format == 'csv' else pd.read_parquet(path)
+
+        self.assertEqual(outputs['parquet']['function'].tolist(), outputs['csv']['function'].tolist())
+        self.assertEqual(outputs['parquet']['n_raise'].tolist(), outputs['csv']['n_raise'].tolist())
@@ -0,0 +1,45 @@
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from miner_py_src.exceptions import CallGraphError
+from miner_py_src.pycg_json import iter_call_graph_json, load_call_graph, peak_rss_mb
+from tests.test_compact_graph import build, pycg_mock
+
+
+class TestPycgJson(unittest.TestCase):
+    def test_same_entries_as_json_load(self):
+        rng = random.Random(3)
+        names = [f'...m{i % 7}.f{i}' + ('\\u00e9"x' if i % 11 == 0 else '') for i in range(200)]
+        json_obj = {name: [rng.choice(names) for _ in range(rng.randint(0, 4))] for name in names}
+
+        for text in (json.dumps(json_obj), json.dumps(json_obj, indent=4)):
+            for chunk_size in (1, 7, 1 << 16):
+                with self.subTest(chunk_size=chunk_size):
+                    entries = list(iter_call_graph_json(io.StringIO(text), chunk_size))
+                    self.assertEqual(entries, list(json.loads(text).items()))
+
+    def test_empty(self):
+        self.assertEqual(list(iter_call_graph_json(io.StringIO(' { } '))), [])
+
+    def test_malformed(self):
+        for text in ('', '[]', '{"a": []', '{"a": [] "b": []}', '{"a": "b"}', '{"a": ["b"'):
+            with self.subTest(text=text):
+                with self.assertRaises(CallGraphError):
+                    list(iter_call_graph_json(io.StringIO(text), 2))
+
+    def test_load_call_graph(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'call_graph.json')
+            with open(path, 'w') as f:
+                json.dump(pycg_mock, f)
+
+            graph = load_call_graph(path, chunk_size=5)
+
+        self.assertEqual(graph.to_dict(), build(pycg_mock).to_dict())
+
+    def test_peak_rss(self):
+        self.assertGreater(peak_rss_mb(), 0)
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from miner_py_src.exceptions import CallGraphError
+from miner_py_src.pycg_json import load_call_graphs, merge_call_graphs
+from miner_py_src.pycg_shard import (has_pycg_api, pycg_call_graph, pycg_call_graph_shards, run_pycg_shards,
+                                     shard_files)
+
+
+def project_files(root, counts):
+    return [os.path.join(root, package, f'module_{n}.py')
+            for package, count in counts.items() for n in range(count)]
+
+
+class TestShardFiles(unittest.TestCase):
+    def test_keeps_packages_together(self):
+        files = project_files('/p', {'a': 3, 'b': 2, 'c': 2, 'd': 1})
+
+        shards = shard_files(files, '/p', 2)
+
+        self.assertEqual(len(shards), 2)
+        self.assertEqual(sorted(f for shard in shards for f in shard), sorted(files))
+        self.assertEqual(sorted(len(shard) for shard in shards), [4, 4])
+        for package in 'abcd':
+            self.assertEqual(sum(any(f'/{package}/' in f for f in shard) for shard in shards), 1)
+
+    def test_splits_big_package(self):
+        files = project_files('/p', {'a/x': 4, 'a/y': 4, 'b': 1})
+
+        shards = shard_files(files, '/p', 2)
+
+        self.assertEqual(sorted(len(shard) for shard in shards), [4, 5])
+
+    def test_single_shard(self):
+        files = project_files('/p', {'a': 2, '': 1})
+
+        self.assertEqual(shard_files(files, '/p', 1), [files])
+        self.assertEqual(shard_files([], '/p', 4), [])
+        self.assertEqual(len(shard_files(files, '/p', 8)), 2)
+
+
+class TestRunShards(unittest.TestCase):
+    @unittest.mock.patch('subprocess.run', return_value=unittest.mock.Mock(returncode=0, stdout=b'', stderr=b''))
+    def test_file_lists(self, run_mock):
+        with tempfile.TemporaryDirectory() as directory:
+            shards = [['/p/a/x.py', '/p/a/y.py'], ['/p/b/z.py']]
+
+            results = run_pycg_shards(shards, 'p', directory, jobs=2, cwd='/p')
+
+            self.assertEqual([r.output_path for r in results],
+                             [os.path.join(directory, 'shard_0.json'), os.path.join(directory, 'shard_1.json')])
+            for shard, result in zip(shards, results):
+                with open(result.output_path + '.files') as list_file:
+                    self.assertEqual(list_file.read().splitlines(), shard)
+
+        self.assertEqual(run_mock.call_count, 2)
+        for call in run_mock.call_args_list:
+            args = call.args[0]
+            self.assertNotIn('/p/a/x.py', args)
+            self.assertEqual(args[args.index('--package') + 1], 'p')
+            self.assertEqual(call.kwargs['cwd'], '/p')
+
+
+class TestMergeShards(unittest.TestCase):
+    def test_cross_shard_edges(self):
+        shards = [
+            {"p.a.f": ["p.b.g", "p.a.h"], "p.a.h": [], "p.b.g": ["p.b.k"]},
+            {"p.b.g": ["p.b.k", "p.a.h"], "p.b.k": [], "p.a.h": []},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for n, shard in enumerate(shards):
+                paths.append(os.path.join(directory, f'shard_{n}.json'))
+                with open(paths[-1], 'w') as f:
+                    json.dump(shard, f)
+
+            graph = load_call_graphs(paths)
+
+        self.assertEqual(graph["p.b.g"], {'calls': ["p.b.k", "p.a.h"], 'called_by': ["p.a.f"]})
+        self.assertEqual(graph["p.a.h"]['called_by'], ["p.a.f", "p.b.g"])
+        self.assertEqual(graph.num_edges, 4)
+
+    def test_unresolved_cross_shard_calls(self):
+        shards = [
+            {"...demo.a.g": ["...demo.a.h"], "...demo.a.h": ["<builtin>.ValueError"], "<builtin>.ValueError": []},
+            {"...other.c.k": ["a.h"], "a.h": [], "...other.c.m": ["demo.a.g", "json.loads"], "demo.a.g": [],
+             "json.loads": []},
+        ]
+
+        graph = merge_call_graphs(shards)
+
+        self.assertEqual(graph["...other.c.k"]['calls'], ["...demo.a.h"])
+        self.assertEqual(graph["...other.c.m"]['calls'], ["...demo.a.g", "json.loads"])
+        self.assertEqual(graph["...demo.a.h"]['called_by'], ["...demo.a.g", "...other.c.k"])
+        self.assertNotIn("a.h", graph)
+        self.assertNotIn("demo.a.g", graph)
+        self.assertEqual(merge_call_graphs(shards[1:])["...other.c.k"]['calls'], ["a.h"])  # single run as is
+
+
+@unittest.skipUnless(has_pycg_api(), "pycg is not installed")
+class TestPycgApi(unittest.TestCase):
+    def test_in_process_call_graph(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            # same layout as generate_cfg: the package is <project folder>/<project name>
+            with open(os.path.join(directory, 'a.py'), 'w') as f:
+                f.write("def raise_exception():\n    raise ValueError()\n\n\n"
+                        "def caller():\n    raise_exception()\n")
+
+            edges = pycg_call_graph([os.path.join(directory, 'a.py')], os.path.join(directory, 'teste'))
+
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(edges['...a.caller'], ['...a.raise_exception'])
+
+    def test_calls_between_shards(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for package, source in [('demo', "def h():\n    raise ValueError()\n"),
+                                    ('other', "from demo.a import h\n\n\ndef k():\n    h()\n")]:
+                os.makedirs(os.path.join(directory, package))
+                open(os.path.join(directory, package, '__init__.py'), 'w').close()
+                with open(os.path.join(directory, package, 'a.py' if package == 'demo' else 'c.py'), 'w') as f:
+                    f.write(source)
+            files = sorted(os.path.join(directory, package, name) for package, name in
+                           [('demo', '__init__.py'), ('demo', 'a.py'), ('other', '__init__.py'), ('other', 'c.py')])
+            shards = shard_files(files, directory, 2)
+
+            graph = merge_call_graphs(pycg_call_graph_shards(shards, os.path.join(directory, 'teste'), directory))
+
+        self.assertEqual(len(shards), 2)
+        self.assertEqual(graph['...other.c.k']['calls'], ['...demo.a.h'])
+        self.assertEqual(graph['...demo.a.h']['calls'], ['<builtin>.ValueError'])
+
+    def test_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'a.py'), 'w') as f:
+                f.write("def broken(:\n")
+
+            with self.assertRaises(CallGraphError):
+                pycg_call_graph([os.path.join(directory, 'a.py')], directory)
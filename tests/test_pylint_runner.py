@@ -0,0 +1,79 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from miner_py_src.exceptions import LintError
+from miner_py_src.pylint_runner import iter_pylint_results, pylint_command, split_messages
+
+BARE_EXCEPT = '''try:
+    pass
+except:
+    pass
+'''
+
+CLEAN = '''def f():
+    return 1
+'''
+
+
+class TestSplitMessages(unittest.TestCase):
+    def test_by_file(self):
+        messages = [{'path': 'a/x.py', 'symbol': 'bare-except'}, {'path': 'b/x.py', 'symbol': 'broad-exception-caught'},
+                    {'path': 'other.py', 'symbol': 'bare-except'}]
+        files = ['/p/a/x.py', '/p/b/x.py', '/p/c.py']
+
+        self.assertEqual(split_messages(messages, files, cwd='/p'), {
+            '/p/a/x.py': [messages[0]],
+            '/p/b/x.py': [messages[1]],
+            '/p/c.py': [],
+        })
+
+    def test_command(self):
+        command = pylint_command(['a.py', 'b.py'], jobs=4)
+        self.assertIn('--jobs=4', command)
+        self.assertEqual(command[-2:], ['a.py', 'b.py'])
+
+
+    @unittest.mock.patch('miner_py_src.pylint_runner.run_pylint')
+    def test_failed_chunk(self, run_mock):
+        def run_pylint(chunk, jobs, args):
+            if 'b.py' in chunk:
+                raise LintError('pylint exited with 32')
+            return {file: [{'path': file}] for file in chunk}
+        run_mock.side_effect = run_pylint
+        files = ['a.py', 'b.py', 'c.py']
+
+        with self.assertRaises(LintError):
+            list(iter_pylint_results(files, chunk_size=1))
+
+        failed = []
+        results = list(iter_pylint_results(files, chunk_size=1, on_error=lambda chunk, ex: failed.append(chunk)))
+        self.assertEqual([file for file, _ in results], ['a.py', 'c.py'])
+        self.assertEqual(failed, [['b.py']])
+
+
+@unittest.skipUnless(importlib.util.find_spec('pylint'), 'pylint is not installed')
+class TestIterPylintResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for name, content in [('a/x.py', BARE_EXCEPT), ('b/x.py', CLEAN), ('c.py', BARE_EXCEPT)]:
+            path = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(content)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_results_in_chunks(self):
+        batched = list(iter_pylint_results(self.files, jobs=2))
+        chunked = list(iter_pylint_results(self.files, chunk_size=1))
+
+        self.assertEqual([file for file, _ in batched], self.files)
+        self.assertEqual(batched, chunked)
+        self.assertEqual([[m['message-id'] for m in messages] for _, messages in batched],
+                         [['W0702'], [], ['W0702']])
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+from miner_py_src.repo_cache import RepoCache, repo_key
+from tests.test_git_objects import git
+
+
+class TestRepoCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.origin = os.path.join(self.tmp_dir.name, 'origin')
+        os.makedirs(self.origin)
+        git(self.origin, 'init', '-q')
+        self.first = self.commit('a.py', 'def f():\n    pass\n')
+        self.url = 'file://' + self.origin
+        self.cache = RepoCache(os.path.join(self.tmp_dir.name, 'mirrors'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def commit(self, name, content) -> str:
+        with open(os.path.join(self.origin, name), 'w') as file:
+            file.write(content)
+        git(self.origin, 'add', '-A')
+        git(self.origin, 'commit', '-q', '-m', name)
+        return git(self.origin, 'rev-parse', 'HEAD')
+
+    def test_repo_key(self):
+        self.assertEqual(repo_key('https://github.com/a/b'), repo_key('https://github.com/a/b.git'))
+        self.assertEqual(repo_key('https://github.com/a/b/'), repo_key('https://github.com/a/b'))
+        self.assertNotEqual(repo_key('https://github.com/a/b'), repo_key('https://github.com/c/b'))
+        self.assertTrue(repo_key('https://github.com/a/b').startswith('b-'))
+
+    def test_mirror_is_bare_and_shared(self):
+        path = self.cache.mirror(self.url)
+
+        self.assertEqual(git(path, 'rev-parse', '--is-bare-repository'), 'true')
+        self.assertEqual(self.cache.mirror(self.url + '.git'), path)
+        self.assertEqual(RepoCache(self.cache.directory).mirror(self.url), path)
+
+    def test_fetches_missing_commit(self):
+        self.cache.mirror(self.url)
+        second = self.commit('b.py', 'def g():\n    pass\n')
+
+        self.assertFalse(self.cache.has_commit(self.url, second))
+        self.assertTrue(self.cache.ensure_commit(self.url, second))
+        self.assertFalse(self.cache.ensure_commit(self.url, '0' * 40))
+
+    def test_worktree(self):
+        second = self.commit('b.py', 'def g():\n    pass\n')
+        path = os.path.join(self.tmp_dir.name, 'projects', 'origin')
+
+        self.cache.worktree(self.url, path, self.first)
+        self.assertEqual(sorted(os.listdir(path)), ['.git', 'a.py'])
+
+        self.cache.worktree(self.url, path, second)
+        self.assertEqual(sorted(os.listdir(path)), ['.git', 'a.py', 'b.py'])
+        self.assertEqual(self.cache.worktrees(self.url), [path])
+
+        self.cache.remove_worktree(self.url, path)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.cache.worktrees(self.url), [])
+
+    def test_worktree_follows_fetched_head(self):
+        path = os.path.join(self.tmp_dir.name, 'projects', 'origin')
+        self.cache.worktree(self.url, path)
+        self.assertEqual(git(path, 'rev-parse', 'HEAD'), self.first)
+
+        second = self.commit('b.py', 'def g():\n    pass\n')
+        cache = RepoCache(self.cache.directory)  # a later run fetches the mirror again
+        cache.worktree(self.url, path)
+        self.assertEqual(git(path, 'rev-parse', 'HEAD'), second)
+        self.assertEqual(sorted(os.listdir(path)), ['.git', 'a.py', 'b.py'])
+
+    def test_worktree_without_checkout(self):
+        path = os.path.join(self.tmp_dir.name, 'projects', 'origin')
+        self.cache.worktree(self.url, path, self.first, checkout=False)
+
+        self.assertEqual(os.listdir(path), ['.git'])
+        with self.cache.reader(self.url) as reader:
+            self.assertEqual(reader.blob(self.first, 'a.py'), b'def f():\n    pass\n')
+
+    def test_evict_least_recently_used(self):
+        other = os.path.join(self.tmp_dir.name, 'other')
+        os.makedirs(other)
+        git(other, 'init', '-q')
+        git(other, 'commit', '-q', '--allow-empty', '-m', 'empty')
+
+        old_path = self.cache.mirror('file://' + other)
+        worktree = self.cache.worktree('file://' + other, os.path.join(self.tmp_dir.name, 'projects', 'other'))
+        os.utime(os.path.join(old_path, 'miner-last-used'), (0, 0))
+        path = self.cache.mirror(self.url)
+
+        # both are used by this cache, nothing can be evicted
+        self.cache.max_bytes = 0
+        self.assertEqual(self.cache.evict(), 0)
+
+        # a new run evicts the least recently used mirror until the rest fits
+        cache = RepoCache(self.cache.directory, self.cache.size() - 1)
+        self.assertEqual(cache.evict(), 1)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(worktree))
+        self.assertTrue(os.path.exists(path))
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from miner_py_src.eh_visitor import METRIC_NAMES
+from miner_py_src.file_metrics import iter_file_records
+from miner_py_src.metrics_cache import blob_hash
+from miner_py_src.source_store import (FunctionBodies, SourceStore, StoredContents, reference_columns)
+
+SOURCE = '''import os
+
+
+def first():
+    try:
+        os.remove("x")
+    except OSError:
+        pass
+
+
+class K:
+    @staticmethod
+    def second(é):
+        try:
+            return 1
+        except (ValueError, KeyError) as e:
+            raise RuntimeError() from e
+'''
+
+
+class TestSourceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SourceStore(os.path.join(self.tmp_dir.name, 'sources'))
+        self.files = []
+        for name in ['a.py', 'b.py']:  # same content
+            path = os.path.join(self.tmp_dir.name, name)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(SOURCE)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_get(self):
+        blob_id = self.store.put(b'x = 1\n')
+        self.assertEqual(blob_id, blob_hash(b'x = 1\n'))
+        self.assertEqual(self.store.put(b'x = 1\n'), blob_id)
+        self.assertIn(blob_id, self.store)
+        self.assertEqual(self.store.get(blob_id), b'x = 1\n')
+        with self.assertRaises(KeyError):
+            self.store.get(blob_hash(b'missing'))
+
+    def test_reference_columns(self):
+        self.assertEqual(reference_columns(['file', 'func_body', 'n_raise', 'str_except_block']),
+                         ['file', 'func_blob', 'start_byte', 'end_byte', 'n_raise'])
+
+    def test_lazy_bodies(self):
+        contents = StoredContents(self.store)
+        rows = []
+        for file_path, records in iter_file_records(self.files, contents=contents):
+            for record in records:
+                rows.append({'file': file_path, 'expected_body': record.func_body,
+                             'expected_except_block': record.metrics[METRIC_NAMES.index('str_except_block')],
+                             **contents.reference(file_path, record)})
+        df = pd.DataFrame(rows)
+
+        self.assertEqual(len(df), 4)
+        self.assertEqual(df['func_blob'].nunique(), 1)  # one copy of the source
+        self.assertEqual(sorted(os.listdir(self.store.directory)), [df['func_blob'][0][:2]])
+
+        bodies = FunctionBodies(self.store, cache_size=1)
+        materialized = bodies.materialize(df, except_block=True)
+        self.assertEqual(materialized['func_body'].tolist(), df['expected_body'].tolist())
+        self.assertEqual(materialized['str_except_block'].tolist(), df['expected_except_block'].tolist())
+        self.assertNotIn('func_body', df.columns)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from miner_py_src import tree_sitter_lang
+from miner_py_src.tree_sitter_lang import QUERY_FUNCTION_DEF, LazyQuery, parser
+
+# seconds to import tree_sitter_lang once the grammar is built (tree_sitter itself excluded);
+# it takes a few ms without the queries, the bound only catches them being compiled again
+IMPORT_TIME_BUDGET = 1.0
+
+# time of a fresh import of tree_sitter_lang and its LazyQuery compiled right after it
+MEASURE_IMPORT = '''
+import time
+import tree_sitter
+start = time.perf_counter()
+from miner_py_src import tree_sitter_lang
+elapsed = time.perf_counter() - start
+queries = [value for value in vars(tree_sitter_lang).values() if isinstance(value, tree_sitter_lang.LazyQuery)]
+print(elapsed, len(queries), sum(query.is_compiled for query in queries))
+'''
+
+
+class TestTreeSitterLang(unittest.TestCase):
+    def test_import(self):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        proc = subprocess.run([sys.executable, '-c', MEASURE_IMPORT], cwd=root,
+                              stdout=subprocess.PIPE, check=True)
+        elapsed, queries, compiled = proc.stdout.decode('utf-8').split()
+
+        self.assertGreater(int(queries), 0)
+        self.assertEqual(int(compiled), 0)  # compiled when first used
+        self.assertLess(float(elapsed), IMPORT_TIME_BUDGET, f'import took {float(elapsed):.3f}s')
+
+    def test_lazy_query(self):
+        query = LazyQuery("(raise_statement) @raise.stmt")
+        self.assertFalse(query.is_compiled)
+
+        captures = query.captures(parser.parse(b"def f():\n    raise\n").root_node)
+
+        self.assertTrue(query.is_compiled)
+        self.assertEqual([name for _, name in captures], ['raise.stmt'])
+
+    def test_prebuilt_library_env(self):
+        library = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '..', tree_sitter_lang.LIBRARY_PATH))
+        previous = os.environ.get(tree_sitter_lang.LIBRARY_ENV)
+        os.environ[tree_sitter_lang.LIBRARY_ENV] = library
+        try:
+            language = tree_sitter_lang.load_language()
+        finally:
+            if previous is None:
+                del os.environ[tree_sitter_lang.LIBRARY_ENV]
+            else:
+                os.environ[tree_sitter_lang.LIBRARY_ENV] = previous
+
+        self.assertEqual(len(language.query(QUERY_FUNCTION_DEF.source).captures(
+            parser.parse(b"def f():\n    pass\n").root_node)), 1)
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from miner_py_src.file_metrics import iter_file_records, parse_file
+from miner_py_src.ts_call_graph import build_call_graph, module_name
+
+project = {
+    'pkg/__init__.py': "from .errors import raise_error\n",
+    'pkg/errors.py': """
+def raise_error():
+    raise ValueError()
+
+
+class Base:
+    def __init__(self):
+        self.check()
+
+    def check(self):
+        raise_error()
+""",
+    'pkg/sub/models.py': """
+import os
+import pkg.errors
+from .. import raise_error as fail
+from ..errors import Base
+
+
+class Model(Base):
+    def __init__(self):
+        super().__init__()
+
+    def save(self):
+        self.check()
+        fail()
+
+    def load(self):
+        def inner():
+            pkg.errors.raise_error()
+        inner()
+        self.unknown()
+        print()
+
+
+def main():
+    Model().save()
+    os.path.join('a')
+""",
+    'main.py': """
+from pkg import raise_error
+from pkg.sub.models import *
+
+main()
+raise_error()
+""",
+}
+
+
+class TestTreeSitterCallGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.files = []
+        for name, content in project.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(content)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def call_graph(self, jobs=1):
+        call_facts = {}
+        records = dict(iter_file_records(self.files, jobs, call_facts=call_facts))
+        return records, build_call_graph(call_facts, self.root)
+
+    def test_module_name(self):
+        self.assertEqual(module_name(os.path.join(self.root, 'pkg/sub/models.py'), self.root), 'pkg.sub.models')
+        self.assertEqual(module_name(os.path.join(self.root, 'pkg/__init__.py'), self.root), 'pkg')
+
+    def test_calls(self):
+        records, graph = self.call_graph()
+
+        self.assertEqual(graph['...pkg.errors.Base.__init__']['calls'], ['...pkg.errors.Base.check'])
+        self.assertEqual(graph['...pkg.errors.Base.check']['calls'], ['...pkg.errors.raise_error'])
+        self.assertEqual(graph['...pkg.sub.models.Model.__init__']['calls'],
+                         ['...pkg.errors.Base.__init__', '<builtin>.super'])
+        self.assertEqual(graph['...pkg.sub.models.Model.save']['calls'],
+                         ['...pkg.errors.Base.check', '...pkg.errors.raise_error'])
+        self.assertEqual(graph['...pkg.sub.models.Model.load']['calls'],
+                         ['...pkg.sub.models.Model.load.inner', '<builtin>.print'])
+        self.assertEqual(graph['...pkg.sub.models.Model.load.inner']['calls'], ['...pkg.errors.raise_error'])
+        self.assertEqual(graph['...pkg.sub.models.main']['calls'],
+                         ['...pkg.sub.models.Model.__init__', 'os.path.join'])
+        self.assertEqual(graph['...main']['calls'], ['...pkg.sub.models.main', '...pkg.errors.raise_error'])
+        self.assertEqual(sorted(graph['...pkg.errors.raise_error']['called_by']),
+                         ['...main', '...pkg.errors.Base.check', '...pkg.sub.models.Model.load.inner',
+                          '...pkg.sub.models.Model.save'])
+
+    def test_same_records_and_graph_with_pool(self):
+        records, graph = self.call_graph()
+        pool_records, pool_graph = self.call_graph(jobs=2)
+
+        self.assertEqual(pool_graph.to_dict(), graph.to_dict())
+        for path in self.files:
+            self.assertEqual([r._replace(node_id=None) for r in records[path]],
+                             [r._replace(node_id=None) for r in parse_file(path)])
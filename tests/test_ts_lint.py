@@ -0,0 +1,141 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from miner_py_src.file_metrics import iter_file_records
+from miner_py_src.pylint_runner import run_pylint
+from miner_py_src.tree_sitter_lang import parser
+from miner_py_src.ts_lint import lint_tree, module_name
+
+SOURCE = '''class Error(Exception):
+    pass
+
+
+def handlers():
+    try:
+        pass
+    except:
+        pass
+    try:
+        pass
+    except Exception:
+        pass
+    except ValueError:
+        pass
+    try:
+        pass
+    except KeyError:
+        raise
+    except IndexError:
+        pass
+    try:
+        pass
+    except (OSError, ValueError) as e:
+        raise Error("bad")
+    except OSError or KeyError:
+        pass
+    except TypeError:
+        raise Exception("%s", 1) from e
+
+
+def raises():
+    if True:
+        raise
+    if True:
+        raise NotImplemented
+    if True:
+        raise 1
+    if True:
+        raise str
+    if True:
+        raise Error() from 1
+
+
+class Manager:
+    def __exit__(self, *args):
+        raise
+
+
+def disabled():
+    try:
+        pass
+    except:  # pylint: disable=bare-except
+        pass
+'''
+
+EXPECTED = [
+    (8, 4, 'W0702'), (12, 11, 'W0718'), (14, 11, 'E0701'), (18, 4, 'W0706'), (25, 8, 'W0707'),
+    (26, 4, 'W0711'), (29, 8, 'W0715'), (29, 8, 'W0719'), (34, 8, 'E0704'), (36, 8, 'E0702'),
+    (36, 8, 'E0711'), (38, 8, 'E0702'), (40, 8, 'E0710'), (42, 8, 'E0705'),
+]
+
+
+def lint_source(source: str, file_path='sample.py') -> list:
+    return lint_tree(parser.parse(source.encode('utf-8')).root_node, file_path)
+
+
+def message_keys(messages) -> list:
+    return sorted((m['line'], m['column'], m['message-id']) for m in messages)
+
+
+class TestLintTree(unittest.TestCase):
+    def test_messages(self):
+        self.assertEqual(message_keys(lint_source(SOURCE)), EXPECTED)
+
+    def test_records(self):
+        message = next(m for m in lint_source(SOURCE) if m['message-id'] == 'W0707')
+        self.assertEqual(message['symbol'], 'raise-missing-from')
+        self.assertEqual(message['obj'], 'handlers')
+        self.assertEqual(message['type'], 'warning')
+        self.assertEqual(message['path'], 'sample.py')
+        self.assertEqual(message['message'], "Consider explicitly re-raising using 'raise Error(\"bad\") from e'")
+
+    def test_nested_scopes(self):
+        source = '''try:
+    pass
+except ValueError:
+    def inner():
+        raise
+    raise
+'''
+        self.assertEqual(message_keys(lint_source(source)), [(5, 8, 'E0704')])
+
+    def test_disable_next(self):
+        source = '''# pylint: disable-next=misplaced-bare-raise
+raise
+raise
+'''
+        self.assertEqual(message_keys(lint_source(source)), [(3, 0, 'E0704')])
+
+    def test_module_name(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'pkg', 'sub'))
+            for name in ['pkg/__init__.py', 'pkg/sub/__init__.py', 'pkg/sub/mod.py']:
+                open(os.path.join(tmp_dir, name), 'w').close()
+            self.assertEqual(module_name(os.path.join(tmp_dir, 'pkg/sub/mod.py')), 'pkg.sub.mod')
+            self.assertEqual(module_name(os.path.join(tmp_dir, 'pkg/sub/__init__.py')), 'pkg.sub')
+
+
+class TestIterFileRecordsLint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, 'sample.py')
+        with open(self.file, 'w') as file:
+            file.write(SOURCE)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_pass(self):
+        for jobs in [1, 2]:
+            with self.subTest(jobs=jobs):
+                lint_messages = {}
+                records = dict(iter_file_records([self.file], jobs, lint_messages=lint_messages))
+                self.assertEqual(len(records[self.file]), 4)
+                self.assertEqual(message_keys(lint_messages[self.file]), EXPECTED)
+
+    @unittest.skipUnless(importlib.util.find_spec('pylint'), 'pylint is not installed')
+    def test_pylint_parity(self):
+        reference = run_pylint([self.file], cwd=self.tmp_dir.name)[self.file]
+        self.assertEqual(message_keys(lint_source(SOURCE, self.file)), message_keys(reference))